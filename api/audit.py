@@ -0,0 +1,273 @@
+"""
+Audit Event Pipeline for JSPro PowerDesk
+Security and resource-access events are queued in memory and written in
+batches by a background thread, so request handlers never wait on disk or
+Redis writes.
+
+Sinks (AUDIT_SINK):
+- redis: Redis stream with capped length (default)
+- file: rotating JSONL file (SECURITY_LOG_FILE)
+"""
+
+import os
+import json
+import queue
+import atexit
+import threading
+from redis.exceptions import RedisError
+from .redisconnection import connection as red
+from utils import read_last_lines
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+AUDIT_ENABLED = os.getenv('ENABLE_SECURITY_LOGGING', 'true').lower() == 'true'
+AUDIT_SINK = os.getenv('AUDIT_SINK', 'redis').lower()
+AUDIT_STREAM = os.getenv('AUDIT_STREAM', 'stream:audit')
+AUDIT_STREAM_MAXLEN = int(os.getenv('AUDIT_STREAM_MAXLEN', 10000))
+AUDIT_LOG_FILE = os.getenv('SECURITY_LOG_FILE', 'security.log')
+if not os.path.isabs(AUDIT_LOG_FILE):
+    AUDIT_LOG_FILE = os.path.join(BASE_DIR, 'logs', AUDIT_LOG_FILE)
+AUDIT_LOG_MAX_BYTES = int(os.getenv('AUDIT_LOG_MAX_BYTES', 1024 * 1024))
+AUDIT_LOG_BACKUP_COUNT = int(os.getenv('AUDIT_LOG_BACKUP_COUNT', 3))
+
+# Stream field listing the fields stored as JSON (dict/list details)
+JSON_FIELDS_FIELD = '_json'
+
+QUEUE_SIZE = 1000
+BATCH_SIZE = 100
+FLUSH_INTERVAL_SECONDS = 2
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_writer_lock = threading.Lock()
+_writer_thread = None
+_writer_pid = None
+_stats = {
+    'queued': 0,
+    'written': 0,
+    'dropped': 0,
+    'write_errors': 0
+}
+
+
+def _ensure_writer():
+    """Start the writer thread once per process (gunicorn workers fork after import)"""
+    global _writer_thread, _writer_pid
+    
+    if _writer_thread is not None and _writer_pid == os.getpid() and _writer_thread.is_alive():
+        return
+    
+    with _writer_lock:
+        if _writer_thread is not None and _writer_pid == os.getpid() and _writer_thread.is_alive():
+            return
+        _writer_pid = os.getpid()
+        _writer_thread = threading.Thread(target=_writer_loop, name='audit-writer', daemon=True)
+        _writer_thread.start()
+
+
+def enqueue_event(event):
+    """
+    Queue an audit event without blocking
+    
+    Returns:
+        bool: False if auditing is disabled or the queue is full
+    """
+    if not AUDIT_ENABLED:
+        return False
+    
+    _ensure_writer()
+    try:
+        _queue.put_nowait(event)
+        _stats['queued'] += 1
+        return True
+    except queue.Full:
+        _stats['dropped'] += 1
+        return False
+
+
+def _drain_batch(timeout):
+    """Collect up to BATCH_SIZE events, waiting at most timeout for the first one"""
+    batch = []
+    try:
+        batch.append(_queue.get(timeout=timeout))
+    except queue.Empty:
+        return batch
+    
+    while len(batch) < BATCH_SIZE:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _writer_loop():
+    """Background thread: flush queued events in batches"""
+    while True:
+        batch = _drain_batch(FLUSH_INTERVAL_SECONDS)
+        if batch:
+            _write_batch(batch)
+
+
+def _write_batch(batch):
+    """Write a batch of events to the configured sink"""
+    try:
+        if AUDIT_SINK == 'file':
+            _write_file(batch)
+        else:
+            _write_redis(batch)
+        _stats['written'] += len(batch)
+    except (RedisError, OSError) as e:
+        _stats['write_errors'] += 1
+        print(f"[AUDIT] Failed to write {len(batch)} audit events: {e}")
+
+
+def _stream_fields(event):
+    """Flatten an event to stream fields, dicts/lists as JSON (the file sink's shape when read back)"""
+    fields = {}
+    json_fields = []
+    for key, value in event.items():
+        if isinstance(value, (dict, list, tuple)):
+            fields[key] = json.dumps(value, default=str)
+            json_fields.append(key)
+        else:
+            fields[key] = '' if value is None else str(value)
+    if json_fields:
+        fields[JSON_FIELDS_FIELD] = ','.join(json_fields)
+    return fields
+
+
+def _event_from_stream(fields):
+    """Inverse of _stream_fields()"""
+    event = dict(fields)
+    for key in event.pop(JSON_FIELDS_FIELD, '').split(','):
+        if key in event:
+            try:
+                event[key] = json.loads(event[key])
+            except ValueError:
+                pass
+    return event
+
+
+def _write_redis(batch):
+    """Append events to a capped Redis stream in one round trip"""
+    pipe = red.pipeline(transaction=False)
+    for event in batch:
+        fields = _stream_fields(event)
+        pipe.xadd(AUDIT_STREAM, fields, maxlen=AUDIT_STREAM_MAXLEN, approximate=True)
+    pipe.execute()
+
+
+def _write_file(batch):
+    """Append events to the JSONL log, rotating by size"""
+    os.makedirs(os.path.dirname(AUDIT_LOG_FILE), exist_ok=True)
+    
+    if os.path.exists(AUDIT_LOG_FILE) and os.path.getsize(AUDIT_LOG_FILE) >= AUDIT_LOG_MAX_BYTES:
+        _rotate_file()
+    
+    lines = ''.join(json.dumps(event, default=str) + '\n' for event in batch)
+    with open(AUDIT_LOG_FILE, 'a') as f:
+        f.write(lines)
+
+
+def _rotate_file():
+    """Rotate security.log -> security.log.1 -> ... -> security.log.N"""
+    for index in range(AUDIT_LOG_BACKUP_COUNT - 1, 0, -1):
+        source = f'{AUDIT_LOG_FILE}.{index}'
+        if os.path.exists(source):
+            os.replace(source, f'{AUDIT_LOG_FILE}.{index + 1}')
+    if AUDIT_LOG_BACKUP_COUNT > 0:
+        os.replace(AUDIT_LOG_FILE, f'{AUDIT_LOG_FILE}.1')
+    else:
+        os.remove(AUDIT_LOG_FILE)
+
+
+def flush(timeout=5):
+    """Write all queued events synchronously (used at exit)"""
+    batch = []
+    while True:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+        if len(batch) >= BATCH_SIZE:
+            _write_batch(batch)
+            batch = []
+    if batch:
+        _write_batch(batch)
+
+
+atexit.register(flush)
+
+
+def _matches(event, event_type=None, username=None):
+    if event_type and event.get('event_type') != event_type:
+        return False
+    if username and event.get('username') != username:
+        return False
+    return True
+
+
+def query_events(limit=100, event_type=None, username=None):
+    """
+    Get the latest audit events (newest first)
+    
+    Parameters:
+    - limit: Maximum events to return
+    - event_type: Optional event type filter (e.g. 'PERMISSION_DENIED')
+    - username: Optional username filter
+    """
+    events = []
+    
+    if AUDIT_SINK == 'file':
+        paths = [AUDIT_LOG_FILE] + [f'{AUDIT_LOG_FILE}.{i}' for i in range(1, AUDIT_LOG_BACKUP_COUNT + 1)]
+        for path in paths:
+            # Filters may skip lines, so read a wider window than the limit
+            for line in reversed(read_last_lines(path, limit * 10)):
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if _matches(event, event_type, username):
+                    events.append(event)
+                    if len(events) >= limit:
+                        return events
+        return events
+    
+    # Redis stream, scanned backwards in chunks
+    max_id = '+'
+    chunk_size = max(limit, 100)
+    while len(events) < limit:
+        entries = red.xrevrange(AUDIT_STREAM, max=max_id, min='-', count=chunk_size)
+        if not entries:
+            break
+        for entry_id, fields in entries:
+            event = _event_from_stream(fields)
+            event['id'] = entry_id
+            if _matches(event, event_type, username):
+                events.append(event)
+                if len(events) >= limit:
+                    break
+        if len(entries) < chunk_size:
+            break
+        max_id = f'({entries[-1][0]}'
+    
+    return events
+
+
+def get_pipeline_stats():
+    """Get audit pipeline counters for this worker"""
+    return {
+        'enabled': AUDIT_ENABLED,
+        'sink': AUDIT_SINK,
+        'target': AUDIT_LOG_FILE if AUDIT_SINK == 'file' else AUDIT_STREAM,
+        'queue_size': _queue.qsize(),
+        'queue_capacity': QUEUE_SIZE,
+        **_stats
+    }
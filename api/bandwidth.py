@@ -0,0 +1,193 @@
+"""
+Low-Bandwidth Profile for JSPro PowerDesk
+For sites reached over VSAT. In the "low" profile the monitoring and logger
+GET responses are rewritten before compression:
+- lists of same-shaped objects become {"$columns": [...], "$rows": [[...]]}
+- status_code/message of successful responses are dropped, page_info is cut
+  to limit/offset/total_records/showing_count(/next_cursor) and site_info is only sent on
+  the first page
+- when If-None-Match names an older ETag whose payload is still known, only a
+  JSON merge patch (RFC 7386) against it is sent (X-Payload-Format: delta)
+and X-Poll-Interval suggests POLL_INTERVAL_LOW instead of POLL_INTERVAL_NORMAL.
+
+The profile comes from X-Bandwidth-Profile: "low"/"normal" select it directly.
+"auto" (sent by static/js/bandwidth.js, which undoes the rewriting) uses the
+session choice (PUT /api/bandwidth-profile), else the RTT/ECT request headers.
+Clients that send nothing always get the normal payloads.
+"""
+
+import os
+import json
+from flask import request, session, g
+from .redisconnection import connection as red
+from .responses import dumps
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+PROFILES = ('normal', 'low')
+SESSION_KEY = 'bandwidth_profile'
+# Blueprints whose GET responses follow the profile
+PROFILED_BLUEPRINTS = ('monitoring', 'logger')
+
+# RTT (ms, as measured by the client) at or above which "auto" selects low
+LOW_BANDWIDTH_RTT_MS = int(os.getenv('LOW_BANDWIDTH_RTT_MS', 800))
+POLL_INTERVAL_NORMAL = int(os.getenv('POLL_INTERVAL_NORMAL', 5))
+POLL_INTERVAL_LOW = int(os.getenv('POLL_INTERVAL_LOW', 30))
+
+# Payloads kept (per ETag) as delta bases
+DELTA_KEY_PREFIX = 'bandwidth:payload:'
+DELTA_BASE_TTL = 600
+
+
+def is_slow_link():
+    """Whether the request's RTT/ECT headers (client hints or bandwidth.js) indicate a slow link"""
+    if request.headers.get('ECT', '').lower() in ('slow-2g', '2g'):
+        return True
+    try:
+        return int(request.headers.get('RTT', 0)) >= LOW_BANDWIDTH_RTT_MS
+    except ValueError:
+        return False
+
+
+def get_bandwidth_profile():
+    """Resolve the profile of the current request ('normal' or 'low')"""
+    requested = request.headers.get('X-Bandwidth-Profile', '').lower()
+    if requested in PROFILES:
+        return requested
+    if requested != 'auto':
+        # The client can't decode compact payloads
+        return 'normal'
+
+    chosen = session.get(SESSION_KEY, 'auto')
+    if chosen in PROFILES:
+        return chosen
+    return 'low' if is_slow_link() else 'normal'
+
+
+def columnar(value):
+    """Turn lists of same-shaped objects into {"$columns", "$rows"}, recursively"""
+    if isinstance(value, dict):
+        return {key: columnar(item) for key, item in value.items()}
+    if isinstance(value, list):
+        items = [columnar(item) for item in value]
+        if len(items) > 1 and all(isinstance(item, dict) for item in items):
+            columns = list(items[0])
+            if all(list(item) == columns for item in items):
+                return {'$columns': columns, '$rows': [list(item.values()) for item in items]}
+        return items
+    return value
+
+
+def compact_payload(payload):
+    """Low-profile payload of a successful JSON response"""
+    if not isinstance(payload, dict):
+        return columnar(payload)
+
+    payload = dict(payload)
+    payload.pop('status_code', None)
+    payload.pop('message', None)
+
+    page_info = payload.get('page_info')
+    if isinstance(page_info, dict):
+        payload['page_info'] = {
+            key: page_info[key]
+            for key in ('limit', 'offset', 'total_records', 'showing_count', 'next_cursor')
+            if key in page_info
+        }
+        if page_info.get('offset'):
+            # Same for every page, bandwidth.js reuses the one from the first page
+            payload.pop('site_info', None)
+    return columnar(payload)
+
+
+def _has_null_member(value):
+    """Whether an object (at any depth, lists excluded) has a null member"""
+    return isinstance(value, dict) and any(item is None or _has_null_member(item) for item in value.values())
+
+
+def merge_patch(old, new):
+    """
+    JSON merge patch (RFC 7386) turning the object old into the object new
+
+    Returns None when the change can't be expressed: a merge patch reads a null
+    member as "remove", so no value may become null or be added with one.
+    """
+    patch = {key: None for key in old if key not in new}
+    for key, value in new.items():
+        if key in old and old[key] == value:
+            continue
+        if key in old and isinstance(value, dict) and isinstance(old[key], dict):
+            value = merge_patch(old[key], value)
+            if value is None:
+                return None
+        elif value is None or _has_null_member(value):
+            return None
+        patch[key] = value
+    return patch
+
+
+def _delta_base(current_etag):
+    """The ETag the client already holds (from If-None-Match), if any"""
+    for etag in request.if_none_match.as_set(include_weak=True):
+        if etag != current_etag:
+            return etag
+    return None
+
+
+def _before_request():
+    if request.method == 'GET' and request.blueprint in PROFILED_BLUEPRINTS:
+        g.bandwidth_profile = get_bandwidth_profile()
+
+
+def _after_request(response):
+    profile = g.get('bandwidth_profile')
+    if profile is None:
+        return response
+
+    response.vary.update(('X-Bandwidth-Profile', 'RTT', 'ECT'))
+    response.headers['Accept-CH'] = 'RTT, ECT'
+    response.headers['X-Bandwidth-Profile'] = profile
+    response.headers['X-Poll-Interval'] = str(POLL_INTERVAL_LOW if profile == 'low' else POLL_INTERVAL_NORMAL)
+
+    if (profile != 'low' or response.status_code != 200 or response.mimetype != 'application/json'
+            or response.direct_passthrough or response.is_streamed):
+        return response
+
+    try:
+        payload = compact_payload(json.loads(response.get_data()))
+    except ValueError:
+        return response
+    body = dumps(payload)
+    payload_format = 'columnar'
+
+    etag, _ = response.get_etag()
+    if etag:
+        try:
+            base = _delta_base(etag)
+            base_body = red.get(f'{DELTA_KEY_PREFIX}{base}') if base else None
+            red.set(f'{DELTA_KEY_PREFIX}{etag}', body.decode('utf-8'), ex=DELTA_BASE_TTL)
+            if base_body and isinstance(payload, dict):
+                patch = merge_patch(json.loads(base_body), payload)
+                if patch is not None:
+                    patch_body = dumps(patch)
+                    if len(patch_body) < len(body):
+                        body = patch_body
+                        payload_format = 'columnar,delta'
+                        response.headers['X-Delta-Base'] = f'"{base}"'
+        except Exception as e:
+            print(f"Error building delta payload: {e}")
+
+    response.set_data(body)
+    response.headers['X-Payload-Format'] = payload_format
+    return response
+
+
+def init_bandwidth_profile(app):
+    """Register the profile hooks (after init_compression, so payloads are rewritten before compression)"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,88 @@
+"""
+Response Compression for JSPro PowerDesk
+JSON, HTML and text responses of COMPRESS_MIN_SIZE bytes or more are compressed
+with brotli (when the brotli module is installed and the client accepts br) or
+gzip. Static files are not handled here: nginx serves them precompressed (see
+scripts/precompress_static.py and api/static_assets.py).
+"""
+
+import os
+import gzip
+from flask import request
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+# Fast settings: the Pi compresses every page and log response on the fly
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'text/html',
+    'text/plain',
+    'text/csv',
+    'text/css',
+    'application/javascript',
+    'application/openmetrics-text',
+}
+
+
+def choose_encoding(accept_encodings):
+    """Pick 'br' or 'gzip' from the request's Accept-Encoding (None if neither is accepted)"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    """Compress bytes with 'br' or 'gzip'"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def _after_request(response):
+    """Compress eligible responses"""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # ETags of responses.conditional() are weak already, the same for every encoding
+    return response
+
+
+def init_compression(app):
+    """Register the compression hook (runs before the profiling hook so its time is counted)"""
+    if not COMPRESS_ENABLED:
+        return
+    app.after_request(_after_request)
+    print(f"✅ Response compression enabled ({'br, gzip' if brotli is not None else 'gzip'}, >= {COMPRESS_MIN_SIZE} bytes)")
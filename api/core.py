@@ -1,32 +1,50 @@
-from flask import jsonify, request
+import time
+import importlib
+from flask import jsonify, request, session
 from . import api
+from .responses import static_json
+from .bandwidth import PROFILES, SESSION_KEY, LOW_BANDWIDTH_RTT_MS, POLL_INTERVAL_NORMAL, POLL_INTERVAL_LOW, is_slow_link
+
+
+# (module, blueprint attribute, URL prefix) of the v1 API blueprints
+V1_BLUEPRINTS = [
+    ('api.device', 'device_bp', '/api/v1/device'),
+    ('api.monitoring', 'monitoring_bp', '/api/v1/monitoring'),
+    ('api.logger', 'logger_bp', '/api/v1/loggers'),
+    ('api.power', 'power_bp', '/api/v1/power'),
+    ('api.services', 'service_bp', '/api/v1/service'),
+    ('api.metrics', 'metrics_bp', '/metrics'),
+]
 
 
 def register_blueprints(app):
     """
     Register all API blueprints to the Flask app
-    """
-    # Import blueprints here to avoid circular imports
-    from .device import device_bp
-    from .monitoring import monitoring_bp
-    from .logger import logger_bp
-    from .power import power_bp
-    from .services import service_bp
     
+    Import time of each blueprint module is printed and stored in
+    app.config['STARTUP_IMPORT_TIMES'] (milliseconds). For a full breakdown
+    run python -X importtime wsgi.py.
+    """
     # Register error handlers first
     register_error_handlers(app)
     
     # Register core API blueprint with /api prefix to avoid conflicts
     app.register_blueprint(api, url_prefix='/api')
     
-    # Register v1 API blueprints with URL prefixes
-    app.register_blueprint(device_bp, url_prefix='/api/v1/device')
-    app.register_blueprint(monitoring_bp, url_prefix='/api/v1/monitoring')
-    app.register_blueprint(logger_bp, url_prefix='/api/v1/loggers')
-    app.register_blueprint(power_bp, url_prefix='/api/v1/power')
-    app.register_blueprint(service_bp, url_prefix='/api/v1/service')
+    # Import blueprints here to avoid circular imports
+    import_times = {}
+    for module_name, blueprint_name, url_prefix in V1_BLUEPRINTS:
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        import_times[module_name] = round((time.perf_counter() - started) * 1000, 1)
+        
+        # Register v1 API blueprints with URL prefixes
+        app.register_blueprint(getattr(module, blueprint_name), url_prefix=url_prefix)
     
-    print("✅ All API blueprints registered successfully")
+    app.config['STARTUP_IMPORT_TIMES'] = import_times
+    
+    timings = ', '.join(f'{name.split(".")[-1]} {ms:.0f} ms' for name, ms in import_times.items())
+    print(f"✅ All API blueprints registered successfully ({timings})")
 
 
 def register_error_handlers(app):
@@ -140,9 +158,10 @@ def register_error_handlers(app):
 
 # ============== Base API Routes v1 ===========================
 @api.route('/info', methods=['GET'])
+@static_json
 def api_v1_info():
     """Base API v1 information endpoint"""
-    return jsonify({
+    return {
         "status_code": 200,
         "status": "success",
         "data": {
@@ -196,6 +215,43 @@ def api_v1_info():
             },
             "documentation": "See API Documentation for JSPro Powerdesk.md"
         }
+    }, 200
+
+@api.route('/bandwidth-profile', methods=['GET', 'PUT'])
+def bandwidth_profile():
+    """
+    Get or set the bandwidth profile of this browser session
+    PUT body: {"profile": "auto" | "low" | "normal"}
+    """
+    if request.method == 'PUT':
+        profile = (request.get_json(silent=True) or {}).get('profile')
+        if profile not in ('auto',) + PROFILES:
+            return jsonify({
+                "status_code": 400,
+                "status": "error",
+                "message": f"Invalid profile. Valid profiles: auto, {', '.join(PROFILES)}",
+                "data": None
+            }), 400
+        session[SESSION_KEY] = profile
+    
+    profile = session.get(SESSION_KEY, 'auto')
+    if profile in PROFILES:
+        effective = profile
+    else:
+        effective = 'low' if is_slow_link() else 'normal'
+    
+    return jsonify({
+        "status_code": 200,
+        "status": "success",
+        "data": {
+            "profile": profile,
+            "effective_profile": effective,
+            "low_bandwidth_rtt_ms": LOW_BANDWIDTH_RTT_MS,
+            "poll_interval": {
+                "normal": POLL_INTERVAL_NORMAL,
+                "low": POLL_INTERVAL_LOW
+            }
+        }
     }), 200
 
 # ============== Wildcard Route for Unknown API Endpoints ===========================
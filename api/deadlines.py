@@ -0,0 +1,90 @@
+"""
+Per-Request Deadlines for JSPro PowerDesk
+Every request gets a deadline (REQUEST_DEADLINE_SECONDS, a client may ask for
+less with X-Request-Timeout) so a slow snmpget, systemctl call or SQLite query
+can't hold a worker (thread/greenlet, see gunicorn.conf.py) indefinitely:
+- subprocess timeouts go through request_timeout(), which caps them at the
+  time left; an uncaught subprocess.TimeoutExpired becomes a 504
+- SQLite connections made with api.profiling.ProfiledConnection are
+  interrupted once the deadline passed (sqlite3.OperationalError: interrupted)
+Views that are meant to run long (streamed exports) opt out with
+@request_deadline(None); settings views that restart services get
+@request_deadline(SERVICE_RESTART_DEADLINE_SECONDS).
+"""
+
+import os
+import time
+import subprocess
+from flask import current_app, request, g, has_request_context, jsonify
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', 30))
+# Settings saves run several systemctl restarts, kept under the sync profile's gunicorn timeout (480)
+SERVICE_RESTART_DEADLINE_SECONDS = float(os.getenv('SERVICE_RESTART_DEADLINE_SECONDS', 300))
+DEADLINE_HEADER = 'X-Request-Timeout'
+
+
+def request_deadline(seconds):
+    """Override REQUEST_DEADLINE_SECONDS for a view (None = no deadline)"""
+    def decorator(view):
+        view.request_deadline = seconds
+        return view
+    return decorator
+
+
+def current_deadline():
+    """time.monotonic() deadline of the current request, None outside requests or without one"""
+    if not has_request_context():
+        return None
+    return g.get('deadline')
+
+
+def request_timeout(timeout=None):
+    """
+    Timeout (seconds) for a blocking call made while handling a request
+
+    Returns timeout capped at the time left before the request deadline (0 when
+    it already passed), or timeout unchanged outside a request.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return timeout
+    remaining = max(0.0, deadline - time.monotonic())
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def _before_request():
+    view = current_app.view_functions.get(request.endpoint)
+    seconds = getattr(view, 'request_deadline', REQUEST_DEADLINE_SECONDS)
+    if seconds is None:
+        return
+    try:
+        requested = float(request.headers.get(DEADLINE_HEADER, seconds))
+    except ValueError:
+        requested = seconds
+    g.deadline = time.monotonic() + max(0.0, min(seconds, requested))
+
+
+def init_deadlines(app):
+    """Register the deadline hook and the 504 handler for timed out subprocesses"""
+    app.before_request(_before_request)
+
+    @app.errorhandler(subprocess.TimeoutExpired)
+    def subprocess_timeout_error(error):
+        """Handle a subprocess that ran past its (request) timeout"""
+        print(f"Request deadline exceeded: {error}")
+        return jsonify({
+            "status_code": 504,
+            "status": "error",
+            "message": "The request took too long to complete",
+            "error": {
+                "type": "GatewayTimeout",
+                "description": f"'{request.path}' exceeded its deadline",
+            }
+        }), 504
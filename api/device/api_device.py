@@ -1,14 +1,13 @@
-import json
 import platform
 import os
 import subprocess
 from datetime import datetime
-from flask import jsonify, request
+from flask import jsonify, request, Response
 from . import device_bp
-from ..redisconnection import connection as red
 from auths import token_auth as auth
 from utils import bash_command
 from helpers.system_resources_helper import get_cpu_usage, get_memory_usage, get_temperature, get_disk_detail
+from helpers.device_config_cache import get_device_config
 from redis.exceptions import RedisError
 
 @device_bp.route('/system-resources', methods=['GET'])
@@ -74,7 +73,7 @@ def get_system_resources():
 def get_device_information():
     """Get device information including site information, device version, and device model"""
     try:
-        device_data = red.hgetall("device_config")
+        device_data = get_device_config()
         if not device_data:
             return jsonify({
                 "status_code": 404,
@@ -82,31 +81,18 @@ def get_device_information():
                 "data": None
             }), 404
         
-        # Parse JSON strings to objects
-        site_information = {}
-        device_version = {}
-        device_model = {}
-        
-        try:
-            site_info_str = device_data.get("site_information", "{}")
-            if isinstance(site_info_str, str):
-                site_information = json.loads(site_info_str)
-            else:
-                site_information = site_info_str or {}
-        except (json.JSONDecodeError, TypeError):
+        # Fields are already decoded by the device_config cache; a field that is
+        # still a string couldn't be parsed, use the defaults for it
+        site_information = device_data.get("site_information") or {}
+        if isinstance(site_information, str):
             site_information = {
                 "site_id": "PAP9999",
                 "site_name": "Site Name",
                 "address": "Jl. Bakti No. 1"
             }
         
-        try:
-            device_version_str = device_data.get("device_version", "{}")
-            if isinstance(device_version_str, str):
-                device_version = json.loads(device_version_str)
-            else:
-                device_version = device_version_str or {}
-        except (json.JSONDecodeError, TypeError):
+        device_version = device_data.get("device_version") or {}
+        if isinstance(device_version, str):
             device_version = {
                 "ehub_version": "new",
                 "panel2_type": "new",
@@ -117,13 +103,8 @@ def get_device_information():
                 "battery_type": "talis5"
             }
         
-        try:
-            device_model_str = device_data.get("device_model", "{}")
-            if isinstance(device_model_str, str):
-                device_model = json.loads(device_model_str)
-            else:
-                device_model = device_model_str or {}
-        except (json.JSONDecodeError, TypeError):
+        device_model = device_data.get("device_model") or {}
+        if isinstance(device_model, str):
             device_model = {
                 "model": "JSPro MPPT",
                 "part_number": "JP-MPPT-40A",
@@ -152,3 +133,112 @@ def get_device_information():
             "message": "Internal server error",
             "data": None
         }), 500
+
+
+@device_bp.route('/audit-events', methods=['GET'])
+@auth.login_required
+def get_audit_events():
+    """
+    Get the latest security/audit events (admin only)
+    Query parameters:
+    - limit: Maximum events (default: 100, max: 1000)
+    - event_type: Filter by event type (e.g. RESOURCE_ACCESS, PERMISSION_DENIED)
+    - username: Filter by username
+    """
+    if auth.current_user() != 'admin':
+        return jsonify({
+            "status_code": 403,
+            "status": "error",
+            "message": "Admin token required",
+            "data": None
+        }), 403
+    
+    try:
+        from ..audit import query_events, get_pipeline_stats
+        
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+        events = query_events(
+            limit=limit,
+            event_type=request.args.get('event_type'),
+            username=request.args.get('username')
+        )
+        
+        return jsonify({
+            "status_code": 200,
+            "status": "success",
+            "data": {
+                "events": events,
+                "total_events": len(events),
+                "pipeline": get_pipeline_stats(),
+                "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+        }), 200
+    
+    except (RedisError, OSError) as e:
+        print(f"Error getting audit events: {e}")
+        return jsonify({
+            "status_code": 503,
+            "status": "error",
+            "message": "Audit log storage unavailable",
+            "data": None
+        }), 503
+
+
+@device_bp.route('/profiling', methods=['GET'])
+@auth.login_required
+def get_profiling():
+    """
+    Get per-route request timing merged across workers (admin only)
+    Query parameters:
+    - reset: true to clear this worker's stats after reading (default: false)
+    """
+    if auth.current_user() != 'admin':
+        return jsonify({
+            "status_code": 403,
+            "status": "error",
+            "message": "Admin token required",
+            "data": None
+        }), 403
+    
+    try:
+        from ..profiling import get_profiling_stats, reset_profiling_stats
+        
+        stats = get_profiling_stats()
+        if request.args.get('reset', 'false').lower() == 'true':
+            reset_profiling_stats()
+        
+        stats["last_update"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return jsonify({
+            "status_code": 200,
+            "status": "success",
+            "data": stats
+        }), 200
+    
+    except RedisError as e:
+        print(f"Error getting profiling stats: {e}")
+        return jsonify({
+            "status_code": 503,
+            "status": "error",
+            "message": "Profiling storage unavailable",
+            "data": None
+        }), 503
+
+
+@device_bp.route('/profiling/stacks', methods=['GET'])
+@auth.login_required
+def get_profiling_stacks():
+    """
+    Get sampled stacks of this worker in folded format (admin only)
+    Feed the output to flamegraph.pl or speedscope. Requires PROFILE_SAMPLE_RATE > 0.
+    """
+    if auth.current_user() != 'admin':
+        return jsonify({
+            "status_code": 403,
+            "status": "error",
+            "message": "Admin token required",
+            "data": None
+        }), 403
+    
+    from ..profiling import get_folded_stacks
+    
+    return Response(get_folded_stacks(), mimetype='text/plain')
@@ -3,17 +3,24 @@ Logger API for JSPro PowerDesk
 Handles historical data logs
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for
 from datetime import datetime, timedelta
 import sqlite3
 import json
 import os
+import re
 import sys
 from functools import wraps
 from ..redisconnection import connection as red
+from ..responses import conditional, file_version
 from .helper import *
+from .retention import get_retention_status, delete_archived_by_timestamp, delete_archive
+from .unified import query_unified_logs
+from .purge import start_purge, get_purge_job, list_purge_jobs, PURGE_SYNC_MAX_ROWS
 from helpers.system_resources_helper import get_disk_detail
-from config import PATH, scc_type
+from helpers.device_config_cache import get_device_config
+import config
+from config import PATH
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
@@ -34,16 +41,26 @@ logger_bp = Blueprint('logger', __name__)
 # ============== Configuration & Helper Functions ===========================
 
 # Log type mapping configuration
+# retention: how long/how many stream entries Redis keeps; older entries are
+# moved to archive_table in stream_archive.db (see retention.py)
 LOG_TYPE_CONFIG = {
     'battery': {
         'redis_stream': 'stream:battery',
         'sqlite_table': 'loggers_battery',
-        'description': 'Battery monitoring logs'
+        'description': 'Battery monitoring logs',
+        'retention': {'max_age_days': 7, 'max_length': None, 'archive_table': 'archive_stream_battery'}
     },
     'scc': {
         'redis_stream': 'stream:scc',
         'sqlite_table': 'loggers_scc',
-        'description': 'Energy/SCC monitoring logs'
+        'description': 'Energy/SCC monitoring logs',
+        'retention': {'max_age_days': 7, 'max_length': None, 'archive_table': 'archive_stream_scc'}
+    },
+    'scc_alarm': {
+        'redis_stream': 'stream:scc-logs',
+        'sqlite_table': None,  # Alarms only live in the stream (and its archive)
+        'description': 'SCC alarm logs',
+        'retention': {'max_age_days': 30, 'max_length': 10000, 'archive_table': 'archive_stream_scc_logs'}
     },
     'bakti_mqtt': {
         'redis_stream': None,  # No Redis stream for bakti_mqtt
@@ -55,35 +72,22 @@ LOG_TYPE_CONFIG = {
 def get_site_info():
     """Get site information from Redis"""
     try:
-        # Get raw data from Redis
-        site_information_raw = red.hget('device_config', 'site_information')
-        ip_configuration_raw = red.hget('device_config', 'ip_configuration')
+        # Decoded once per device_config version, not per request
+        device_data = get_device_config()
+        site_information = device_data.get('site_information')
+        ip_configuration = device_data.get('ip_configuration')
         
         # Default values
         site_id = 'UNKNOWN'
         site_name = 'UNKNOWN SITE'
         ip_address = '0.0.0.0'
         
-        # Parse site information
-        if site_information_raw:
-            try:
-                if isinstance(site_information_raw, bytes):
-                    site_information_raw = site_information_raw.decode('utf-8')
-                site_information = json.loads(site_information_raw)
-                site_id = site_information.get('site_id', 'UNKNOWN')
-                site_name = site_information.get('site_name', 'UNKNOWN SITE')
-            except (json.JSONDecodeError, AttributeError) as e:
-                pass  # Keep default values
+        if isinstance(site_information, dict):
+            site_id = site_information.get('site_id', 'UNKNOWN')
+            site_name = site_information.get('site_name', 'UNKNOWN SITE')
         
-        # Parse IP configuration
-        if ip_configuration_raw:
-            try:
-                if isinstance(ip_configuration_raw, bytes):
-                    ip_configuration_raw = ip_configuration_raw.decode('utf-8')
-                ip_configuration = json.loads(ip_configuration_raw)
-                ip_address = ip_configuration.get('ip_address', '0.0.0.0')
-            except (json.JSONDecodeError, AttributeError) as e:
-                pass  # Keep default value
+        if isinstance(ip_configuration, dict):
+            ip_address = ip_configuration.get('ip_address', '0.0.0.0')
         
         return {
             'site_id': site_id,
@@ -356,8 +360,8 @@ def get_storage_overview():
                 
                 # Get statistics for each Redis stream
                 redis_stats = {}
-                for log_type, config in LOG_TYPE_CONFIG.items():
-                    stream_name = config['redis_stream']
+                for log_type, type_config in LOG_TYPE_CONFIG.items():
+                    stream_name = type_config['redis_stream']
                     if stream_name:  # Only if Redis stream exists
                         try:
                             redis_stats[stream_name] = get_redis_stream_stats(stream_name)
@@ -376,17 +380,18 @@ def get_storage_overview():
             if os.path.exists(sqlite_db_path):
                 sqlite_total_size += os.path.getsize(sqlite_db_path)
             
-            # Add bakti_mqtt.db size if it exists
-            if os.path.exists(SQLITE_DB_PATH_BAKTI_MQTT):
-                sqlite_total_size += os.path.getsize(SQLITE_DB_PATH_BAKTI_MQTT)
+            # Add bakti_mqtt.db and stream_archive.db sizes if they exist
+            for extra_db_path in (SQLITE_DB_PATH_BAKTI_MQTT, SQLITE_DB_PATH_STREAM_ARCHIVE):
+                if os.path.exists(extra_db_path):
+                    sqlite_total_size += os.path.getsize(extra_db_path)
             
             sqlite_storage_mb = round(sqlite_total_size / (1024 * 1024), 2)
             overview_data["storage_overview"]["sqlite"]["size"] = sqlite_storage_mb
             
             # Get statistics for each SQLite table
             sqlite_stats = {}
-            for log_type, config in LOG_TYPE_CONFIG.items():
-                table_name = config['sqlite_table']
+            for log_type, type_config in LOG_TYPE_CONFIG.items():
+                table_name = type_config['sqlite_table']
                 if table_name:
                     try:
                         # Use bakti_mqtt.db for bakti_mqtt log type
@@ -399,6 +404,9 @@ def get_storage_overview():
         except Exception:
             pass
 
+        # Stream retention settings and how far each stream has been archived
+        overview_data["retention"] = get_retention_status(LOG_TYPE_CONFIG)
+
         return jsonify({
             "status": "success",
             "status_code": 200,
@@ -574,8 +582,96 @@ def get_sqlite_logs_handler(log_type, limit, offset, start_date, end_date):
         }
 
 
+def get_unified_logs_handler(log_type, limit, offset, start_date, end_date, cursor=None):
+    """
+    Handler function for getting logs from the Redis stream and its SQLite archive
+    Returns formatted response with site_info, page_info (plus next_cursor), and data
+    """
+    try:
+        stream_name = get_stream_name(log_type)
+        if not stream_name:
+            return {
+                'status': 'error',
+                'status_code': 400,
+                'message': f'Redis stream not available for log_type: {log_type}'
+            }
+        
+        # Validate dates
+        start_dt = validate_date_format(start_date) if start_date else None
+        end_dt = validate_date_format(end_date) if end_date else None
+        
+        if start_date and start_dt is False:
+            return {
+                'status': 'error',
+                'status_code': 400,
+                'message': 'Invalid start_date format'
+            }
+        
+        if end_date and end_dt is False:
+            return {
+                'status': 'error',
+                'status_code': 400,
+                'message': 'Invalid end_date format'
+            }
+        
+        retention = LOG_TYPE_CONFIG[log_type].get('retention') or {}
+        result = query_unified_logs(
+            stream_name,
+            retention.get('archive_table'),
+            int(start_dt.timestamp() * 1000) if start_dt else None,
+            int(end_dt.timestamp() * 1000) if end_dt else None,
+            limit,
+            offset,
+            cursor
+        )
+        
+        page_info = paginate_data(data=None, limit=limit, offset=offset, total_records=result['total_records'])
+        # total_records covers the whole range, not only what follows the cursor
+        page_info['has_next'] = result['next_cursor'] is not None
+        page_info['next_cursor'] = result['next_cursor']
+        page_info['total_records_estimated'] = result['total_records_estimated']
+        
+        return {
+            'status': 'success',
+            'status_code': 200,
+            'site_info': get_site_info(),
+            'page_info': page_info,
+            'data': {
+                'statistics': {
+                    'redis': get_redis_stream_stats(stream_name),
+                    'archive_watermark': result['watermark']
+                },
+                'logs': [format_response_data(record) for record in result['records']]
+            },
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        
+    except Exception as e:
+        return {
+            'status': 'error',
+            'status_code': 500,
+            'message': f'Failed to retrieve unified logs: {str(e)}'
+        }
+
+
+def _logs_version(log_type):
+    """Data version of /data/logs/<log_type> (stream or database, and the site info)"""
+    if not validate_log_type(log_type):
+        return None
+    
+    source = request.args.get('source', 'redis' if log_type != 'bakti_mqtt' else 'sqlite')
+    if source == 'redis':
+        data_version = get_stream_version(get_stream_name(log_type))
+    elif source == 'unified':
+        data_version = get_stream_version(get_stream_name(log_type)), file_version(SQLITE_DB_PATH_STREAM_ARCHIVE)
+    else:
+        data_version = file_version(SQLITE_DB_PATH_BAKTI_MQTT if log_type == 'bakti_mqtt' else SQLITE_DB_PATH)
+    return data_version, get_site_info()
+
+
 @logger_bp.route('/data/logs/<log_type>', methods=['GET'])
 @api_session_required
+@conditional(_logs_version)
 def get_unified_logs(log_type):
     """
     Unified endpoint for getting logs from Redis or SQLite
@@ -584,9 +680,11 @@ def get_unified_logs(log_type):
     - log_type: 'battery' | 'scc' | 'bakti_mqtt'
     
     Query parameters:
-    - source: 'redis' | 'sqlite' (default: 'redis' for battery/scc, 'sqlite' for bakti_mqtt)
+    - source: 'redis' | 'sqlite' | 'unified' (default: 'redis' for battery/scc, 'sqlite' for bakti_mqtt)
+      unified: Redis stream plus its SQLite archive, merged newest first (see unified.py)
     - limit: Maximum records (default: 1000, max: 10000)
     - offset: Records to skip (default: 0)
+    - cursor: unified only, page_info.next_cursor of the previous page
     - start_date: Start date (ISO 8601 format)
     - end_date: End date (ISO 8601 format)
     """
@@ -605,17 +703,26 @@ def get_unified_logs(log_type):
         offset = int(request.args.get('offset', 0))
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        cursor = request.args.get('cursor')
         
         # Route to appropriate handler
         if source == 'redis':
             result = get_redis_logs_handler(log_type, limit, offset, start_date, end_date)
         elif source == 'sqlite':
             result = get_sqlite_logs_handler(log_type, limit, offset, start_date, end_date)
+        elif source == 'unified':
+            if cursor and not re.fullmatch(r'\d+-\d+(:\d+~?)?', cursor):
+                return jsonify({
+                    "status": "error",
+                    "status_code": 400,
+                    "message": "Invalid cursor. Must be page_info.next_cursor"
+                }), 400
+            result = get_unified_logs_handler(log_type, limit, offset, start_date, end_date, cursor)
         else:
             return jsonify({
                 "status": "error",
                 "status_code": 400,
-                "message": "Invalid source. Must be 'redis' or 'sqlite'"
+                "message": "Invalid source. Must be 'redis', 'sqlite' or 'unified'"
             }), 400
         
         status_code = result.pop('status_code', 200)
@@ -650,6 +757,8 @@ def delete_logs_by_timestamp(log_type, timestamp):
     Query parameters:
     - source: 'redis' | 'sqlite' (required)
     - match_type: 'exact' | 'prefix' (default: 'exact')
+
+    SQLite deletes of more than PURGE_SYNC_MAX_ROWS rows run as a purge job (202)
     """
     try:
         # Validate log_type
@@ -716,26 +825,43 @@ def delete_logs_by_timestamp(log_type, timestamp):
                     "error": result["error"]
                 }), 500
             
-            if not result.get("timestamp_exists", False):
+            # Archived copies (retention.py) would still show up with source=unified
+            archive_table = (LOG_TYPE_CONFIG[log_type].get('retention') or {}).get('archive_table')
+            try:
+                archive_deleted = delete_archived_by_timestamp(archive_table, timestamp, match_type) if archive_table else 0
+            except sqlite3.Error as e:
+                return jsonify({
+                    "status": "error",
+                    "status_code": 500,
+                    "message": "Deleted from the Redis stream but failed to delete archived entries by timestamp",
+                    "error": str(e)
+                }), 500
+            total_deleted = result["total_deleted"] + archive_deleted
+            
+            if not total_deleted:
                 return jsonify({
                     "status": "error",
                     "status_code": 404,
                     "message": f"Timestamp {'prefix' if match_type == 'prefix' else 'exact match'} '{timestamp}' not found in Redis stream ({stream_name})",
                     "data": {
                         "streams_deleted": result.get("streams_deleted", {}),
+                        "archive_deleted": 0,
                         "total_deleted": 0,
-                        "timestamp_exists": False
+                        "timestamp_exists": False,
+                        "scan_methods": result.get("scan_methods", {})
                     }
                 }), 404
             
             return jsonify({
                 "status": "success",
                 "status_code": 200,
-                "message": f"Successfully deleted {result['total_deleted']} entries with timestamp {'matching prefix' if match_type == 'prefix' else 'exactly matching'} '{timestamp}' from stream ({stream_name})",
+                "message": f"Successfully deleted {total_deleted} entries with timestamp {'matching prefix' if match_type == 'prefix' else 'exactly matching'} '{timestamp}' from stream ({stream_name}){' and its archive' if archive_deleted else ''}",
                 "data": {
                     "streams_deleted": result.get("streams_deleted", {}),
-                    "total_deleted": result["total_deleted"],
-                    "timestamp_exists": result["timestamp_exists"]
+                    "archive_deleted": archive_deleted,
+                    "total_deleted": total_deleted,
+                    "timestamp_exists": True,
+                    "scan_methods": result.get("scan_methods", {})
                 }
             }), 200
         
@@ -760,7 +886,7 @@ def delete_logs_by_timestamp(log_type, timestamp):
                 }), 503
             
             # Delete from SQLite
-            result = delete_sqlite_by_timestamp(conn, timestamp, table_name, match_type, False)
+            result = delete_sqlite_by_timestamp(conn, timestamp, table_name, match_type, False, max_rows=PURGE_SYNC_MAX_ROWS)
             conn.close()
             
             if "error" in result:
@@ -782,6 +908,9 @@ def delete_logs_by_timestamp(log_type, timestamp):
                         "table_name": table_name
                     }
                 }), 404
+
+            if result.get("deferred"):
+                return _purge_job_response(log_type, db_path or SQLITE_DB_PATH, table_name, match_type, timestamp)
             
             return jsonify({
                 "status": "success",
@@ -815,6 +944,10 @@ def delete_all_logs(log_type):
     Query parameters:
     - source: 'redis' | 'sqlite' (required)
     - confirm: Must be 'yes' to confirm deletion (required)
+    - vacuum: 'true' to return the freed pages to the file system afterwards (sqlite only)
+
+    source=redis also deletes the stream's archived entries (stream_archive.db)
+    SQLite tables are purged by a background job (202 + job), see GET /data/purge/<job_id>
     """
     try:
         # Validate log_type
@@ -869,28 +1002,49 @@ def delete_all_logs(log_type):
                 
                 # Delete the entire stream
                 deleted = red.delete(stream_name)
-                total_deleted = stream_length if deleted else 0
-                
-                return jsonify({
-                    "status": "success",
-                    "status_code": 200,
-                    "message": f"Successfully deleted {total_deleted} entries from Redis stream ({stream_name})",
-                    "data": {
-                        "stream_name": stream_name,
-                        "total_deleted": total_deleted
-                    }
-                }), 200
-            except Exception as e:
+                stream_deleted = stream_length if deleted else 0
+            except Exception:
                 # Stream doesn't exist or error
+                stream_deleted = 0
+            
+            # Archived entries (retention.py) and the watermark go too, otherwise
+            # source=unified would still return them
+            archive_table = (LOG_TYPE_CONFIG[log_type].get('retention') or {}).get('archive_table')
+            try:
+                archive_deleted = delete_archive(archive_table, stream_name) if archive_table else 0
+            except sqlite3.Error as e:
+                return jsonify({
+                    "status": "error",
+                    "status_code": 500,
+                    "message": f"Deleted the Redis stream ({stream_name}) but failed to delete its archive",
+                    "error": str(e)
+                }), 500
+            total_deleted = stream_deleted + archive_deleted
+            
+            if not total_deleted:
                 return jsonify({
                     "status": "success",
                     "status_code": 200,
                     "message": f"Redis stream ({stream_name}) is already empty or doesn't exist",
                     "data": {
                         "stream_name": stream_name,
+                        "stream_deleted": 0,
+                        "archive_deleted": 0,
                         "total_deleted": 0
                     }
                 }), 200
+            
+            return jsonify({
+                "status": "success",
+                "status_code": 200,
+                "message": f"Successfully deleted {total_deleted} entries from Redis stream ({stream_name}){' and its archive' if archive_deleted else ''}",
+                "data": {
+                    "stream_name": stream_name,
+                    "stream_deleted": stream_deleted,
+                    "archive_deleted": archive_deleted,
+                    "total_deleted": total_deleted
+                }
+            }), 200
         
         # Handle SQLite bulk deletion
         elif source == 'sqlite':
@@ -913,12 +1067,11 @@ def delete_all_logs(log_type):
                 }), 503
             
             try:
-                # Get count before deletion
-                cursor = conn.execute(f"SELECT COUNT(*) as total FROM {table_name}")
-                total_before = cursor.fetchone()['total']
+                # Cheap emptiness check; the job counts the rows itself
+                is_empty = conn.execute(f"SELECT 1 FROM {table_name} LIMIT 1").fetchone() is None
+                conn.close()
                 
-                if total_before == 0:
-                    conn.close()
+                if is_empty:
                     return jsonify({
                         "status": "success",
                         "status_code": 200,
@@ -929,22 +1082,8 @@ def delete_all_logs(log_type):
                         }
                     }), 200
                 
-                # Delete all records
-                cursor = conn.execute(f"DELETE FROM {table_name}")
-                conn.commit()
-                deleted_count = cursor.rowcount
-                conn.close()
-                
-                return jsonify({
-                    "status": "success",
-                    "status_code": 200,
-                    "message": f"Successfully deleted all {deleted_count} records from table '{table_name}'",
-                    "data": {
-                        "table_name": table_name,
-                        "deleted_count": deleted_count,
-                        "records_before_deletion": total_before
-                    }
-                }), 200
+                return _purge_job_response(log_type, db_path or SQLITE_DB_PATH, table_name, 'all',
+                                           vacuum=request.args.get('vacuum', '').lower() == 'true')
             except Exception as e:
                 conn.close()
                 return jsonify({
@@ -963,10 +1102,94 @@ def delete_all_logs(log_type):
         }), 500
 
 
+def _purge_job_response(log_type, db_path, table_name, match_type, timestamp=None, vacuum=False):
+    """Start a purge job: 202 with the job, 409 if one is already running on the table"""
+    job, started = start_purge(log_type, db_path, table_name, match_type, timestamp, vacuum)
+    data = {
+        "job": job,
+        "status_url": url_for('logger.get_purge_job_status', job_id=job['job_id'])
+    }
+    if not started:
+        return jsonify({
+            "status": "error",
+            "status_code": 409,
+            "message": f"A purge of table '{table_name}' is already running",
+            "data": data
+        }), 409
+
+    return jsonify({
+        "status": "success",
+        "status_code": 202,
+        "message": f"Purge of table '{table_name}' started",
+        "data": data
+    }), 202
+
+
+@logger_bp.route('/data/purge', methods=['GET'])
+@api_session_required
+def get_purge_jobs():
+    """Recent purge jobs (last 24 hours), newest first"""
+    try:
+        return jsonify({
+            "status": "success",
+            "status_code": 200,
+            "data": list_purge_jobs()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "status_code": 500,
+            "message": "Failed to retrieve purge jobs",
+            "error": str(e)
+        }), 500
+
+
+@logger_bp.route('/data/purge/<job_id>', methods=['GET'])
+@api_session_required
+def get_purge_job_status(job_id):
+    """
+    Progress of a purge job
+
+    state: queued | running | vacuuming | done | failed | interrupted
+    """
+    try:
+        job = get_purge_job(job_id)
+        if not job:
+            return jsonify({
+                "status": "error",
+                "status_code": 404,
+                "message": f"Purge job '{job_id}' not found"
+            }), 404
+
+        return jsonify({
+            "status": "success",
+            "status_code": 200,
+            "data": job
+        }), 200
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "status_code": 500,
+            "message": "Failed to retrieve purge job",
+            "error": str(e)
+        }), 500
+
+
 # ============== SCC Alarm Log Endpoints ===========================
 
+def _scc_alarm_version():
+    """Data version of the SCC alarm stream"""
+    return get_stream_version('stream:scc-logs')
+
+
+def _scc_alarm_overview_version():
+    """Data version of /scc-alarm/overview (alarms are counted per SCC type)"""
+    return config.scc_type, _scc_alarm_version()
+
+
 @logger_bp.route('/scc-alarm/overview', methods=['GET'])
 @api_session_required
+@conditional(_scc_alarm_overview_version)
 def get_scc_alarm_overview():
     """Get SCC alarm log overview from Redis Stream"""
     try:
@@ -1030,7 +1253,7 @@ def get_scc_alarm_overview():
                                         has_active_alarm = False
                                         
                                         # Process based on SCC type
-                                        if scc_type == 'scc-srne':
+                                        if config.scc_type == 'scc-srne':
                                             # Handle SRNE format: check fault values for 1
                                             if 'fault' in alarm_obj and isinstance(alarm_obj['fault'], dict):
                                                 for fault_type, fault_value in alarm_obj['fault'].items():
@@ -1048,7 +1271,7 @@ def get_scc_alarm_overview():
                                                         # Count normal status
                                                         severity_count['normal'] += 1
                                         
-                                        elif scc_type == 'scc-epever':
+                                        elif config.scc_type == 'scc-epever':
                                             # Handle EPEVER format: nested categories with status values
                                             for category, category_alarms in alarm_obj.items():
                                                 if isinstance(category_alarms, dict):
@@ -1090,7 +1313,7 @@ def get_scc_alarm_overview():
                 total_alarms = 0
 
         overview_data = {
-            "scc_type": scc_type,
+            "scc_type": config.scc_type,
             "total_alarms": total_alarms,
             "active_alarms": active_alarms,
             "last_alarm_time": last_alarm_time.strftime("%Y-%m-%d %H:%M:%S") if last_alarm_time else None,
@@ -1118,6 +1341,7 @@ def get_scc_alarm_overview():
 
 @logger_bp.route('/scc-alarm', methods=['GET'])
 @api_session_required
+@conditional(_scc_alarm_version)
 def download_scc_alarms():
     """
     Download all SCC alarm logs from Redis Stream
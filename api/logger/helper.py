@@ -2,11 +2,28 @@
 from datetime import datetime
 import sqlite3
 import json
+import redis
 from ..redisconnection import connection as red
+from ..profiling import ProfiledConnection
 from config import PATH
 
 SQLITE_DB_PATH = f'{PATH}/database/data_storage.db'
 SQLITE_DB_PATH_BAKTI_MQTT = f'{PATH}/database/mqtt_logs.db'
+# Redis stream entries moved out by the retention manager (api/logger/retention.py)
+SQLITE_DB_PATH_STREAM_ARCHIVE = f'{PATH}/database/stream_archive.db'
+
+# Stream entry timestamp field format (YYYYMMDDTHHMMSS) with the earliest value of each position
+STREAM_TIMESTAMP_TEMPLATE = '00000101T000000'
+# Time covered by a timestamp prefix of each length (8 = one day ... 15 = one second)
+TIMESTAMP_PREFIX_SPAN_MS = {
+    8: 86400000, 9: 86400000, 10: 36000000, 11: 3600000,
+    12: 600000, 13: 60000, 14: 10000, 15: 1000
+}
+# Entry ids are assigned when the collector adds the entry, after its timestamp
+STREAM_ID_SLACK_MS = 300000
+# Entries read per XRANGE and XDEL commands queued per pipeline when deleting
+STREAM_DELETE_BATCH_SIZE = 500
+STREAM_DELETE_PIPELINE_DEPTH = 10
 
 def get_sqlite_connection(db_path=None):
     """Get SQLite database connection
@@ -17,7 +34,7 @@ def get_sqlite_connection(db_path=None):
     try:
         if db_path is None:
             db_path = SQLITE_DB_PATH
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=ProfiledConnection)
         conn.row_factory = sqlite3.Row  # Enable dict-like access
         return conn
     except Exception as e:
@@ -161,6 +178,30 @@ def process_redis_stream(stream_name, start_dt=None, end_dt=None, redis_start_ts
         'filtered_count': filtered_count
     }
 
+def get_stream_version(stream_name):
+    """Data version of a Redis stream: length, first entry id and last generated id (None if missing)"""
+    try:
+        info = red.xinfo_stream(stream_name)
+    except redis.ResponseError:
+        return None
+    first_entry = info.get('first-entry')
+    return (
+        info['length'],
+        info['last-generated-id'],
+        first_entry[0] if first_entry else None,
+        info.get('max-deleted-entry-id')
+    )
+
+def parse_stream_id(stream_id):
+    """'1718000000000-3' -> (1718000000000, 3)"""
+    ms, _, seq = str(stream_id).partition('-')
+    return int(ms), int(seq or 0)
+
+def next_stream_id(stream_id):
+    """Smallest stream id after stream_id"""
+    ms, seq = parse_stream_id(stream_id)
+    return f'{ms}-{seq + 1}'
+
 def convert_to_redis_timestamp_format(dt):
     """Convert datetime object to Redis timestamp format (YYYYMMDDTHHMMSS)"""
     return dt.strftime('%Y%m%dT%H%M%S') if dt else None
@@ -337,7 +378,11 @@ def process_sqlite_data(conn, start_dt=None, end_dt=None, table_name='', limit=1
             "error": str(e)
         }
 
-def delete_sqlite_by_timestamp(conn, timestamp, table_name='', match_type='exact', debug_mode=False):
+def timestamp_prefix_range(prefix):
+    """[start, end) string range of the timestamps starting with prefix (index-friendly LIKE 'prefix%')"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def delete_sqlite_by_timestamp(conn, timestamp, table_name='', match_type='exact', debug_mode=False, max_rows=None):
     """
     Delete SQLite data by timestamp with validation
     
@@ -347,6 +392,8 @@ def delete_sqlite_by_timestamp(conn, timestamp, table_name='', match_type='exact
     - table_name: Target table name
     - match_type: 'exact' or 'prefix'
     - debug_mode: Enable debug information
+    - max_rows: Only delete when at most this many rows match, otherwise return
+      with "deferred": True (the caller runs a purge job, see purge.py)
     
     Returns:
     - Dictionary with deletion results and validation
@@ -365,9 +412,10 @@ def delete_sqlite_by_timestamp(conn, timestamp, table_name='', match_type='exact
             delete_query = f"DELETE FROM {table_name} WHERE timestamp = ?"
             params = [timestamp]
         elif match_type == 'prefix':
-            check_query = f"SELECT COUNT(*) as count FROM {table_name} WHERE timestamp LIKE ?"
-            delete_query = f"DELETE FROM {table_name} WHERE timestamp LIKE ?"
-            params = [f"{timestamp}%"]
+            # Range instead of LIKE so the timestamp index is used
+            check_query = f"SELECT COUNT(*) as count FROM {table_name} WHERE timestamp >= ? AND timestamp < ?"
+            delete_query = f"DELETE FROM {table_name} WHERE timestamp >= ? AND timestamp < ?"
+            params = list(timestamp_prefix_range(timestamp))
         else:
             return {
                 "error": "Invalid match_type. Must be 'exact' or 'prefix'",
@@ -393,6 +441,10 @@ def delete_sqlite_by_timestamp(conn, timestamp, table_name='', match_type='exact
                 "existing_records": existing_count
             }
 
+        if max_rows is not None and existing_count > max_rows:
+            result["deferred"] = True
+            return result
+
         # Only delete if records exist
         if existing_count > 0:
             cursor = conn.execute(delete_query, params)
@@ -411,10 +463,121 @@ def delete_sqlite_by_timestamp(conn, timestamp, table_name='', match_type='exact
             "timestamp_exists": False
         }
 
+def timestamp_id_range(timestamp, match_type='exact'):
+    """
+    Stream id range (min_id, max_id) that can hold entries with this timestamp
+    field (YYYYMMDDTHHMMSS, a prefix of it for match_type='prefix'), None if
+    the timestamp isn't in that format
+
+    Entry ids are the time the entry was added, so the range is widened by
+    STREAM_ID_SLACK_MS on both sides; the timestamp field still decides.
+    """
+    if match_type == 'exact':
+        prefix = timestamp if len(timestamp) == len(STREAM_TIMESTAMP_TEMPLATE) else None
+    else:
+        prefix = timestamp if len(timestamp) <= len(STREAM_TIMESTAMP_TEMPLATE) else None
+    if not prefix or len(prefix) < 8:
+        return None
+
+    try:
+        start = datetime.strptime(prefix + STREAM_TIMESTAMP_TEMPLATE[len(prefix):], '%Y%m%dT%H%M%S')
+    except ValueError:
+        return None
+
+    start_ms = int(start.timestamp() * 1000)
+    end_ms = start_ms + TIMESTAMP_PREFIX_SPAN_MS[len(prefix)]
+    return f'{start_ms - STREAM_ID_SLACK_MS}-0', f'({end_ms + STREAM_ID_SLACK_MS}-0'
+
+def _entry_timestamp(fields):
+    """timestamp field of a stream entry, for decoded and non-decoded Redis connections"""
+    value = fields.get('timestamp', fields.get(b'timestamp', ''))
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+def _delete_matching_entries(redis_conn, stream_name, matches, min_id='-', max_id='+'):
+    """
+    Delete the entries of stream_name within [min_id, max_id] whose timestamp
+    field matches, reading STREAM_DELETE_BATCH_SIZE entries at a time
+
+    Matches are removed with pipelined XDEL batches; a run of matches starting
+    at the head of the stream is removed with XTRIM MINID instead.
+
+    Returns:
+    - (deleted, scanned) entry counts
+    """
+    head = redis_conn.xrange(stream_name, count=1)
+    if not head:
+        return 0, 0
+
+    # Matches are trimmed from the head while they are the first entries of the stream
+    head_id = head[0][0]
+    at_head = True
+    head_last = None
+    pending = []
+    deleted = 0
+    scanned = 0
+    pipe = redis_conn.pipeline(transaction=False)
+    start_id = min_id
+
+    while True:
+        chunk = redis_conn.xrange(stream_name, min=start_id, max=max_id, count=STREAM_DELETE_BATCH_SIZE)
+        for entry_id, fields in chunk:
+            scanned += 1
+            if matches(_entry_timestamp(fields)):
+                if at_head and (head_last or entry_id == head_id):
+                    head_last = entry_id
+                else:
+                    at_head = False
+                    pending.append(entry_id)
+            else:
+                at_head = False
+
+        if pending:
+            pipe.xdel(stream_name, *pending)
+            pending = []
+            if len(pipe) >= STREAM_DELETE_PIPELINE_DEPTH:
+                deleted += sum(pipe.execute())
+
+        if len(chunk) < STREAM_DELETE_BATCH_SIZE:
+            break
+        start_id = f"({chunk[-1][0]}"
+
+    if len(pipe):
+        deleted += sum(pipe.execute())
+    if head_last:
+        deleted += redis_conn.xtrim(stream_name, minid=next_stream_id(head_last), approximate=False)
+    return deleted, scanned
+
+def _widen_id_range(redis_conn, stream_name, matches, lower_ms, upper_ms, step_ms):
+    """
+    Next id window [start_ms, end_ms) to scan next to [lower_ms, upper_ms),
+    on the side(s) where the neighbouring entry matches too, None if neither does
+
+    The window is step_ms wide and reaches at least the matching neighbour.
+    """
+    before = redis_conn.xrevrange(stream_name, max=f"({lower_ms}-0", count=1)
+    after = redis_conn.xrange(stream_name, min=f"{upper_ms}-0", count=1)
+    start_ms, end_ms = lower_ms, upper_ms
+    if before and matches(_entry_timestamp(before[0][1])):
+        start_ms = min(lower_ms - step_ms, parse_stream_id(before[0][0])[0])
+    if after and matches(_entry_timestamp(after[0][1])):
+        end_ms = max(upper_ms + step_ms, parse_stream_id(after[0][0])[0] + 1)
+    if (start_ms, end_ms) == (lower_ms, upper_ms):
+        return None
+    return start_ms, end_ms
+
 def delete_entries_by_timestamp_section(redis_conn, timestamp, match_type='exact', target_streams=None, debug_mode=False):
     """
     Delete Redis stream entries by timestamp from specific streams (section-aware)
     
+    Only the stream id range that can hold the timestamp is read (see
+    timestamp_id_range). Entries added more than STREAM_ID_SLACK_MS away from
+    their timestamp (late or batched collectors, clock/timezone offsets) fall
+    outside it: while the entry right next to the scanned range matches, the
+    range is widened on that side by a doubling step. A timestamp that isn't
+    in the stream (typo, already archived) costs one range read, not a scan.
+    Each stream reports how it was scanned in "scan_methods" ('id_range',
+    'widened' or 'full_scan' for timestamps that aren't YYYYMMDD...).
+    
     Parameters:
     - redis_conn: Redis connection object
     - timestamp: Timestamp to delete (exact match or prefix)
@@ -434,13 +597,29 @@ def delete_entries_by_timestamp_section(redis_conn, timestamp, match_type='exact
                 "streams_deleted": {}
             }
         
+        if match_type not in ('exact', 'prefix'):
+            return {
+                "error": "Invalid match_type. Must be 'exact' or 'prefix'",
+                "total_deleted": 0,
+                "timestamp_exists": False,
+                "streams_deleted": {}
+            }
+        
         if not target_streams:
-            target_streams = ['stream:bms', 'stream:energy']  # Default streams
+            target_streams = ['stream:battery', 'stream:scc']  # Default streams
+        
+        if match_type == 'exact':
+            matches = lambda entry_timestamp: entry_timestamp == timestamp
+        else:
+            matches = lambda entry_timestamp: entry_timestamp.startswith(timestamp)
+        
+        id_range = timestamp_id_range(timestamp, match_type)
         
         result = {
             "total_deleted": 0,
             "timestamp_exists": False,
             "streams_deleted": {},
+            "scan_methods": {},
             "debug_info": {} if debug_mode else None
         }
         
@@ -449,91 +628,56 @@ def delete_entries_by_timestamp_section(redis_conn, timestamp, match_type='exact
                 "timestamp_filter": timestamp,
                 "match_type": match_type,
                 "target_streams": target_streams,
+                "id_range": list(id_range) if id_range else None,
                 "streams_processed": [],
-                "entries_found": {},
-                "validation_method": "section_aware_delete"
+                "entries_scanned": {}
             }
         
         # Process each target stream
         for stream_name in target_streams:
-            deleted_count = 0
-            stream_has_timestamp = False
-            
             try:
                 # Check if stream exists first
                 try:
-                    stream_info = redis_conn.xinfo_stream(stream_name)
-                    total_entries = stream_info['length']
-                    if total_entries == 0:
+                    if redis_conn.xlen(stream_name) == 0:
                         continue
-                except:
+                except redis.ResponseError:
                     continue  # Stream doesn't exist, skip
                 
                 if debug_mode:
                     result["debug_info"]["streams_processed"].append(stream_name)
-                    result["debug_info"]["entries_found"][stream_name] = total_entries
                 
-                # Optimized search and delete based on match type
-                entries_to_delete = []
-                
-                if match_type == 'exact':
-                    # For exact match, scan efficiently
-                    chunk_size = 100
-                    start_id = "-"
-                    
+                if id_range:
+                    deleted_count, scanned = _delete_matching_entries(redis_conn, stream_name, matches, *id_range)
+                    scan_method = "id_range"
+                    lower_ms = parse_stream_id(id_range[0])[0]
+                    upper_ms = parse_stream_id(id_range[1].lstrip('('))[0]
+                    step_ms = STREAM_ID_SLACK_MS
                     while True:
-                        chunk = redis_conn.xrange(stream_name, min=start_id, count=chunk_size)
-                        if not chunk:
-                            break
-                        
-                        for entry_id, fields in chunk:
-                            # Check timestamp field - handle both decoded and non-decoded Redis connections
-                            if 'timestamp' in fields:
-                                entry_timestamp = fields['timestamp']  # For decode_responses=True
-                            elif b'timestamp' in fields:
-                                timestamp_value = fields[b'timestamp']
-                                entry_timestamp = timestamp_value.decode('utf-8') if isinstance(timestamp_value, bytes) else timestamp_value
-                            else:
-                                entry_timestamp = ''
-                            
-                            if entry_timestamp == timestamp:
-                                entries_to_delete.append(entry_id)
-                                stream_has_timestamp = True
-                        
-                        # Update start_id for next chunk
-                        start_id = f"({chunk[-1][0]}"
-                        
-                        # Stop if we've found entries and we're doing exact match
-                        if entries_to_delete and match_type == 'exact':
+                        window = _widen_id_range(redis_conn, stream_name, matches, lower_ms, upper_ms, step_ms)
+                        if not window:
                             break
+                        scan_method = "widened"
+                        start_ms, end_ms = window
+                        for window_min, window_max in ((start_ms, lower_ms), (upper_ms, end_ms)):
+                            if window_min < window_max:
+                                counts = _delete_matching_entries(redis_conn, stream_name, matches, f"{window_min}-0", f"({window_max}-0")
+                                deleted_count += counts[0]
+                                scanned += counts[1]
+                        lower_ms, upper_ms = window
+                        step_ms *= 2
+                else:
+                    deleted_count, scanned = _delete_matching_entries(redis_conn, stream_name, matches)
+                    scan_method = "full_scan"
                 
-                elif match_type == 'prefix':
-                    # For prefix match, need to scan all entries
-                    all_entries = redis_conn.xrange(stream_name)
-                    
-                    for entry_id, fields in all_entries:
-                        # Check timestamp field - handle both decoded and non-decoded Redis connections
-                        if 'timestamp' in fields:
-                            entry_timestamp = fields['timestamp']  # For decode_responses=True
-                        elif b'timestamp' in fields:
-                            timestamp_value = fields[b'timestamp']
-                            entry_timestamp = timestamp_value.decode('utf-8') if isinstance(timestamp_value, bytes) else timestamp_value
-                        else:
-                            entry_timestamp = ''
-                        
-                        if entry_timestamp.startswith(timestamp):
-                            entries_to_delete.append(entry_id)
-                            stream_has_timestamp = True
-                
-                # Delete found entries
-                if entries_to_delete:
-                    deleted_count = redis_conn.xdel(stream_name, *entries_to_delete)
+                if debug_mode:
+                    result["debug_info"]["entries_scanned"][stream_name] = scanned
                 
                 # Update results
                 result["streams_deleted"][stream_name] = deleted_count
+                result["scan_methods"][stream_name] = scan_method
                 result["total_deleted"] += deleted_count
                 
-                if stream_has_timestamp:
+                if deleted_count:
                     result["timestamp_exists"] = True
                 
             except Exception as stream_error:
@@ -542,7 +686,7 @@ def delete_entries_by_timestamp_section(redis_conn, timestamp, match_type='exact
                         result["debug_info"]["stream_errors"] = {}
                     result["debug_info"]["stream_errors"][stream_name] = str(stream_error)
                 continue
-        
+
         return result
 
     except Exception as e:
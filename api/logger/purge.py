@@ -0,0 +1,247 @@
+"""
+Background Purge Jobs for SQLite Log Tables
+Large deletes from the loggers_* tables run in a background thread of the
+worker that received the request instead of one DELETE inside the request:
+- rows go in chunks of PURGE_CHUNK_SIZE, each in its own short transaction,
+  with a pause in between so the data writer gets the write lock
+- "all" only removes rows that existed when the job started (rowid snapshot)
+- timestamp prefixes are deleted as a timestamp range, which can use the
+  timestamp index (LIKE 'prefix%' can't)
+- with vacuum, free pages are returned with PRAGMA incremental_vacuum when
+  the database uses auto_vacuum=INCREMENTAL (a full VACUUM would block the writer)
+
+Job state lives in Redis (purge:job:<id>), so every worker can answer
+GET /data/purge/<job_id>. One job per table at a time.
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+from redis.exceptions import WatchError
+from ..redisconnection import connection as red
+from ..profiling import ProfiledConnection
+from .helper import timestamp_prefix_range
+
+PURGE_CHUNK_SIZE = 2000
+PURGE_CHUNK_PAUSE_SECONDS = 0.05
+VACUUM_PAGES_PER_STEP = 500
+BUSY_TIMEOUT_SECONDS = 10
+# Deletes of more rows than this are run as a job by DELETE /data/logs/<log_type>/<timestamp>
+PURGE_SYNC_MAX_ROWS = 5000
+
+JOB_KEY_PREFIX = 'purge:job:'
+JOBS_KEY = 'purge:jobs'
+LOCK_KEY_PREFIX = 'purge:lock:'
+JOB_TTL = 86400
+# Refreshed after every chunk; a job whose lock expired was interrupted (worker restart)
+LOCK_TTL = 120
+
+MATCH_TYPES = ('all', 'exact', 'prefix')
+LIVE_STATES = ('queued', 'running', 'vacuuming')
+LOCK_ATTEMPTS = 5
+_INT_FIELDS = ('total', 'deleted', 'chunks', 'vacuumed_pages', 'pid')
+
+
+def purge_condition(match_type, timestamp=None, max_rowid=None):
+    """WHERE clause and parameters of the rows a purge removes"""
+    if match_type == 'exact':
+        return 'timestamp = ?', [timestamp]
+    if match_type == 'prefix':
+        return 'timestamp >= ? AND timestamp < ?', list(timestamp_prefix_range(timestamp))
+    return 'rowid <= ?', [max_rowid]
+
+
+def delete_in_chunks(conn, table_name, condition, params, on_chunk=None):
+    """
+    Delete matching rows PURGE_CHUNK_SIZE at a time, one transaction per chunk
+
+    on_chunk(deleted_so_far) is called after every chunk; returns the rows deleted
+    """
+    deleted = 0
+    query = f'DELETE FROM {table_name} WHERE rowid IN (SELECT rowid FROM {table_name} WHERE {condition} LIMIT ?)'
+    while True:
+        with conn:
+            count = conn.execute(query, params + [PURGE_CHUNK_SIZE]).rowcount
+        deleted += count
+        if on_chunk:
+            on_chunk(deleted)
+        if count < PURGE_CHUNK_SIZE:
+            return deleted
+        time.sleep(PURGE_CHUNK_PAUSE_SECONDS)
+
+
+def incremental_vacuum(conn, on_step=None):
+    """Return free pages to the file system in steps, None if auto_vacuum isn't INCREMENTAL"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        return None
+    vacuumed = 0
+    while True:
+        free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free_pages:
+            return vacuumed
+        step = min(free_pages, VACUUM_PAGES_PER_STEP)
+        # executescript steps the pragma to completion (execute() frees a single page)
+        conn.executescript(f'PRAGMA incremental_vacuum({step});')
+        vacuumed += step
+        if on_step:
+            on_step(vacuumed)
+        time.sleep(PURGE_CHUNK_PAUSE_SECONDS)
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _update_job(job_id, /, **fields):
+    fields['updated_at'] = _now()
+    red.hset(f'{JOB_KEY_PREFIX}{job_id}', mapping={key: '' if value is None else str(value) for key, value in fields.items()})
+
+
+def get_purge_job(job_id):
+    """Job state as a dict, None if unknown (or expired)"""
+    job = red.hgetall(f'{JOB_KEY_PREFIX}{job_id}')
+    if not job:
+        return None
+    for key in _INT_FIELDS:
+        if job.get(key, '') != '':
+            job[key] = int(job[key])
+    job['vacuum'] = job.get('vacuum') == 'True'
+    if job.get('state') in LIVE_STATES and red.get(f"{LOCK_KEY_PREFIX}{job['database']}:{job['table_name']}") != job_id:
+        job['state'] = 'interrupted'
+    return job
+
+
+def list_purge_jobs(limit=20):
+    """Most recent jobs first"""
+    job_ids = red.zrevrange(JOBS_KEY, 0, limit - 1)
+    jobs = [get_purge_job(job_id) for job_id in job_ids]
+    return [job for job in jobs if job]
+
+
+def _acquire_lock(lock_key, job_id):
+    """
+    Take the table's lock for job_id, or take it over from a job that is no
+    longer live (compare-and-set, so only one of two concurrent requests wins)
+
+    Returns:
+        dict: None once the lock is held, else the live job holding it
+    """
+    for _ in range(LOCK_ATTEMPTS):
+        if red.set(lock_key, job_id, nx=True, ex=LOCK_TTL):
+            return None
+        with red.pipeline() as pipe:
+            try:
+                pipe.watch(lock_key)
+                holder = pipe.get(lock_key)
+                if holder is None:
+                    continue  # Expired in between, try SET NX again
+                running = get_purge_job(holder)
+                if running and running['state'] in LIVE_STATES:
+                    return running
+                pipe.multi()
+                pipe.set(lock_key, job_id, ex=LOCK_TTL)
+                pipe.execute()
+                return None
+            except WatchError:
+                continue  # Another request changed the lock, look again
+    raise RuntimeError(f'Could not acquire purge lock {lock_key}')
+
+
+def _release_lock(lock_key, job_id):
+    """Delete the lock if job_id still holds it"""
+    with red.pipeline() as pipe:
+        try:
+            pipe.watch(lock_key)
+            if pipe.get(lock_key) == job_id:
+                pipe.multi()
+                pipe.delete(lock_key)
+                pipe.execute()
+        except WatchError:
+            pass  # Taken over in between, not ours anymore
+
+
+def start_purge(log_type, db_path, table_name, match_type='all', timestamp=None, vacuum=False):
+    """
+    Start a purge job unless one is already running on the table
+
+    Returns:
+        tuple: (job dict, True if started / False if the running job was returned)
+    """
+    if match_type not in MATCH_TYPES:
+        raise ValueError(f"Invalid match_type. Must be one of: {', '.join(MATCH_TYPES)}")
+
+    database = os.path.basename(db_path)
+    job_id = uuid.uuid4().hex[:12]
+    lock_key = f'{LOCK_KEY_PREFIX}{database}:{table_name}'
+
+    # The job exists before it takes the lock, so a lock without a job is stale
+    _update_job(
+        job_id,
+        job_id=job_id,
+        log_type=log_type,
+        database=database,
+        table_name=table_name,
+        match_type=match_type,
+        timestamp=timestamp,
+        vacuum=bool(vacuum),
+        state='queued',
+        deleted=0,
+        chunks=0,
+        created_at=_now()
+    )
+    red.expire(f'{JOB_KEY_PREFIX}{job_id}', JOB_TTL)
+    running = _acquire_lock(lock_key, job_id)
+    if running:
+        red.delete(f'{JOB_KEY_PREFIX}{job_id}')
+        return running, False
+
+    red.zadd(JOBS_KEY, {job_id: time.time()})
+    red.zremrangebyscore(JOBS_KEY, 0, time.time() - JOB_TTL)
+
+    threading.Thread(
+        target=_run_purge,
+        args=(job_id, lock_key, db_path, table_name, match_type, timestamp, vacuum),
+        name=f'purge-{job_id}',
+        daemon=True
+    ).start()
+    return get_purge_job(job_id), True
+
+
+def _run_purge(job_id, lock_key, db_path, table_name, match_type, timestamp, vacuum):
+    """Background thread: chunked delete, then the optional incremental vacuum"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, factory=ProfiledConnection)
+        max_rowid = conn.execute(f'SELECT MAX(rowid) FROM {table_name}').fetchone()[0] or 0
+        condition, params = purge_condition(match_type, timestamp, max_rowid)
+        total = conn.execute(f'SELECT COUNT(*) FROM {table_name} WHERE {condition}', params).fetchone()[0]
+        _update_job(job_id, state='running', total=total, started_at=_now(), pid=os.getpid())
+
+        chunks = [0]
+
+        def on_chunk(deleted):
+            chunks[0] += 1
+            _update_job(job_id, deleted=deleted, chunks=chunks[0])
+            red.expire(lock_key, LOCK_TTL)
+
+        deleted = delete_in_chunks(conn, table_name, condition, params, on_chunk)
+
+        if vacuum:
+            _update_job(job_id, state='vacuuming')
+            vacuumed = incremental_vacuum(conn, lambda pages: red.expire(lock_key, LOCK_TTL))
+            if vacuumed is None:
+                _update_job(job_id, vacuum_status='skipped: auto_vacuum is not INCREMENTAL')
+            else:
+                _update_job(job_id, vacuum_status='done', vacuumed_pages=vacuumed)
+
+        _update_job(job_id, state='done', deleted=deleted, finished_at=_now())
+    except Exception as e:
+        print(f"Purge job {job_id} on {table_name} failed: {e}")
+        _update_job(job_id, state='failed', error=str(e), finished_at=_now())
+    finally:
+        if conn:
+            conn.close()
+        _release_lock(lock_key, job_id)
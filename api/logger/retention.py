@@ -0,0 +1,260 @@
+"""
+Redis Stream Retention for JSPro PowerDesk
+Keeps the logger streams bounded by age (max_age_days) and/or length
+(max_length), as set per log type in LOG_TYPE_CONFIG['retention'].
+
+With an archive_table, expired entries are first copied to
+stream_archive.db in batched transactions, then removed with an exact
+XTRIM MINID up to the last archived id, so an interrupted run loses nothing
+(archiving is idempotent). The last archived id per stream is kept as the
+archive watermark: entries up to it live in SQLite, later ones in Redis.
+Without an archive_table the stream is trimmed with XTRIM MINID ~ / MAXLEN ~.
+
+Run by scripts/stream_retention.py (dist/service/stream-retention.timer).
+"""
+
+import os
+import json
+import time
+import sqlite3
+from datetime import datetime
+from ..redisconnection import connection as red
+from ..profiling import ProfiledConnection
+from .helper import SQLITE_DB_PATH_STREAM_ARCHIVE, parse_stream_id, next_stream_id, timestamp_prefix_range
+
+# Entries read, archived and trimmed per round trip/transaction
+ARCHIVE_BATCH_SIZE = 500
+WATERMARK_TABLE = 'stream_archive_watermarks'
+BUSY_TIMEOUT_SECONDS = 10
+
+
+def get_archive_connection(db_path=SQLITE_DB_PATH_STREAM_ARCHIVE):
+    """Connection to the stream archive, creating the watermark table on first use"""
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, factory=ProfiledConnection)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            stream TEXT PRIMARY KEY,
+            last_id TEXT NOT NULL,
+            archived_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+    ''')
+    return conn
+
+
+def ensure_archive_table(conn, table_name):
+    """Archive table of one stream: entries keyed by their stream id"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            id_ms INTEGER NOT NULL,
+            id_seq INTEGER NOT NULL,
+            timestamp TEXT,
+            fields TEXT NOT NULL,
+            PRIMARY KEY (id_ms, id_seq)
+        ) WITHOUT ROWID
+    ''')
+    # For deletes by timestamp (DELETE /data/logs/<log_type>/<timestamp>)
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table_name}_timestamp ON {table_name} (timestamp)')
+
+
+def get_archive_watermarks(conn):
+    """{stream: {'last_id', 'archived_count', 'updated_at'}} of every archived stream"""
+    rows = conn.execute(f'SELECT stream, last_id, archived_count, updated_at FROM {WATERMARK_TABLE}').fetchall()
+    return {row['stream']: {key: row[key] for key in ('last_id', 'archived_count', 'updated_at')} for row in rows}
+
+
+def archive_entries(conn, table_name, stream_name, entries):
+    """Copy stream entries (oldest first) to table_name and move the watermark, in one transaction"""
+    rows = []
+    for entry_id, fields in entries:
+        ms, seq = parse_stream_id(entry_id)
+        rows.append((ms, seq, fields.get('timestamp'), json.dumps(fields, separators=(',', ':'))))
+
+    with conn:
+        conn.executemany(f'INSERT OR IGNORE INTO {table_name} (id_ms, id_seq, timestamp, fields) VALUES (?, ?, ?, ?)', rows)
+        conn.execute(f'''
+            INSERT INTO {WATERMARK_TABLE} (stream, last_id, archived_count, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(stream) DO UPDATE SET
+                last_id = excluded.last_id,
+                archived_count = archived_count + excluded.archived_count,
+                updated_at = excluded.updated_at
+        ''', (stream_name, entries[-1][0], len(rows), datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+
+def delete_archived_by_timestamp(table_name, timestamp, match_type='exact'):
+    """
+    Delete archived entries by their timestamp field (exact match or prefix),
+    so they don't come back through source=unified
+
+    Returns:
+        int: Rows deleted (0 when nothing was archived to table_name yet)
+    """
+    if not os.path.exists(SQLITE_DB_PATH_STREAM_ARCHIVE):
+        return 0
+    if match_type == 'exact':
+        condition, params = 'timestamp = ?', (timestamp,)
+    else:
+        condition, params = 'timestamp >= ? AND timestamp < ?', timestamp_prefix_range(timestamp)
+
+    conn = get_archive_connection()
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone():
+            return 0
+        ensure_archive_table(conn, table_name)
+        with conn:
+            return conn.execute(f'DELETE FROM {table_name} WHERE {condition}', params).rowcount
+    finally:
+        conn.close()
+
+
+def delete_archive(table_name, stream_name):
+    """
+    Delete every archived entry of a stream and its watermark, so a cleared
+    stream doesn't come back through source=unified
+
+    Returns:
+        int: Rows deleted (0 when nothing was archived to table_name yet)
+    """
+    if not os.path.exists(SQLITE_DB_PATH_STREAM_ARCHIVE):
+        return 0
+
+    conn = get_archive_connection()
+    try:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+        with conn:
+            deleted = conn.execute(f'DELETE FROM {table_name}').rowcount if exists else 0
+            conn.execute(f'DELETE FROM {WATERMARK_TABLE} WHERE stream = ?', (stream_name,))
+        return deleted
+    finally:
+        conn.close()
+
+
+def _expired_batches(stream_name, cutoff, excess):
+    """
+    Batches of expired entries from the head of the stream: ids before cutoff
+    (an (ms, seq) tuple or None) plus the first `excess` entries
+    """
+    start = '-'
+    seen = 0
+    while True:
+        entries = red.xrange(stream_name, min=start, count=ARCHIVE_BATCH_SIZE)
+        expired = []
+        for entry_id, fields in entries:
+            if seen < excess or (cutoff and parse_stream_id(entry_id) < cutoff):
+                expired.append((entry_id, fields))
+                seen += 1
+            else:
+                break
+        if expired:
+            yield expired
+        if len(expired) < ARCHIVE_BATCH_SIZE:
+            return
+        start = f'({expired[-1][0]}'
+
+
+def apply_stream_retention(stream_name, retention, conn=None, dry_run=False, now=None):
+    """
+    Archive and trim one stream according to its retention settings
+
+    Returns:
+        dict: length before/after, entries archived and trimmed, cutoff id
+    """
+    max_age_days = retention.get('max_age_days')
+    max_length = retention.get('max_length')
+    archive_table = retention.get('archive_table')
+
+    length = red.xlen(stream_name)
+    now_ms = int((now or time.time()) * 1000)
+    cutoff_id = f'{now_ms - int(max_age_days * 86400000)}-0' if max_age_days else None
+    result = {
+        'stream': stream_name,
+        'length_before': length,
+        'archived': 0,
+        'trimmed': 0,
+        'cutoff_id': cutoff_id,
+        'dry_run': dry_run
+    }
+
+    if not length:
+        result['length_after'] = 0
+        return result
+
+    if not archive_table:
+        if not dry_run:
+            if cutoff_id:
+                result['trimmed'] += red.xtrim(stream_name, minid=cutoff_id, approximate=True)
+            if max_length:
+                result['trimmed'] += red.xtrim(stream_name, maxlen=max_length, approximate=True)
+        result['length_after'] = red.xlen(stream_name)
+        return result
+
+    excess = max(0, length - max_length) if max_length else 0
+    cutoff = parse_stream_id(cutoff_id) if cutoff_id else None
+    if not dry_run:
+        ensure_archive_table(conn, archive_table)
+
+    for expired in _expired_batches(stream_name, cutoff, excess):
+        result['archived'] += len(expired)
+        if dry_run:
+            continue
+        archive_entries(conn, archive_table, stream_name, expired)
+        # Exact trim: nothing past the archived entries may go
+        result['trimmed'] += red.xtrim(stream_name, minid=next_stream_id(expired[-1][0]), approximate=False)
+
+    result['length_after'] = red.xlen(stream_name)
+    return result
+
+
+def run_retention(log_type_config, log_types=None, dry_run=False):
+    """
+    Apply the retention of every log type (or only log_types) with a Redis stream
+
+    Returns:
+        dict: {log_type: apply_stream_retention() result or {'error': ...}}
+    """
+    results = {}
+    conn = get_archive_connection()
+    try:
+        for log_type, config in log_type_config.items():
+            stream_name = config.get('redis_stream')
+            retention = config.get('retention')
+            if not stream_name or not retention or (log_types and log_type not in log_types):
+                continue
+            try:
+                results[log_type] = apply_stream_retention(stream_name, retention, conn, dry_run)
+            except Exception as e:
+                print(f"Error applying retention to {stream_name}: {e}")
+                results[log_type] = {'stream': stream_name, 'error': str(e)}
+    finally:
+        conn.close()
+    return results
+
+
+def get_retention_status(log_type_config):
+    """Retention settings and archive watermark per stream, for the storage overview"""
+    watermarks = {}
+    if os.path.exists(SQLITE_DB_PATH_STREAM_ARCHIVE):
+        try:
+            conn = get_archive_connection()
+            try:
+                watermarks = get_archive_watermarks(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error reading stream archive: {e}")
+
+    status = {}
+    for log_type, config in log_type_config.items():
+        stream_name = config.get('redis_stream')
+        retention = config.get('retention')
+        if stream_name and retention:
+            status[stream_name] = {
+                'log_type': log_type,
+                'max_age_days': retention.get('max_age_days'),
+                'max_length': retention.get('max_length'),
+                'archive_table': retention.get('archive_table'),
+                'archive': watermarks.get(stream_name)
+            }
+    return status
@@ -0,0 +1,220 @@
+"""
+Unified Hot/Cold Log Queries for JSPro PowerDesk
+source=unified in /data/logs/<log_type> reads one time range across the Redis
+stream (recent entries) and its stream_archive.db table (entries moved there
+by retention.py), newest first.
+
+The range is split at the archive watermark W: Redis is read above W, the
+archive up to the end of the range. Both sides are read lazily in batches and
+combined by a k-way merge on the stream id, so only offset + limit entries are
+decoded. An entry found on both sides (archived while the query ran, or a
+retention run interrupted before its XTRIM) is returned once.
+
+Pages continue with cursor=<stream_id>:<total> (page_info.next_cursor):
+entries older than stream_id. total_records is counted on the first page only
+and carried in the cursor. A Redis range can only be counted by reading it, so
+past REDIS_COUNT_MAX_ENTRIES the rest of the range is estimated from the
+stream's average entry rate (total_records_estimated, cursor <total>~).
+"""
+
+import os
+import json
+import heapq
+import sqlite3
+from itertools import islice
+from ..redisconnection import connection as red
+from ..profiling import ProfiledConnection
+from .helper import SQLITE_DB_PATH_STREAM_ARCHIVE, parse_stream_id
+from .retention import WATERMARK_TABLE, BUSY_TIMEOUT_SECONDS
+
+# Largest sequence number of a stream id, for inclusive upper bounds
+MAX_SEQ = 2 ** 63 - 1
+# Entries fetched per Redis round trip/SQLite query while merging
+MERGE_BATCH_SIZE = 200
+# Entries of a Redis range read to count it, the rest is estimated
+REDIS_COUNT_MAX_ENTRIES = 5000
+
+
+def format_stream_id(key):
+    return f'{key[0]}-{key[1]}'
+
+
+def parse_cursor(cursor):
+    """(stream id key, total_records or None, estimated) of a page cursor '<stream_id>[:<total>[~]]'"""
+    stream_id, _, total = cursor.partition(':')
+    estimated = total.endswith('~')
+    total = total.rstrip('~')
+    return parse_stream_id(stream_id), int(total) if total else None, estimated
+
+
+def previous_key(key):
+    """Largest stream id key before key"""
+    ms, seq = key
+    return (ms, seq - 1) if seq else (ms - 1, MAX_SEQ)
+
+
+def iter_redis_entries(stream_name, lower, upper, batch_size=MERGE_BATCH_SIZE):
+    """(key, stream_id, fields) of stream entries with lower <= key <= upper, newest first"""
+    max_id = format_stream_id(upper) if upper else '+'
+    min_id = format_stream_id(lower) if lower else '-'
+    while True:
+        entries = red.xrevrange(stream_name, max=max_id, min=min_id, count=batch_size)
+        for entry_id, fields in entries:
+            yield parse_stream_id(entry_id), entry_id, fields
+        if len(entries) < batch_size:
+            return
+        max_id = f'({entries[-1][0]}'
+
+
+def iter_archive_entries(conn, table_name, lower, upper, batch_size=MERGE_BATCH_SIZE):
+    """(key, stream_id, fields) of archived entries with lower <= key <= upper, newest first"""
+    lower = lower or (0, 0)
+    upper = upper or (MAX_SEQ, MAX_SEQ)
+    while True:
+        rows = conn.execute(
+            f'SELECT id_ms, id_seq, fields FROM {table_name} '
+            'WHERE (id_ms, id_seq) >= (?, ?) AND (id_ms, id_seq) <= (?, ?) '
+            'ORDER BY id_ms DESC, id_seq DESC LIMIT ?',
+            (*lower, *upper, batch_size)
+        ).fetchall()
+        for id_ms, id_seq, fields in rows:
+            yield (id_ms, id_seq), f'{id_ms}-{id_seq}', json.loads(fields)
+        if len(rows) < batch_size:
+            return
+        upper = previous_key((rows[-1][0], rows[-1][1]))
+
+
+def merge_newest_first(*sources):
+    """k-way merge of (key, ...) iterators sorted newest first, dropping repeated keys"""
+    last_key = None
+    for entry in heapq.merge(*sources, key=lambda entry: entry[0], reverse=True):
+        if entry[0] != last_key:
+            last_key = entry[0]
+            yield entry
+
+
+def count_redis_entries(stream_name, lower, upper):
+    """
+    Entries of a stream within [lower, upper], and whether the count is an estimate
+
+    XINFO length when the range covers the whole stream; otherwise up to
+    REDIS_COUNT_MAX_ENTRIES entries are read (newest first) and the part of
+    the range below them is estimated from the stream's entries per ms.
+    """
+    info = red.xinfo_stream(stream_name)
+    first, last = info.get('first-entry'), info.get('last-entry')
+    if not first:
+        return 0, False
+    first_key, last_key = parse_stream_id(first[0]), parse_stream_id(last[0])
+    if (not lower or lower <= first_key) and (not upper or upper >= last_key):
+        return info['length'], False
+    lower = max(lower, first_key) if lower else first_key
+    upper = min(upper, last_key) if upper else last_key
+    if lower > upper:
+        return 0, False
+
+    counted = 0
+    key = None
+    for key, _, _ in islice(iter_redis_entries(stream_name, lower, upper, batch_size=1000), REDIS_COUNT_MAX_ENTRIES + 1):
+        counted += 1
+    if counted <= REDIS_COUNT_MAX_ENTRIES:
+        return counted, False
+    rate = info['length'] / max(1, last_key[0] - first_key[0])
+    return counted + round((key[0] - lower[0]) * rate), True
+
+
+def _tag(entries, storage):
+    for key, stream_id, fields in entries:
+        yield key, stream_id, fields, storage
+
+
+def query_unified_logs(stream_name, archive_table, start_ms=None, end_ms=None, limit=100, offset=0, cursor=None):
+    """
+    Entries of stream_name and its archive between start_ms and end_ms (inclusive), newest first
+
+    Returns:
+        dict: records (stream fields + stream_id/storage), total_records of
+        the whole range (total_records_estimated), next_cursor (None on the
+        last page) and the watermark used
+    """
+    lower = (start_ms, 0) if start_ms is not None else None
+    upper = (end_ms, MAX_SEQ) if end_ms is not None else None
+    total = None
+    estimated = False
+    if cursor:
+        cursor_key, total, estimated = parse_cursor(cursor)
+        before_cursor = previous_key(cursor_key)
+        upper = min(upper, before_cursor) if upper else before_cursor
+    count = total is None
+
+    conn = None
+    watermark = None
+    if archive_table and os.path.exists(SQLITE_DB_PATH_STREAM_ARCHIVE):
+        conn = sqlite3.connect(SQLITE_DB_PATH_STREAM_ARCHIVE, timeout=BUSY_TIMEOUT_SECONDS, factory=ProfiledConnection)
+        row = None
+        try:
+            row = conn.execute(f'SELECT last_id FROM {WATERMARK_TABLE} WHERE stream = ?', (stream_name,)).fetchone()
+            conn.execute(f'SELECT 1 FROM {archive_table} LIMIT 0')
+        except sqlite3.OperationalError:
+            # Nothing archived yet
+            row = None
+        if row:
+            watermark = row[0]
+        else:
+            conn.close()
+            conn = None
+
+    try:
+        sources = []
+        archive_source = None
+        if count:
+            total = 0
+        redis_lower = lower
+        if watermark:
+            watermark_key = parse_stream_id(watermark)
+            after_watermark = (watermark_key[0], watermark_key[1] + 1)
+            redis_lower = max(lower, after_watermark) if lower else after_watermark
+            archive_source = _tag(iter_archive_entries(conn, archive_table, lower, upper), 'sqlite')
+            archive_upper = min(upper, watermark_key) if upper else watermark_key
+            if count and (not lower or lower <= archive_upper):
+                total += conn.execute(
+                    f'SELECT COUNT(*) FROM {archive_table} WHERE (id_ms, id_seq) >= (?, ?) AND (id_ms, id_seq) <= (?, ?)',
+                    (*(lower or (0, 0)), *archive_upper)
+                ).fetchone()[0]
+
+        if not upper or not redis_lower or redis_lower <= upper:
+            try:
+                if count:
+                    redis_total, estimated = count_redis_entries(stream_name, redis_lower, upper)
+                    total += redis_total
+                sources.append(_tag(iter_redis_entries(stream_name, redis_lower, upper), 'redis'))
+            except Exception as e:
+                # Stream doesn't exist (yet)
+                print(f"Error reading {stream_name}: {e}")
+        # After Redis, so an entry on both sides is returned from Redis
+        if archive_source:
+            sources.append(archive_source)
+
+        page = list(islice(merge_newest_first(*sources), offset, offset + limit + 1))
+    finally:
+        if conn:
+            conn.close()
+
+    records = []
+    for key, stream_id, fields, storage in page[:limit]:
+        record = dict(fields)
+        record.update({
+            'stream_id': stream_id,
+            'data_type': stream_name.split(':')[1],
+            'source_stream': stream_name,
+            'storage': storage
+        })
+        records.append(record)
+
+    return {
+        'records': records,
+        'total_records': total,
+        'total_records_estimated': estimated,
+        'next_cursor': f"{records[-1]['stream_id']}:{total}{'~' if estimated else ''}" if len(page) > limit else None,
+        'watermark': watermark
+    }
@@ -0,0 +1,25 @@
+from flask import Response, jsonify
+from redis.exceptions import RedisError
+from . import metrics_bp
+from auths import token_auth as auth
+from .helper import get_metrics, CONTENT_TYPE
+
+
+@metrics_bp.route('', methods=['GET'])
+@auth.login_required
+def get_openmetrics():
+    """
+    Power system telemetry in OpenMetrics text format for Prometheus
+    Built from one pipelined Redis read and cached for METRICS_CACHE_TTL seconds.
+    """
+    try:
+        return Response(get_metrics(), content_type=CONTENT_TYPE)
+    
+    except RedisError as e:
+        print(f"Error building metrics: {e}")
+        return jsonify({
+            "status_code": 503,
+            "status": "error",
+            "message": "Redis unavailable",
+            "data": None
+        }), 503
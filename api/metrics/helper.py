@@ -0,0 +1,346 @@
+"""
+OpenMetrics Exporter Helper for JSPro PowerDesk
+Renders SCC, BMS, rectifier, I2C heartbeat, system, Redis stream, SQLite and
+service metrics for Prometheus. All Redis reads of one scrape go through a
+single pipeline (one round trip) and the rendered text is cached for
+METRICS_CACHE_TTL seconds, so scrapers and dashboards polling /metrics
+together don't multiply the load.
+"""
+
+import os
+import json
+import math
+import time
+import threading
+import subprocess
+import psutil
+import config
+from ..redisconnection import connection as red
+from ..audit import AUDIT_STREAM
+from ..deadlines import request_timeout
+from ..power.store import POWER_DB_PATH
+from ..logger.helper import SQLITE_DB_PATH_STREAM_ARCHIVE
+from ..services.api_systemd import ALLOWED_SERVICES
+from helpers.i2c_helper import I2C_METRICS_KEY, I2C_METRICS_STALE_SECONDS, decode_i2c_metrics
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# Match the Prometheus scrape interval
+METRICS_CACHE_TTL = int(os.getenv('METRICS_CACHE_TTL', 15))
+# systemctl is a subprocess, refresh unit states less often than the scrape
+SERVICE_STATE_CACHE_TTL = 60
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PREFIX = 'powerdesk'
+
+REDIS_STREAMS = ['stream:battery', 'stream:scc', 'stream:scc-logs', AUDIT_STREAM]
+SQLITE_DATABASES = {
+    'data_storage': f'{config.PATH}/database/data_storage.db',
+    'mqtt_logs': f'{config.PATH}/database/mqtt_logs.db',
+    'auto_reboot': POWER_DB_PATH,
+    'stream_archive': SQLITE_DB_PATH_STREAM_ARCHIVE
+}
+TALIS5_PORTS = ['usb0', 'usb1']
+JSPRO_DOCKS = 16
+
+# (SCC hash field, metric name, unit, help)
+SCC_FIELDS = [
+    ('pv_voltage', 'scc_pv_voltage_volts', 'volts', 'PV input voltage'),
+    ('pv_current', 'scc_pv_current_amperes', 'amperes', 'PV input current'),
+    ('load_voltage', 'scc_load_voltage_volts', 'volts', 'Load output voltage'),
+    ('load_current', 'scc_load_current_amperes', 'amperes', 'Load output current'),
+    ('load_power', 'scc_load_power_watts', 'watts', 'Load output power'),
+    ('battery_voltage', 'scc_battery_voltage_volts', 'volts', 'Battery voltage measured by the SCC'),
+    ('battery_current', 'scc_battery_current_amperes', 'amperes', 'Battery charge current measured by the SCC'),
+    ('battery_temperature', 'scc_battery_temperature_celsius', 'celsius', 'Battery temperature measured by the SCC'),
+    ('device_temperature', 'scc_device_temperature_celsius', 'celsius', 'SCC device temperature'),
+    ('load_status', 'scc_load_running', None, 'Load output running (1), standby (0)'),
+    ('counter_heartbeat', 'scc_heartbeat', None, 'SCC heartbeat counter')
+]
+
+_cache_lock = threading.Lock()
+_cache = None  # (expires_at, text)
+_service_states = None  # (expires_at, {service: state})
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _to_float(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _scaled(value, factor):
+    value = _to_float(value)
+    return None if value is None else round(value * factor, 4)
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricFamilies:
+    """Collects samples per metric family and renders OpenMetrics text"""
+
+    def __init__(self):
+        self.families = {}
+
+    def add(self, name, value, labels=None, mtype='gauge', unit=None, help_text=''):
+        value = _to_float(value)
+        if value is None:
+            return
+        family = self.families.setdefault(name, {'type': mtype, 'unit': unit, 'help': help_text, 'samples': []})
+        suffix = '_total' if mtype == 'counter' else ''
+        family['samples'].append((suffix, labels or {}, value))
+
+    def add_histogram(self, name, buckets, count, total, labels=None, unit=None, help_text=''):
+        """buckets: [(upper bound, cumulative count)] ending with +Inf"""
+        family = self.families.setdefault(name, {'type': 'histogram', 'unit': unit, 'help': help_text, 'samples': []})
+        labels = labels or {}
+        for bound, cumulative in buckets:
+            family['samples'].append(('_bucket', dict(labels, le=bound), cumulative))
+        family['samples'].append(('_count', labels, count))
+        family['samples'].append(('_sum', labels, total))
+
+    def render(self):
+        lines = []
+        for name, family in self.families.items():
+            metric = f'{PREFIX}_{name}'
+            lines.append(f'# TYPE {metric} {family["type"]}')
+            if family['unit']:
+                lines.append(f'# UNIT {metric} {family["unit"]}')
+            if family['help']:
+                lines.append(f'# HELP {metric} {_escape(family["help"])}')
+            for suffix, labels, value in family['samples']:
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                label_text = f'{{{label_text}}}' if label_text else ''
+                lines.append(f'{metric}{suffix}{label_text} {_format_value(value)}')
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+def read_redis_snapshot(number_of_scc, battery_type):
+    """Read everything a scrape needs from Redis in one pipelined round trip"""
+    scc_keys = [f'scc{no}' for no in range(1, number_of_scc + 1)]
+    talis5_ports = TALIS5_PORTS if battery_type in ('talis5', 'mix') else []
+    jspro_docks = range(1, JSPRO_DOCKS + 1) if battery_type in ('jspro', 'mix') else []
+
+    pipe = red.pipeline(transaction=False)
+    for key in scc_keys:
+        pipe.hgetall(key)
+    for port in talis5_ports:
+        pipe.hgetall(f'bms_{port}')
+        pipe.hgetall(f'bms_active_{port}')
+    pipe.hgetall('dock_active')
+    for dock in jspro_docks:
+        pipe.hgetall(f'pms{dock}')
+    pipe.hgetall('rectifier')
+    pipe.hgetall(I2C_METRICS_KEY)
+    for stream in REDIS_STREAMS:
+        pipe.xlen(stream)
+    results = iter(pipe.execute())
+
+    return {
+        'scc': {key: next(results) for key in scc_keys},
+        'talis5': {port: (next(results), next(results)) for port in talis5_ports},
+        'dock_active': next(results),
+        'jspro': {dock: next(results) for dock in jspro_docks},
+        'rectifier': next(results),
+        'i2c': next(results),
+        'streams': {stream: next(results) for stream in REDIS_STREAMS}
+    }
+
+
+def get_service_states():
+    """States of the monitored units from a single `systemctl is-active` call (cached)"""
+    global _service_states
+
+    cache = _service_states
+    if cache and cache[0] > time.monotonic():
+        return cache[1]
+
+    try:
+        # is-active exits non-zero when any unit is inactive, the output is still valid
+        result = subprocess.run(['systemctl', 'is-active'] + ALLOWED_SERVICES, capture_output=True, text=True, timeout=request_timeout(5))
+        states = dict(zip(ALLOWED_SERVICES, result.stdout.split()))
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Error reading service states: {e}")
+        states = {}
+
+    _service_states = (time.monotonic() + SERVICE_STATE_CACHE_TTL, states)
+    return states
+
+
+def read_cpu_temperature():
+    """CPU temperature in °C from sysfs, None if unavailable"""
+    try:
+        with open('/sys/class/thermal/thermal_zone0/temp', 'r') as f:
+            return int(f.read().strip()) / 1000
+    except (OSError, ValueError):
+        return None
+
+
+def collect_scc(families, scc_snapshot):
+    for scc_key, data in scc_snapshot.items():
+        labels = {'scc': scc_key[3:]}
+        families.add('scc_up', 1 if data else 0, labels, help_text='SCC data present in Redis')
+        for field, name, unit, help_text in SCC_FIELDS:
+            value = _to_float(data.get(field))
+            # The SCC service writes -1 for values it couldn't read
+            if value is None or value < 0:
+                continue
+            families.add(name, value, labels, unit=unit, help_text=help_text)
+
+
+def collect_talis5(families, talis5_snapshot):
+    for port, (slaves, active) in talis5_snapshot.items():
+        for field, raw in slaves.items():
+            if not field.startswith('slave_id_'):
+                continue
+            slave_id = field[len('slave_id_'):]
+            try:
+                bms = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            if not bms.get('pcb_code'):
+                continue
+
+            labels = {'type': 'talis5', 'port': port, 'slave': slave_id}
+            families.add('bms_active', active.get(field), labels, help_text='Battery pack reported active')
+            families.add('bms_pack_voltage_volts', _scaled(bms.get('pack_voltage'), 0.01), labels, unit='volts', help_text='Battery pack voltage')
+            families.add('bms_pack_current_amperes', _scaled(bms.get('pack_current'), 0.001), labels, unit='amperes', help_text='Battery pack current')
+            families.add('bms_soc_percent', _scaled(bms.get('soc'), 0.01), labels, unit='percent', help_text='Battery state of charge')
+            families.add('bms_soh_percent', _scaled(bms.get('soh'), 0.01), labels, unit='percent', help_text='Battery state of health')
+            families.add('bms_cell_voltage_max_volts', _scaled(bms.get('max_cell_voltage'), 0.001), labels, unit='volts', help_text='Highest cell voltage')
+            families.add('bms_cell_voltage_min_volts', _scaled(bms.get('min_cell_voltage'), 0.001), labels, unit='volts', help_text='Lowest cell voltage')
+            families.add('bms_cell_temperature_max_celsius', _scaled(bms.get('max_cell_temperature'), 0.1), labels, unit='celsius', help_text='Highest cell temperature')
+            families.add('bms_cell_temperature_min_celsius', _scaled(bms.get('min_cell_temperature'), 0.1), labels, unit='celsius', help_text='Lowest cell temperature')
+            families.add('bms_fet_temperature_celsius', _scaled(bms.get('fet_temperature'), 0.1), labels, unit='celsius', help_text='MOSFET temperature')
+            families.add('bms_cycle_count', bms.get('cycle_count'), labels, help_text='Battery cycle count')
+
+
+def collect_jspro(families, dock_active, jspro_snapshot):
+    for dock, pms in jspro_snapshot.items():
+        if not pms:
+            continue
+
+        labels = {'type': 'jspro', 'port': 'dock', 'slave': str(dock)}
+        cells = [value for value in (_to_float(pms.get(f'cell{no}_v')) for no in range(1, 15)) if value]
+        temperatures = [value for value in (_to_float(pms.get(f'temp_{name}')) for name in ('top', 'mid', 'bot')) if value is not None]
+        fet_temperatures = [value for value in (_to_float(pms.get(f'temp_{name}')) for name in ('cmos', 'dmos')) if value is not None]
+
+        families.add('bms_active', dock_active.get(f'pms{dock}'), labels, help_text='Battery pack reported active')
+        families.add('bms_pack_voltage_volts', _scaled(pms.get('voltage'), 0.01), labels, unit='volts', help_text='Battery pack voltage')
+        families.add('bms_pack_current_amperes', _scaled(pms.get('current'), 0.001), labels, unit='amperes', help_text='Battery pack current')
+        if cells:
+            families.add('bms_cell_voltage_max_volts', max(cells) / 1000, labels, unit='volts', help_text='Highest cell voltage')
+            families.add('bms_cell_voltage_min_volts', min(cells) / 1000, labels, unit='volts', help_text='Lowest cell voltage')
+        if temperatures:
+            families.add('bms_cell_temperature_max_celsius', max(temperatures), labels, unit='celsius', help_text='Highest cell temperature')
+            families.add('bms_cell_temperature_min_celsius', min(temperatures), labels, unit='celsius', help_text='Lowest cell temperature')
+        if fet_temperatures:
+            families.add('bms_fet_temperature_celsius', max(fet_temperatures), labels, unit='celsius', help_text='MOSFET temperature')
+
+
+def collect_rectifier(families, rectifier):
+    for field, value in sorted(rectifier.items()):
+        if field == 'last_update':
+            continue
+        families.add('rectifier_value', value, {'parameter': field}, help_text='Rectifier SNMP value (hwRectACVoltage, hwBatteryVoltage, alarm states, ...)')
+
+
+def collect_i2c(families, raw):
+    # Same conversion and staleness check as the I2C API: a service that stopped publishing isn't running
+    i2c = decode_i2c_metrics(raw)
+    if not i2c:
+        return
+
+    families.add('i2c_heartbeat_running', i2c.get('running'), help_text='I2C heartbeat service running')
+    families.add('i2c_heartbeat_stale', i2c.get('stale'), help_text=f'Metrics not updated for more than {I2C_METRICS_STALE_SECONDS} seconds')
+    families.add('i2c_heartbeat_consecutive_failures', i2c.get('consecutive_failures'), help_text='Failed heartbeats in a row')
+    families.add('i2c_heartbeat_rolling_success_ratio', _scaled(i2c.get('rolling_success_rate'), 0.01), unit='ratio', help_text='Success ratio over the rolling window')
+    families.add('i2c_heartbeat_successful', i2c.get('successful_heartbeats'), mtype='counter', help_text='Successful heartbeats since service start')
+    families.add('i2c_heartbeat_failed', i2c.get('failed_heartbeats'), mtype='counter', help_text='Failed heartbeats since service start')
+
+    buckets = []
+    for field, value in i2c.items():
+        if field.startswith('latency_ms_le_') and field != 'latency_ms_le_inf':
+            bound = _to_float(field[len('latency_ms_le_'):])
+            if bound is not None:
+                buckets.append((bound / 1000, int(value)))
+    count = _to_float(i2c.get('latency_ms_le_inf'))
+    total = _to_float(i2c.get('latency_sum_ms'))
+    if buckets and count is not None and total is not None:
+        buckets = [(f'{bound:g}', cumulative) for bound, cumulative in sorted(buckets)] + [('+Inf', int(count))]
+        families.add_histogram('i2c_heartbeat_latency_seconds', buckets, int(count), round(total / 1000, 6), unit='seconds', help_text='I2C heartbeat write latency')
+
+
+def collect_system(families, streams):
+    families.add('cpu_usage_percent', psutil.cpu_percent(interval=None), unit='percent', help_text='CPU usage since the previous scrape')
+    families.add('memory_usage_percent', psutil.virtual_memory().percent, unit='percent', help_text='Memory usage')
+    families.add('cpu_temperature_celsius', read_cpu_temperature(), unit='celsius', help_text='CPU temperature')
+
+    disk = psutil.disk_usage('/')
+    families.add('disk_used_bytes', disk.used, unit='bytes', help_text='Root filesystem used space')
+    families.add('disk_total_bytes', disk.total, unit='bytes', help_text='Root filesystem size')
+
+    for stream, length in streams.items():
+        families.add('redis_stream_length', length, {'stream': stream}, help_text='Entries in the Redis stream')
+
+    for name, path in SQLITE_DATABASES.items():
+        size = 0
+        for suffix in ('', '-wal'):
+            try:
+                size += os.path.getsize(path + suffix)
+            except OSError:
+                pass
+        families.add('sqlite_size_bytes', size, {'database': name}, unit='bytes', help_text='SQLite database size including WAL')
+
+    for service, state in get_service_states().items():
+        families.add('service_active', 1 if state == 'active' else 0, {'service': service}, help_text='systemd unit is active')
+
+
+def build_metrics():
+    """Collect all metrics and render them as OpenMetrics text"""
+    started = time.perf_counter()
+    families = MetricFamilies()
+
+    battery_type = config.battery_type
+    snapshot = read_redis_snapshot(config.number_of_scc, battery_type)
+
+    collect_scc(families, snapshot['scc'])
+    collect_talis5(families, snapshot['talis5'])
+    collect_jspro(families, snapshot['dock_active'], snapshot['jspro'])
+    collect_rectifier(families, snapshot['rectifier'])
+    collect_i2c(families, snapshot['i2c'])
+    collect_system(families, snapshot['streams'])
+
+    families.add('scrape_duration_seconds', round(time.perf_counter() - started, 6), unit='seconds', help_text='Time spent collecting these metrics')
+    return families.render()
+
+
+def get_metrics():
+    """Get the rendered metrics, rebuilt at most every METRICS_CACHE_TTL seconds"""
+    global _cache
+
+    cache = _cache
+    if cache and cache[0] > time.monotonic():
+        return cache[1]
+
+    with _cache_lock:
+        # Another thread may have rebuilt it while we waited
+        if _cache and _cache[0] > time.monotonic():
+            return _cache[1]
+        text = build_metrics()
+        _cache = (time.monotonic() + METRICS_CACHE_TTL, text)
+        return text
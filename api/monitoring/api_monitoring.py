@@ -1,18 +1,17 @@
 import json
 import sqlite3
 import os
+import hashlib
 from datetime import datetime, timedelta
 from flask import jsonify, request
 from . import monitoring_bp
 from ..redisconnection import connection as red
+from ..profiling import ProfiledConnection
+from ..responses import conditional, file_version
+from helpers.device_config_cache import get_device_config_field, DEVICE_CONFIG_VERSION_KEY
 from auths import token_auth as auth
-from config import number_of_scc, slave_ids, PATH
-
-# Import battery configuration for section filtering
-try:
-    from config import battery_type as default_battery_type
-except ImportError:
-    default_battery_type = 'talis5'
+import config
+from config import PATH
 
 
 def get_battery_port_configuration():
@@ -22,9 +21,8 @@ def get_battery_port_configuration():
     """
     try:
         # Get device configuration from Redis
-        device_config = red.hget('device_config', 'device_version')
-        if device_config:
-            device = json.loads(device_config)
+        device = get_device_config_field('device_version')
+        if isinstance(device, dict):
             battery_type = device.get('battery_type', 'mix')
         else:
             # Fallback to checking bms_system_info
@@ -67,7 +65,7 @@ def get_redis_keys_for_section(section=None):
         dict: Dictionary with key patterns for different data types
     """
     if section is None:
-        section = default_battery_type
+        section = config.battery_type
     
     if section == 'talis5':
         return {
@@ -95,8 +93,65 @@ def get_redis_keys_for_section(section=None):
             'ports': ['usb0', 'usb1']
         }
 
+# Version fields of the Redis hashes read by the battery endpoints (any section):
+# the fields each writer updates on every cycle, None for small hashes read whole.
+# bms_usb*/pms* aren't read, bms_active_slaves.status (talis5) and
+# dock_active.last_update (jspro) are rewritten in the same cycle.
+BATTERY_VERSION_FIELDS = (
+    [('bms_active_slaves', ('status',)), ('dock_active', ('last_update',)), ('avg_volt', ('voltage',))]
+    + [(f'bms_active_{port}', None) for port in ('usb0', 'usb1')]
+)
+
+
+def _redis_hashes_version(sources, keys=()):
+    """
+    Digest of Redis hash fields (key, fields or None for the whole hash) and
+    string keys, read in one round trip
+    """
+    pipe = red.pipeline(transaction=False)
+    for key, fields in sources:
+        if fields:
+            pipe.hmget(key, fields)
+        else:
+            pipe.hgetall(key)
+    for key in keys:
+        pipe.get(key)
+    
+    digest = hashlib.blake2b(digest_size=12)
+    for data in pipe.execute():
+        digest.update(repr(sorted(data.items()) if isinstance(data, dict) else data).encode())
+    return digest.hexdigest()
+
+
+def _scc_version():
+    """Data version of /scc (SCC hashes, alarms and relay configuration)"""
+    sources = [('scc_system_info', ('last_update',))]
+    for no in range(1, config.number_of_scc + 1):
+        sources += [(f"scc{no}", ('counter_heartbeat',)), (f"scc{no}_alarm", None)]
+    return config.number_of_scc, _redis_hashes_version(sources, [DEVICE_CONFIG_VERSION_KEY])
+
+
+def _scc_chart_version():
+    """Data version of /scc/chart (loggers_scc, 24 hour window moving every minute)"""
+    return (
+        config.number_of_scc,
+        datetime.now().strftime('%Y-%m-%d %H:%M'),
+        file_version(f"{PATH}/database/data_storage.db")
+    )
+
+
+def _rectifier_version():
+    """Data version of /rectifier"""
+    return _redis_hashes_version([('rectifier', ('last_update',))])
+
+
+def _battery_version():
+    """Data version of /battery and /battery/active"""
+    return config.battery_type, config.slave_ids, _redis_hashes_version(BATTERY_VERSION_FIELDS)
+
 @monitoring_bp.route('/scc', methods=['GET'])
 @auth.login_required
+@conditional(_scc_version)
 def get_scc_monitoring():
     """Get SCC (Solar Charge Controller) monitoring data"""
     try:
@@ -104,7 +159,7 @@ def get_scc_monitoring():
         relay_configuration = {}
 
         # Get SCC data for each controller
-        for no in range(1, number_of_scc + 1):
+        for no in range(1, config.number_of_scc + 1):
             scc_key = f"scc{no}"
             scc_data[scc_key] = {}
 
@@ -168,19 +223,14 @@ def get_scc_monitoring():
         relay_configuration = {}
         
         try:
-            device_data = red.hgetall("device_config")
-            handle_relay_data = device_data.get("handle_relay", "{}")
-            
-            if isinstance(handle_relay_data, str):
-                relay_configuration = json.loads(handle_relay_data)
-                relay_configuration = {
-                    "vsat_reconnect": relay_configuration.get("voltage_reconnect_vsat", 'N/A'),
-                    "vsat_cutoff": relay_configuration.get("voltage_cutoff_vsat", 'N/A'),
-                    "bts_reconnect": relay_configuration.get("voltage_reconnect_bts", 'N/A'),
-                    "bts_cutoff": relay_configuration.get("voltage_cutoff_bts", 'N/A')
-                }
-            else:
-                relay_configuration = relay_configuration or {}
+            # Already decoded by the device_config cache (a string here means invalid JSON)
+            handle_relay_data = get_device_config_field("handle_relay", {})
+            relay_configuration = {
+                "vsat_reconnect": handle_relay_data.get("voltage_reconnect_vsat", 'N/A'),
+                "vsat_cutoff": handle_relay_data.get("voltage_cutoff_vsat", 'N/A'),
+                "bts_reconnect": handle_relay_data.get("voltage_reconnect_bts", 'N/A'),
+                "bts_cutoff": handle_relay_data.get("voltage_cutoff_bts", 'N/A')
+            }
         except Exception as e:
             relay_configuration = {
                 "vsat_reconnect": 'N/A',
@@ -210,6 +260,7 @@ def get_scc_monitoring():
 
 @monitoring_bp.route('/scc/chart', methods=['GET'])
 @auth.login_required
+@conditional(_scc_chart_version)
 def get_scc_chart_data():
     """Get SCC power generation data for chart from SQLite database"""
     try:
@@ -226,7 +277,7 @@ def get_scc_chart_data():
             }), 404
 
         # Connect to SQLite database
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=ProfiledConnection)
         cursor = conn.cursor()
         
         # Calculate timestamp for 24 hours ago
@@ -251,7 +302,7 @@ def get_scc_chart_data():
         }
         
         # Initialize datasets for each SCC
-        for i in range(1, number_of_scc + 1):
+        for i in range(1, config.number_of_scc + 1):
             chart_data["datasets"].append({
                 "data": [],
                 "label": f"SCC {i} Battery (V)"
@@ -269,7 +320,7 @@ def get_scc_chart_data():
                 chart_data["labels"].append(time_label)
                 
                 # Add battery voltage to each SCC dataset
-                for i in range(number_of_scc):
+                for i in range(config.number_of_scc):
                     chart_data["datasets"][i]["data"].append(battery_voltage)
                 
             except ValueError as e:
@@ -284,14 +335,14 @@ def get_scc_chart_data():
                 chart_data["labels"].append(time_point.strftime('%H:%M'))
         
         # Calculate total data points (labels * datasets)
-        data_points = len(chart_data["labels"]) * number_of_scc
+        data_points = len(chart_data["labels"]) * config.number_of_scc
         
         response_data = {
             "chart_data": chart_data,
             "data_points": data_points,
             "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "query_time": twenty_four_hours_ago.strftime("%Y-%m-%d %H:%M:%S"),
-            "scc_count": number_of_scc
+            "scc_count": config.number_of_scc
         }
 
         return jsonify({
@@ -321,6 +372,7 @@ def get_scc_chart_data():
 
 @monitoring_bp.route('/rectifier', methods=['GET'])
 @auth.login_required
+@conditional(_rectifier_version)
 def get_rectifier_monitoring():
     """Get rectifier monitoring data from Redis"""
     try:
@@ -420,6 +472,7 @@ def get_rectifier_monitoring():
 
 @monitoring_bp.route('/battery', methods=['GET'])
 @auth.login_required
+@conditional(_battery_version)
 def get_battery_monitoring():
     """
     Get battery monitoring data from Redis based on section configuration
@@ -501,7 +554,7 @@ def get_battery_monitoring():
                         active_ports = redis_keys['ports']
                         ports_config = {}
                         for port in active_ports:
-                            ports_config[port] = list(range(1, slave_ids + 1))
+                            ports_config[port] = list(range(1, config.slave_ids + 1))
                 
                 last_update = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 
@@ -520,7 +573,7 @@ def get_battery_monitoring():
                 active_ports = redis_keys['ports']
                 ports_config = {}
                 for port in active_ports:
-                    ports_config[port] = list(range(1, slave_ids + 1))
+                    ports_config[port] = list(range(1, config.slave_ids + 1))
             last_update = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # Get BMS data from each active port/dock and slave based on configuration
@@ -549,7 +602,7 @@ def get_battery_monitoring():
                                 'temp_cmos': int(float(bms_data_raw.get('temp_cmos', 0)) if bms_data_raw.get('temp_cmos') else 0),
                                 'temp_dmos': int(float(bms_data_raw.get('temp_dmos', 0)) if bms_data_raw.get('temp_dmos') else 0),
                                 'cell_voltage': [],
-                                'section': section or default_battery_type,
+                                'section': section or config.battery_type,
                                 'battery_type': 'jspro',  # Add battery type identifier
                                 'last_update': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                             }
@@ -587,7 +640,7 @@ def get_battery_monitoring():
                                     
                                     # Add port/dock information
                                     bms_logger['port'] = port_or_dock
-                                    bms_logger['section'] = section or default_battery_type
+                                    bms_logger['section'] = section or config.battery_type
                                     bms_logger['battery_type'] = 'talis5'  # Add battery type identifier
                                     
                                     bms_data.append(bms_logger)
@@ -632,7 +685,7 @@ def get_battery_monitoring():
         
         response_data = {
             "bms_data": structured_bms_data,
-            "section": section or default_battery_type,
+            "section": section or config.battery_type,
             "pack_active": ports_config,
             "last_update": last_update
         }
@@ -654,6 +707,7 @@ def get_battery_monitoring():
 
 @monitoring_bp.route('/battery/active', methods=['GET'])
 @auth.login_required
+@conditional(_battery_version)
 def get_battery_monitoring_active():
     """
     Get active battery monitoring data based on section configuration
@@ -1071,7 +1125,7 @@ def _get_default_ports_config(redis_keys):
         # Fallback to section-based configuration
         ports_config = {}
         for port in redis_keys['ports']:
-            ports_config[port] = list(range(1, slave_ids + 1))
+            ports_config[port] = list(range(1, config.slave_ids + 1))
         return ports_config
 
 
@@ -1086,7 +1140,7 @@ def _get_fallback_ports_config(section, redis_keys):
     else:
         ports_config = {}
         for port in redis_keys['ports']:
-            ports_config[port] = list(range(1, slave_ids + 1))
+            ports_config[port] = list(range(1, config.slave_ids + 1))
         return ports_config
 
 
@@ -1128,8 +1182,8 @@ def _process_standard_data(section, ports_config):
                     bms_info["section"] = "jspro"
                 else:
                     bms_info["port"] = port_or_dock
-                    bms_info["battery_type"] = section or default_battery_type
-                    bms_info["section"] = section or default_battery_type
+                    bms_info["battery_type"] = section or config.battery_type
+                    bms_info["section"] = section or config.battery_type
                 bms_data.append(bms_info)
     
     return bms_data
@@ -1171,8 +1225,8 @@ def _process_other_slave(slave_id, port_or_dock, section):
     """Process individual slave data for non-JSPro sections"""
     return {
         "port": port_or_dock,
-        "battery_type": section or default_battery_type,
-        "section": section or default_battery_type,
+        "battery_type": section or config.battery_type,
+        "section": section or config.battery_type,
         "slave_id": slave_id,
         "status": True,
     }
@@ -1266,8 +1320,8 @@ def _process_mix_jspro_data():
 def _get_response_section(section):
     """Get correct section name for response"""
     if section == 'talis5':
-        return 'talis5'  # Force talis5 regardless of default_battery_type
+        return 'talis5'  # Force talis5 regardless of config.battery_type
     elif not section:
-        return default_battery_type
+        return config.battery_type
     else:
         return section
@@ -5,10 +5,11 @@ Base URL: /api/v1/power
 
 import json
 import os
-from flask import jsonify, request, Response
+from flask import jsonify, request, Response, stream_with_context
 from . import power_bp
 from auths import token_auth as auth
-from .helper import PowerManagementAPI
+from ..deadlines import request_deadline
+from .helper import PowerManagementAPI, EXPORT_TABLES, gzip_chunks
 
 
 # Global instance
@@ -65,23 +66,48 @@ def get_auto_reboot_history():
 
 @power_bp.route('/auto-reboot-history/export', methods=['GET'])
 @auth.login_required
+@request_deadline(None)
 def export_auto_reboot_history():
     """Export auto reboot history as CSV"""
+    return export_table('auto-reboot-history')
+
+
+@power_bp.route('/export/<export_name>', methods=['GET'])
+@auth.login_required
+@request_deadline(None)
+def export_table(export_name):
+    """Stream auto-reboot-history, disk-alerts or power-operations as CSV
+    
+    Query parameters: from, to (YYYY-MM-DD, inclusive), gzip (true/false)
+    """
     from_date = request.args.get('from')
     to_date = request.args.get('to')
+    use_gzip = request.args.get('gzip', 'false').lower() == 'true'
     
-    result = power_api.export_auto_reboot_history(from_date, to_date)
+    if export_name not in EXPORT_TABLES:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown export: {export_name}. Available: {", ".join(EXPORT_TABLES)}'
+        }), 404
     
-    if result['success']:
-        return Response(
-            result['data'],
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename=auto_reboot_history_{from_date or "all"}_{to_date or "all"}.csv'
-            }
-        )
+    try:
+        chunks = power_api.export_csv(export_name, from_date, to_date)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    filename = f'{export_name.replace("-", "_")}_{from_date or "all"}_{to_date or "all"}.csv'
+    if use_gzip:
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
     else:
-        return jsonify(result), 500
+        mimetype = 'text/csv'
+    
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
 
 
 @power_bp.route('/settings', methods=['GET'])
@@ -353,3 +379,29 @@ def get_i2c_logs():
             'success': False,
             'error': f'Failed to get I2C logs: {str(e)}'
         }), 500
+
+
+@power_bp.route('/i2c/metrics', methods=['GET'])
+@auth.login_required
+def get_i2c_metrics():
+    """Get I2C heartbeat metrics published by the heartbeat service"""
+    try:
+        from helpers.i2c_helper import get_i2c_metrics
+        metrics = get_i2c_metrics()
+        
+        if metrics is None:
+            return jsonify({
+                'success': False,
+                'error': 'No I2C heartbeat metrics available, is i2c-heartbeat.service running?'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': metrics
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Failed to get I2C metrics: {str(e)}'
+        }), 500
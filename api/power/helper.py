@@ -1,97 +1,133 @@
 import os
 import subprocess
-import sqlite3
 import csv
 import io
+import time
+import zlib
 from datetime import datetime, timedelta
 from helpers.system_resources_helper import get_disk_detail
-from utils import bash_command
+from .store import PowerStore, POWER_DB_PATH
+from ..responses import file_version
+
+# Tables that can be exported as CSV: (table, columns, CSV header, extra filter)
+EXPORT_TABLES = {
+    'auto-reboot-history': (
+        'auto_reboot_logs',
+        ['timestamp', 'disk_usage', 'action', 'status', 'message'],
+        ['Timestamp', 'Disk Usage (%)', 'Action', 'Status', 'Message'],
+        "action = 'auto_reboot'"
+    ),
+    'disk-alerts': (
+        'disk_alerts',
+        ['timestamp', 'alert_type', 'disk_usage', 'message'],
+        ['Timestamp', 'Alert Type', 'Disk Usage (%)', 'Message'],
+        None
+    ),
+    'power-operations': (
+        'power_operations',
+        ['timestamp', 'operation', 'user_name', 'status', 'message'],
+        ['Timestamp', 'Operation', 'User', 'Status', 'Message'],
+        None
+    )
+}
+EXPORT_FETCH_SIZE = 500
+
+# Overview is cached briefly; log_* writes and commits from other processes invalidate it
+OVERVIEW_CACHE_TTL = 10
+
+
+def read_uptime_seconds():
+    """Read system uptime in seconds from /proc/uptime"""
+    with open('/proc/uptime', 'r') as f:
+        return float(f.read().split()[0])
+
+
+def format_uptime(seconds):
+    """Format uptime like `uptime -p` without the leading 'up ' (e.g. '1 day, 20 minutes')"""
+    minutes = int(seconds // 60)
+    weeks, minutes = divmod(minutes, 7 * 24 * 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    
+    parts = []
+    for value, unit in ((weeks, 'week'), (days, 'day'), (hours, 'hour'), (minutes, 'minute')):
+        if value:
+            parts.append(f"{value} {unit}{'s' if value != 1 else ''}")
+    return ', '.join(parts) if parts else '0 minutes'
+
+
+def date_range_filter(from_date=None, to_date=None):
+    """Build a timestamp filter for YYYY-MM-DD dates (to_date is inclusive)
+    
+    Returns:
+        tuple: (list of SQL conditions, list of params)
+    
+    Raises:
+        ValueError: If a date is not in YYYY-MM-DD format
+    """
+    conditions = []
+    params = []
+    
+    if from_date:
+        datetime.strptime(from_date, '%Y-%m-%d')
+        conditions.append('timestamp >= ?')
+        params.append(from_date)
+    
+    if to_date:
+        # Compare against the next day so ISO timestamps ('...T10:00:00') on to_date are included
+        next_day = datetime.strptime(to_date, '%Y-%m-%d') + timedelta(days=1)
+        conditions.append('timestamp < ?')
+        params.append(next_day.strftime('%Y-%m-%d'))
+    
+    return conditions, params
+
+
+def gzip_chunks(chunks):
+    """Gzip-compress a stream of text chunks"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
 
 
 class PowerManagementAPI:
     def __init__(self):
-        self.db_path = "auto_reboot.db"
+        self.db_path = POWER_DB_PATH
+        self.store = PowerStore(self.db_path)
+        self._overview_cache = None  # (expires_at, file_version, result)
         self.log_file = "/var/lib/sundaya/jspro-powerdesk/logs/disk_auto_reboot.log"
         self.init_database()
     
     def init_database(self):
-        """Initialize SQLite database for storing auto reboot logs"""
+        """Initialize SQLite database for storing auto reboot logs (runs pending migrations)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create auto_reboot_logs table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS auto_reboot_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME NOT NULL,
-                    disk_usage INTEGER NOT NULL,
-                    action TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    message TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create disk_alerts table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS disk_alerts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME NOT NULL,
-                    alert_type TEXT NOT NULL,
-                    disk_usage INTEGER NOT NULL,
-                    message TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create power_operations table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS power_operations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME NOT NULL,
-                    operation TEXT NOT NULL,
-                    user_name TEXT,
-                    status TEXT NOT NULL,
-                    message TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create auto_reboot_settings table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS auto_reboot_settings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    setting_name TEXT NOT NULL UNIQUE,
-                    setting_value TEXT NOT NULL,
-                    updated_by TEXT,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Insert default settings if not exists
-            cursor.execute('''
-                INSERT OR IGNORE INTO auto_reboot_settings (setting_name, setting_value, updated_by)
-                VALUES ('disk_threshold', '60', 'system')
-            ''')
-            
-            cursor.execute('''
-                INSERT OR IGNORE INTO auto_reboot_settings (setting_name, setting_value, updated_by)
-                VALUES ('monitoring_enabled', 'true', 'system')
-            ''')
-            
-            cursor.execute('''
-                INSERT OR IGNORE INTO auto_reboot_settings (setting_name, setting_value, updated_by)
-                VALUES ('monitoring_interval', '5', 'system')
-            ''')
-            
-            conn.commit()
-            conn.close()
+            self.store.connection()
         except Exception as e:
             print(f"Error initializing database: {e}")
     
+    def invalidate_overview(self):
+        """Drop the cached overview (called after logging new rows)"""
+        self._overview_cache = None
+    
     def get_overview(self):
-        """Get system overview including disk usage, uptime, and auto reboot count"""
+        """Get system overview including disk usage, uptime, and auto reboot count (cached)"""
+        # Changes with every commit by any connection (other threads and workers);
+        # PRAGMA data_version is per connection, so it can't key a shared cache
+        version = file_version(self.db_path)
+        
+        cache = self._overview_cache
+        if cache and cache[0] > time.monotonic() and cache[1] == version:
+            return cache[2]
+        
+        result = self.build_overview()
+        if result['status_code'] == 200:
+            self._overview_cache = (time.monotonic() + OVERVIEW_CACHE_TTL, version, result)
+        return result
+    
+    def build_overview(self):
+        """Build system overview without forking (uptime from /proc, disk from statvfs)"""
         try:
             # Get disk usage
             disk = get_disk_detail()
@@ -105,9 +141,8 @@ class PowerManagementAPI:
             
             # Get system uptime
             try:
-                uptime_output = bash_command(['uptime', '-p'], universal_newlines=True)
-                uptime = uptime_output.strip().replace('up ', '') if uptime_output else 'unknown'
-            except:
+                uptime = format_uptime(read_uptime_seconds())
+            except (OSError, ValueError, IndexError):
                 uptime = "unknown"
             
             # Get auto reboot count (monthly)
@@ -135,23 +170,35 @@ class PowerManagementAPI:
                 'message': f'Error getting overview: {str(e)}'
             }
     
+    def get_auto_reboot_summary(self):
+        """Get monthly count, total count and last auto reboot in a single query"""
+        first_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        
+        # SQLite returns the bare disk_usage column from the row that holds MAX(timestamp)
+        row = self.store.fetchone('''
+            SELECT
+                COALESCE(SUM(CASE WHEN timestamp >= ? THEN 1 ELSE 0 END), 0),
+                COUNT(*),
+                MAX(timestamp),
+                disk_usage
+            FROM auto_reboot_logs
+            WHERE action = 'auto_reboot'
+        ''', (first_of_month.isoformat(),))
+        
+        monthly_count, total_count, last_timestamp, last_disk_usage = row
+        return {
+            'monthly_count': monthly_count,
+            'total_count': total_count,
+            'last_reboot': {
+                'timestamp': last_timestamp,
+                'disk_usage': last_disk_usage
+            } if last_timestamp else None
+        }
+    
     def get_monthly_auto_reboot_count(self):
         """Get monthly auto reboot count"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Get monthly count
-            first_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            cursor.execute('''
-                SELECT COUNT(*) FROM auto_reboot_logs 
-                WHERE timestamp >= ? AND action = 'auto_reboot'
-            ''', (first_of_month.isoformat(),))
-            
-            monthly_count = cursor.fetchone()[0]
-            conn.close()
-            
-            return monthly_count
+            return self.get_auto_reboot_summary()['monthly_count']
             
         except Exception as e:
             print(f"Error getting monthly auto reboot count: {e}")
@@ -160,17 +207,11 @@ class PowerManagementAPI:
     def get_last_power_operation(self):
         """Get last power operation"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            last_op = self.store.fetchone('''
                 SELECT timestamp, operation, user_name, status FROM power_operations 
                 ORDER BY timestamp DESC LIMIT 1
             ''')
             
-            last_op = cursor.fetchone()
-            conn.close()
-            
             if last_op:
                 return {
                     'timestamp': last_op[0],
@@ -188,10 +229,7 @@ class PowerManagementAPI:
     def log_disk_alert(self, data):
         """Log disk alert to database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            self.store.execute('''
                 INSERT INTO disk_alerts (timestamp, alert_type, disk_usage, message)
                 VALUES (?, ?, ?, ?)
             ''', (
@@ -201,9 +239,7 @@ class PowerManagementAPI:
                 data.get('message', '')
             ))
             
-            conn.commit()
-            conn.close()
-            
+            self.invalidate_overview()
             return {'success': True, 'message': 'Disk alert logged successfully'}
             
         except Exception as e:
@@ -212,10 +248,7 @@ class PowerManagementAPI:
     def log_auto_reboot(self, data):
         """Log auto reboot event to database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            self.store.execute('''
                 INSERT INTO auto_reboot_logs (timestamp, disk_usage, action, status, message)
                 VALUES (?, ?, ?, ?, ?)
             ''', (
@@ -226,9 +259,7 @@ class PowerManagementAPI:
                 data.get('message', '')
             ))
             
-            conn.commit()
-            conn.close()
-            
+            self.invalidate_overview()
             return {'success': True, 'message': 'Auto reboot logged successfully'}
             
         except Exception as e:
@@ -237,10 +268,7 @@ class PowerManagementAPI:
     def log_power_operation(self, operation, user_name, status='initiated', message=''):
         """Log power operation to database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            self.store.execute('''
                 INSERT INTO power_operations (timestamp, operation, user_name, status, message)
                 VALUES (?, ?, ?, ?, ?)
             ''', (
@@ -251,9 +279,7 @@ class PowerManagementAPI:
                 message
             ))
             
-            conn.commit()
-            conn.close()
-            
+            self.invalidate_overview()
             return {'success': True, 'message': 'Power operation logged successfully'}
             
         except Exception as e:
@@ -262,17 +288,11 @@ class PowerManagementAPI:
     def get_auto_reboot_settings(self):
         """Get auto reboot settings"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            rows = self.store.fetchall('''
                 SELECT setting_name, setting_value, updated_by, updated_at 
                 FROM auto_reboot_settings
             ''')
             
-            rows = cursor.fetchall()
-            conn.close()
-            
             settings = {}
             for row in rows:
                 settings[row[0]] = {
@@ -289,9 +309,6 @@ class PowerManagementAPI:
     def update_auto_reboot_settings(self, settings_data, user_name):
         """Update auto reboot settings"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Validate settings
             valid_settings = ['disk_threshold', 'monitoring_enabled', 'monitoring_interval']
             
@@ -320,15 +337,15 @@ class PowerManagementAPI:
                     except ValueError:
                         return {'success': False, 'error': 'Monitoring interval must be a valid number'}
             
-            # Update settings
-            for setting_name, setting_value in settings_data.items():
-                cursor.execute('''
-                    UPDATE auto_reboot_settings 
-                    SET setting_value = ?, updated_by = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE setting_name = ?
-                ''', (str(setting_value), user_name, setting_name))
-            
-            conn.commit()
+            # Update settings in one transaction
+            self.store.executemany('''
+                UPDATE auto_reboot_settings 
+                SET setting_value = ?, updated_by = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE setting_name = ?
+            ''', [
+                (str(setting_value), user_name, setting_name)
+                for setting_name, setting_value in settings_data.items()
+            ])
             
             # Log the settings change
             self.log_power_operation(
@@ -338,8 +355,6 @@ class PowerManagementAPI:
                 f'Updated settings: {", ".join(settings_data.keys())}'
             )
             
-            conn.close()
-            
             # Update script configuration file if disk threshold changed
             if 'disk_threshold' in settings_data:
                 self.update_script_config(settings_data['disk_threshold'])
@@ -377,17 +392,11 @@ class PowerManagementAPI:
     def get_current_threshold(self):
         """Get current disk threshold setting"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            result = self.store.fetchone('''
                 SELECT setting_value FROM auto_reboot_settings 
                 WHERE setting_name = 'disk_threshold'
             ''')
             
-            result = cursor.fetchone()
-            conn.close()
-            
             return int(result[0]) if result else 60
             
         except Exception as e:
@@ -397,41 +406,7 @@ class PowerManagementAPI:
     def get_auto_reboot_stats(self):
         """Get auto reboot statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Get monthly count
-            monthly_count = self.get_monthly_auto_reboot_count()
-            
-            # Get total count
-            cursor.execute('''
-                SELECT COUNT(*) FROM auto_reboot_logs 
-                WHERE action = 'auto_reboot'
-            ''')
-            
-            total_count = cursor.fetchone()[0]
-            
-            # Get last reboot
-            cursor.execute('''
-                SELECT timestamp, disk_usage FROM auto_reboot_logs 
-                WHERE action = 'auto_reboot'
-                ORDER BY timestamp DESC LIMIT 1
-            ''')
-            
-            last_reboot = cursor.fetchone()
-            
-            conn.close()
-            
-            result = {
-                'monthly_count': monthly_count,
-                'total_count': total_count,
-                'last_reboot': {
-                    'timestamp': last_reboot[0] if last_reboot else None,
-                    'disk_usage': last_reboot[1] if last_reboot else None
-                } if last_reboot else None
-            }
-            
-            return {'success': True, 'data': result}
+            return {'success': True, 'data': self.get_auto_reboot_summary()}
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -439,23 +414,14 @@ class PowerManagementAPI:
     def get_auto_reboot_history(self, from_date=None, to_date=None, limit=None):
         """Get auto reboot history"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             query = '''
                 SELECT timestamp, disk_usage, action, status, message
                 FROM auto_reboot_logs 
                 WHERE action = 'auto_reboot'
             '''
-            params = []
-            
-            if from_date:
-                query += ' AND timestamp >= ?'
-                params.append(from_date)
-            
-            if to_date:
-                query += ' AND timestamp <= ?'
-                params.append(to_date + ' 23:59:59')
+            conditions, params = date_range_filter(from_date, to_date)
+            for condition in conditions:
+                query += f' AND {condition}'
             
             query += ' ORDER BY timestamp DESC'
             
@@ -463,8 +429,7 @@ class PowerManagementAPI:
                 query += ' LIMIT ?'
                 params.append(limit)
             
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+            rows = self.store.fetchall(query, params)
             
             result = []
             for row in rows:
@@ -476,44 +441,55 @@ class PowerManagementAPI:
                     'message': row[4] or ''
                 })
             
-            conn.close()
-            
             return {'success': True, 'data': result}
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def export_auto_reboot_history(self, from_date=None, to_date=None):
-        """Export auto reboot history as CSV"""
-        try:
-            history_result = self.get_auto_reboot_history(from_date, to_date)
-            
-            if not history_result['success']:
-                return history_result
-            
+    def export_csv(self, export_name, from_date=None, to_date=None):
+        """Stream a table as CSV text chunks in constant memory
+        
+        Rows are read from a dedicated connection with fetchmany, so an
+        abandoned download doesn't leave a cursor open on the shared one.
+        
+        Raises:
+            KeyError: If export_name is not in EXPORT_TABLES
+            ValueError: If a date is not in YYYY-MM-DD format
+        """
+        table, columns, header, extra_filter = EXPORT_TABLES[export_name]
+        conditions, params = date_range_filter(from_date, to_date)
+        if extra_filter:
+            conditions.insert(0, extra_filter)
+        
+        query = f'SELECT {", ".join(columns)} FROM {table}'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY timestamp DESC'
+        
+        def generate():
             output = io.StringIO()
             writer = csv.writer(output)
+            writer.writerow(header)
             
-            # Write header
-            writer.writerow(['Timestamp', 'Disk Usage (%)', 'Action', 'Status', 'Message'])
-            
-            # Write data
-            for record in history_result['data']:
-                writer.writerow([
-                    record['timestamp'],
-                    record['disk_usage'],
-                    record['action'],
-                    record['status'],
-                    record['message']
-                ])
-            
-            csv_content = output.getvalue()
-            output.close()
-            
-            return {'success': True, 'data': csv_content}
-            
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+            conn = self.store.open_connection()
+            try:
+                cursor = conn.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate(0)
+            finally:
+                conn.close()
+            
+            # Header only when the table is empty
+            if output.tell():
+                yield output.getvalue()
+        
+        return generate()
     
     def execute_reboot(self, user_name):
         """Execute system reboot"""
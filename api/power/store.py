@@ -0,0 +1,173 @@
+"""
+Power Management SQLite Store
+One connection per thread (reused across requests), schema created once per
+database through versioned migrations tracked in PRAGMA user_version.
+
+POWER_DB_PATH overrides the database location (default: <project>/auto_reboot.db)
+"""
+
+import os
+import sqlite3
+import threading
+
+from ..profiling import ProfiledConnection
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+POWER_DB_PATH = os.path.abspath(os.getenv('POWER_DB_PATH') or os.path.join(BASE_DIR, 'auto_reboot.db'))
+BUSY_TIMEOUT_SECONDS = 10
+
+# (version, statements) - append new migrations, never edit applied ones
+MIGRATIONS = [
+    (1, [
+        '''
+        CREATE TABLE IF NOT EXISTS auto_reboot_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            disk_usage INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            status TEXT NOT NULL,
+            message TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS disk_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            alert_type TEXT NOT NULL,
+            disk_usage INTEGER NOT NULL,
+            message TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS power_operations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            operation TEXT NOT NULL,
+            user_name TEXT,
+            status TEXT NOT NULL,
+            message TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS auto_reboot_settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            setting_name TEXT NOT NULL UNIQUE,
+            setting_value TEXT NOT NULL,
+            updated_by TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        INSERT OR IGNORE INTO auto_reboot_settings (setting_name, setting_value, updated_by)
+        VALUES ('disk_threshold', '60', 'system')
+        ''',
+        '''
+        INSERT OR IGNORE INTO auto_reboot_settings (setting_name, setting_value, updated_by)
+        VALUES ('monitoring_enabled', 'true', 'system')
+        ''',
+        '''
+        INSERT OR IGNORE INTO auto_reboot_settings (setting_name, setting_value, updated_by)
+        VALUES ('monitoring_interval', '5', 'system')
+        '''
+    ]),
+    (2, [
+        'CREATE INDEX IF NOT EXISTS idx_auto_reboot_logs_action_timestamp ON auto_reboot_logs (action, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_disk_alerts_timestamp ON disk_alerts (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_power_operations_timestamp ON power_operations (timestamp)'
+    ])
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+class PowerStore:
+    def __init__(self, db_path=POWER_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._migrate_lock = threading.Lock()
+        self._migrated = False
+
+    def connection(self):
+        """Get this thread's connection, opening (and migrating) it on first use
+        
+        Reusing the connection also reuses sqlite3's prepared statement cache.
+        """
+        conn = getattr(self._local, 'conn', None)
+        # gunicorn workers may fork after the store was created
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, factory=ProfiledConnection)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if not self._migrated:
+                self.migrate(conn)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def open_connection(self):
+        """Open a separate connection (caller closes it), e.g. for long reads"""
+        self.connection()  # make sure migrations ran
+        return sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, factory=ProfiledConnection)
+    
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local.conn = None
+
+    def migrate(self, conn):
+        """Apply pending schema migrations, each in its own transaction"""
+        with self._migrate_lock:
+            current_version = conn.execute('PRAGMA user_version').fetchone()[0]
+            
+            for version, statements in MIGRATIONS:
+                if version <= current_version:
+                    continue
+                with conn:
+                    for statement in statements:
+                        conn.execute(statement)
+                    # PRAGMA doesn't accept parameters; version is an int from MIGRATIONS
+                    conn.execute(f'PRAGMA user_version = {int(version)}')
+                print(f"Power database migrated to schema version {version}")
+            
+            self._migrated = True
+
+    def fetchone(self, query, params=()):
+        return self.connection().execute(query, params).fetchone()
+
+    def fetchall(self, query, params=()):
+        return self.connection().execute(query, params).fetchall()
+
+    def execute(self, query, params=()):
+        """Execute a write statement in its own transaction"""
+        conn = self.connection()
+        with conn:
+            return conn.execute(query, params)
+
+    def executemany(self, query, seq_of_params):
+        """Execute a write statement for each parameter set in one transaction"""
+        conn = self.connection()
+        with conn:
+            return conn.executemany(query, seq_of_params)
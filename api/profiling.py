@@ -0,0 +1,359 @@
+"""
+Request Profiling for JSPro PowerDesk
+Per-route latency histograms plus Redis, SQLite and subprocess usage per
+request. Aggregated stats are published per worker to Redis and served by
+GET /api/v1/device/profiling. With SERVER_TIMING_ENABLED=true every response
+also gets a Server-Timing header (off by default: it tells any client how the
+request was served).
+
+Opt-in stack sampling (PROFILE_SAMPLE_RATE=N samples 1 in N requests) collects
+folded stacks ("frame;frame;frame count") ready for flamegraph.pl/speedscope,
+served by GET /api/v1/device/profiling/stacks.
+
+Redis and SQLite calls are reported by the instrumented connections
+(api.redisconnection, api.power.store, api.logger.helper) through
+record_call(); subprocess spawns are counted with an audit hook.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from collections import Counter
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'true').lower() == 'true'
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'false').lower() == 'true'
+PROFILE_SAMPLE_RATE = int(os.getenv('PROFILE_SAMPLE_RATE', 0))  # 0 = stack sampling off
+PROFILE_SAMPLE_INTERVAL = int(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5)) / 1000
+
+# Upper bounds (ms) of the per-route latency histogram buckets
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+PUBLISH_INTERVAL_SECONDS = 10
+WORKER_KEY_PREFIX = 'profiling:worker:'
+WORKERS_KEY = 'profiling:workers'
+WORKER_KEY_TTL = 3600
+MAX_STACK_DEPTH = 64
+# SQLite VM instructions between deadline checks
+SQLITE_DEADLINE_CHECK_STEPS = 10000
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_route_stats = {}
+_folded_stacks = Counter()
+_request_counter = 0
+_last_published = 0.0
+_audit_hook_installed = False
+
+
+def record_call(kind, seconds):
+    """Record a Redis/SQLite call made while handling the current request"""
+    usage = getattr(_local, 'usage', None)
+    if usage is not None:
+        entry = usage[kind]
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def _audit_hook(event, args):
+    # Called for every audit event in the process, keep it cheap
+    if event == 'subprocess.Popen' or event == 'os.system':
+        usage = getattr(_local, 'usage', None)
+        if usage is not None:
+            usage['subprocess'][0] += 1
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """sqlite3 cursor that reports statement timings to record_call()"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_call('sqlite', time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_call('sqlite', time.perf_counter() - started)
+
+
+def _deadline_passed():
+    """SQLite progress handler: non-zero interrupts the running statement"""
+    from .deadlines import current_deadline
+    deadline = current_deadline()
+    return deadline is not None and time.monotonic() > deadline
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection factory (sqlite3.connect(..., factory=ProfiledConnection))
+
+    Connection.execute() doesn't go through cursor(), so both are covered.
+    Statements are interrupted once the deadline of the request running them
+    passed (see api.deadlines). The deadline is looked up on every check, so
+    connections reused across requests (api.power.store) follow the current one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_progress_handler(_deadline_passed, SQLITE_DEADLINE_CHECK_STEPS)
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _new_route_stats():
+    return {
+        'count': 0,
+        'errors': 0,
+        'sum_ms': 0.0,
+        'max_ms': 0.0,
+        'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),  # last bucket is +Inf
+        'redis_calls': 0,
+        'redis_ms': 0.0,
+        'sqlite_calls': 0,
+        'sqlite_ms': 0.0,
+        'subprocesses': 0
+    }
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack every PROFILE_SAMPLE_INTERVAL seconds into folded stacks"""
+
+    def __init__(self, thread_id):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.stop_event = threading.Event()
+        self.samples = Counter()
+
+    def run(self):
+        while not self.stop_event.wait(PROFILE_SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stop_event.set()
+        self.join(timeout=1)
+        return self.samples
+
+
+def _before_request():
+    global _request_counter
+
+    _local.usage = {'redis': [0, 0.0], 'sqlite': [0, 0.0], 'subprocess': [0, 0.0]}
+    _local.started = time.perf_counter()
+    _local.sampler = None
+
+    if PROFILE_SAMPLE_RATE > 0:
+        with _stats_lock:
+            _request_counter += 1
+            sample = _request_counter % PROFILE_SAMPLE_RATE == 0
+        if sample:
+            _local.sampler = StackSampler(threading.get_ident())
+            _local.sampler.start()
+
+
+def _after_request(response):
+    from flask import request
+
+    started = getattr(_local, 'started', None)
+    usage = getattr(_local, 'usage', None)
+    if started is None or usage is None:
+        return response
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    redis_calls, redis_seconds = usage['redis']
+    sqlite_calls, sqlite_seconds = usage['sqlite']
+    subprocesses = usage['subprocess'][0]
+    route = f'{request.method} {request.url_rule.rule}' if request.url_rule else f'{request.method} <unmatched>'
+
+    with _stats_lock:
+        stats = _route_stats.get(route)
+        if stats is None:
+            stats = _route_stats[route] = _new_route_stats()
+        stats['count'] += 1
+        if response.status_code >= 500:
+            stats['errors'] += 1
+        stats['sum_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                stats['buckets'][index] += 1
+                break
+        else:
+            stats['buckets'][-1] += 1
+        stats['redis_calls'] += redis_calls
+        stats['redis_ms'] += redis_seconds * 1000
+        stats['sqlite_calls'] += sqlite_calls
+        stats['sqlite_ms'] += sqlite_seconds * 1000
+        stats['subprocesses'] += subprocesses
+
+    sampler = getattr(_local, 'sampler', None)
+    if sampler is not None:
+        samples = sampler.stop()
+        with _stats_lock:
+            _folded_stacks.update(samples)
+        _local.sampler = None
+
+    if SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = ', '.join([
+            f'app;dur={elapsed_ms:.1f}',
+            f'redis;dur={redis_seconds * 1000:.1f};desc="{redis_calls} calls"',
+            f'sqlite;dur={sqlite_seconds * 1000:.1f};desc="{sqlite_calls} queries"',
+            f'subprocess;desc="{subprocesses} spawned"'
+        ])
+
+    # Stop attributing calls to this request before publishing (which uses Redis itself)
+    _local.usage = None
+    _local.started = None
+    _maybe_publish()
+    return response
+
+
+def _maybe_publish():
+    """Publish this worker's stats to Redis every PUBLISH_INTERVAL_SECONDS"""
+    global _last_published
+
+    now = time.monotonic()
+    if now - _last_published < PUBLISH_INTERVAL_SECONDS:
+        return
+    _last_published = now
+
+    try:
+        from .redisconnection import connection as red
+
+        key = f'{WORKER_KEY_PREFIX}{os.getpid()}'
+        pipe = red.pipeline(transaction=False)
+        pipe.set(key, json.dumps(get_worker_stats()), ex=WORKER_KEY_TTL)
+        pipe.sadd(WORKERS_KEY, key)
+        pipe.execute()
+    except Exception as e:
+        print(f"[PROFILING] Unable to publish stats: {e}")
+
+
+def get_worker_stats():
+    """Snapshot of this worker's per-route stats"""
+    with _stats_lock:
+        routes = {route: dict(stats, buckets=list(stats['buckets'])) for route, stats in _route_stats.items()}
+    return {
+        'pid': os.getpid(),
+        'updated_at': time.time(),
+        'latency_buckets_ms': list(LATENCY_BUCKETS_MS),
+        'routes': routes
+    }
+
+
+def get_profiling_stats():
+    """
+    Per-route stats merged across all workers that published to Redis
+
+    Returns:
+        dict: workers (pids), sample rate and per-route totals (slowest total
+        first) with average latency and cumulative histogram counts
+    """
+    from .redisconnection import connection as red
+
+    # Make sure this worker's latest numbers are included
+    global _last_published
+    _last_published = 0.0
+    _maybe_publish()
+
+    snapshots = []
+    keys = sorted(red.smembers(WORKERS_KEY))
+    if keys:
+        values = red.mget(keys)
+        stale = [key for key, value in zip(keys, values) if value is None]
+        if stale:
+            red.srem(WORKERS_KEY, *stale)
+        snapshots = [json.loads(value) for value in values if value is not None]
+
+    merged = {}
+    for snapshot in snapshots:
+        for route, stats in snapshot['routes'].items():
+            total = merged.setdefault(route, _new_route_stats())
+            for field in ('count', 'errors', 'sum_ms', 'redis_calls', 'redis_ms', 'sqlite_calls', 'sqlite_ms', 'subprocesses'):
+                total[field] += stats[field]
+            total['max_ms'] = max(total['max_ms'], stats['max_ms'])
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], stats['buckets'])]
+
+    routes = []
+    for route, stats in sorted(merged.items(), key=lambda item: item[1]['sum_ms'], reverse=True):
+        count = stats['count'] or 1
+        cumulative = 0
+        histogram = {}
+        for bound, bucket_count in zip(list(LATENCY_BUCKETS_MS) + ['inf'], stats['buckets']):
+            cumulative += bucket_count
+            histogram[f'le_{bound}'] = cumulative
+        routes.append({
+            'route': route,
+            'count': stats['count'],
+            'errors': stats['errors'],
+            'avg_ms': round(stats['sum_ms'] / count, 2),
+            'max_ms': round(stats['max_ms'], 2),
+            'total_ms': round(stats['sum_ms'], 1),
+            'redis_calls_per_request': round(stats['redis_calls'] / count, 2),
+            'redis_ms_per_request': round(stats['redis_ms'] / count, 2),
+            'sqlite_queries_per_request': round(stats['sqlite_calls'] / count, 2),
+            'sqlite_ms_per_request': round(stats['sqlite_ms'] / count, 2),
+            'subprocesses_per_request': round(stats['subprocesses'] / count, 2),
+            'histogram_ms': histogram
+        })
+
+    return {
+        'workers': [snapshot['pid'] for snapshot in snapshots],
+        'sample_rate': PROFILE_SAMPLE_RATE,
+        'routes': routes
+    }
+
+
+def get_folded_stacks():
+    """Folded stacks sampled by this worker, one 'frame;frame;frame count' per line"""
+    with _stats_lock:
+        items = _folded_stacks.most_common()
+    return ''.join(f'{stack} {count}\n' for stack, count in items)
+
+
+def reset_profiling_stats():
+    """Clear this worker's stats and sampled stacks"""
+    with _stats_lock:
+        _route_stats.clear()
+        _folded_stacks.clear()
+
+
+def init_profiling(app):
+    """Register the profiling hooks on the Flask app (no-op if PROFILING_ENABLED=false)"""
+    global _audit_hook_installed
+
+    if not PROFILING_ENABLED:
+        return
+
+    if not _audit_hook_installed:
+        # Audit hooks can't be removed, install at most once per process
+        sys.addaudithook(_audit_hook)
+        _audit_hook_installed = True
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
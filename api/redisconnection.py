@@ -1,6 +1,47 @@
+import os
+import time
 import redis
+from .profiling import record_call
 
 host = "localhost"
 password = ""
+# Seconds before a Redis call fails instead of holding the request (and its worker) indefinitely
+socket_timeout = float(os.getenv('REDIS_SOCKET_TIMEOUT', 5))
+socket_connect_timeout = float(os.getenv('REDIS_CONNECT_TIMEOUT', 2))
 
-connection = redis.Redis(host=host, password=password, decode_responses=True)
+
+class ProfiledRedis(redis.Redis):
+    """redis.Redis that reports command (and pipeline) timings to api.profiling"""
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_call('redis', time.perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        # A pipeline is one round trip, count it as one call
+        def timed_execute(raise_on_error=True):
+            started = time.perf_counter()
+            try:
+                return execute(raise_on_error)
+            finally:
+                record_call('redis', time.perf_counter() - started)
+
+        pipe.execute = timed_execute
+        return pipe
+
+
+# One pool per process, shared by all threads (gthread) or greenlets (gevent) of a worker
+connection = ProfiledRedis(
+    host=host,
+    password=password,
+    decode_responses=True,
+    socket_timeout=socket_timeout,
+    socket_connect_timeout=socket_connect_timeout,
+    health_check_interval=30
+)
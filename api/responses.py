@@ -0,0 +1,173 @@
+"""
+JSON Response Encoding for JSPro PowerDesk
+jsonify() goes through FastJSONProvider (installed by create_app), which uses
+orjson when it is installed and the stdlib encoder otherwise. JSON_BACKEND=json
+forces the stdlib encoder.
+
+Constant payloads (API/endpoint documentation) are serialized once at import
+with @static_json and served as cached bytes. Polled data endpoints use
+@conditional: a strong ETag derived from data versions, answering
+If-None-Match with 304 before the payload is built.
+"""
+
+import os
+import json
+import uuid
+import decimal
+import hashlib
+import dataclasses
+from datetime import date, datetime
+from functools import wraps
+from flask import current_app, request, g
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.getenv('JSON_BACKEND', 'auto').lower() == 'json':
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(o):
+    """Types jsonify has always accepted beyond plain JSON (same as Flask's encoder)"""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    # Dates go through _default so they serialize exactly like before (HTTP date)
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(obj):
+        """Serialize obj to compact UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(obj):
+        """Serialize obj to compact UTF-8 JSON bytes"""
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider serializing responses with dumps() (orjson when available)"""
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Caller asked for specific json.dumps options
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if self._app.debug:
+            # Keep the indented output of the default provider while debugging
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+def static_json(view=None, *, last_update=False):
+    """
+    Serve a view's constant payload from bytes serialized once at import
+
+    The view returns a plain dict (optionally with a status code) and must not
+    depend on the request; it is called once when the module is imported.
+    With last_update=True a top-level "last_update" (current time) is appended
+    to the cached bytes on every request.
+    """
+    if view is None:
+        return lambda v: static_json(v, last_update=last_update)
+
+    result = view()
+    payload, status = result if isinstance(result, tuple) else (result, 200)
+    body = dumps(payload)
+    if last_update:
+        head = body[:-1] + (b',"last_update":"' if payload else b'"last_update":"')
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        data = body
+        if last_update:
+            data = head + datetime.now().strftime("%Y-%m-%d %H:%M:%S").encode() + b'"}'
+        return current_app.response_class(data, status=status, mimetype='application/json')
+
+    return wrapper
+
+
+def file_version(*paths):
+    """
+    Version of SQLite database files: (mtime_ns, size) of each file and its -wal
+
+    Every commit touches the database or its WAL, and a stat is cheaper than
+    a query. (PRAGMA data_version is per connection, so it can't be compared
+    across requests or workers.)
+    """
+    version = []
+    for path in paths:
+        for name in (path, f'{path}-wal'):
+            try:
+                st = os.stat(name)
+                version.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                version.append(None)
+    return version
+
+
+def conditional(version):
+    """
+    Answer If-None-Match with 304 before the view builds its payload
+
+    version(*view_args) returns cheap, repr()-able data versions (Redis digest,
+    stream ids, file_version(), ...) that change whenever the view's data does.
+    The weak ETag is a hash of them plus the path, query string and bandwidth
+    profile, set on 200 and 304 responses. If version() fails the view runs
+    normally without an ETag.
+    Put it below the auth decorator so unauthenticated requests never get a 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                # The bandwidth profile (api/bandwidth.py) selects a different representation
+                parts = (request.path, sorted(request.args.items(multi=True)), g.get('bandwidth_profile'), version(*args, **kwargs))
+                etag = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+            except Exception as e:
+                print(f"Error computing ETag for {request.path}: {e}")
+                return view(*args, **kwargs)
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            # Weak: the same data may be sent gzip/brotli encoded or not (api/compression.py),
+            # so the 200 and the 304 carry the same validator whatever the encoding
+            response.set_etag(etag, weak=True)
+            # Clients may keep the body but must revalidate on every poll
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return wrapper
+
+    return decorator
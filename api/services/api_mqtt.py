@@ -4,6 +4,8 @@ import json
 from datetime import datetime
 from flask import jsonify, request, Response
 from . import service_bp
+from ..profiling import ProfiledConnection
+from ..responses import static_json
 from auths import token_auth as auth
 from config import PATH
 
@@ -331,7 +333,7 @@ def get_mqtt_bakti_summary():
             }), 200
         
         # Connect to database
-        conn = sqlite3.connect(MQTT_BAKTI_DB_PATH)
+        conn = sqlite3.connect(MQTT_BAKTI_DB_PATH, factory=ProfiledConnection)
         cursor = conn.cursor()
         
         # Build query with optional filtering
@@ -462,7 +464,7 @@ def get_latest_mqtt_bakti_summary():
             }), 200
         
         # Connect to database
-        conn = sqlite3.connect(MQTT_BAKTI_DB_PATH)
+        conn = sqlite3.connect(MQTT_BAKTI_DB_PATH, factory=ProfiledConnection)
         cursor = conn.cursor()
         
         # Get the most recent record
@@ -570,7 +572,7 @@ def get_mqtt_bakti_stats():
         db_size = os.path.getsize(MQTT_BAKTI_DB_PATH)
         
         # Connect to database
-        conn = sqlite3.connect(MQTT_BAKTI_DB_PATH)
+        conn = sqlite3.connect(MQTT_BAKTI_DB_PATH, factory=ProfiledConnection)
         cursor = conn.cursor()
         
         # Get total record count
@@ -638,11 +640,12 @@ def get_mqtt_bakti_stats():
         }), 500
 
 @service_bp.route('/mqtt-bakti/info', methods=['GET'])
+@static_json(last_update=True)
 def get_mqtt_bakti_info():
     """
     Get MQTT Bakti service information and available endpoints
     """
-    return jsonify({
+    return {
         'status': 'success',
         'data': {
             'service': 'MQTT Bakti Monitoring API',
@@ -699,9 +702,8 @@ def get_mqtt_bakti_info():
             'database_path': MQTT_BAKTI_DB_PATH,
             'table_name': 'mqtt_bakti_summary',
             'broker': 'ehub_broker'
-        },
-        "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }), 200
+        }
+    }, 200
 
 
 # ================== MQTT SUNDAYA ENDPOINTS ==================
@@ -938,7 +940,7 @@ def get_mqtt_energy_summary():
             }), 200
         
         # Connect to database
-        conn = sqlite3.connect(MQTT_SUNDAYA_DB_PATH)
+        conn = sqlite3.connect(MQTT_SUNDAYA_DB_PATH, factory=ProfiledConnection)
         cursor = conn.cursor()
         
         # Build query
@@ -1055,7 +1057,7 @@ def get_mqtt_battery_summary():
             }), 200
         
         # Connect to database
-        conn = sqlite3.connect(MQTT_SUNDAYA_DB_PATH)
+        conn = sqlite3.connect(MQTT_SUNDAYA_DB_PATH, factory=ProfiledConnection)
         cursor = conn.cursor()
         
         # Build query
@@ -1144,7 +1146,7 @@ def get_latest_mqtt_energy():
             }), 200
         
         # Connect to database
-        conn = sqlite3.connect(MQTT_SUNDAYA_DB_PATH)
+        conn = sqlite3.connect(MQTT_SUNDAYA_DB_PATH, factory=ProfiledConnection)
         cursor = conn.cursor()
         
         # Get latest record
@@ -1220,7 +1222,7 @@ def get_latest_mqtt_battery():
             }), 200
         
         # Connect to database
-        conn = sqlite3.connect(MQTT_SUNDAYA_DB_PATH)
+        conn = sqlite3.connect(MQTT_SUNDAYA_DB_PATH, factory=ProfiledConnection)
         cursor = conn.cursor()
         
         # Get latest record
@@ -1299,7 +1301,7 @@ def get_mqtt_sundaya_stats():
         db_size = os.path.getsize(MQTT_SUNDAYA_DB_PATH)
         
         # Connect to database
-        conn = sqlite3.connect(MQTT_SUNDAYA_DB_PATH)
+        conn = sqlite3.connect(MQTT_SUNDAYA_DB_PATH, factory=ProfiledConnection)
         cursor = conn.cursor()
         
         # Get energy stats
@@ -1395,11 +1397,12 @@ def get_mqtt_sundaya_stats():
         }), 500
 
 @service_bp.route('/mqtt-sundaya/info', methods=['GET'])
+@static_json(last_update=True)
 def get_mqtt_sundaya_info():
     """
     Get MQTT Sundaya service information and available endpoints
     """
-    return jsonify({
+    return {
         'status': 'success',
         'data': {
             'service': 'MQTT Sundaya Loggers Monitoring API',
@@ -1471,8 +1474,7 @@ def get_mqtt_sundaya_info():
             'database_path': MQTT_SUNDAYA_DB_PATH,
             'tables': ['mqtt_energy_summary', 'mqtt_battery_summary'],
             'broker': 'sundaya_broker'
-        },
-        "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }), 200
+        }
+    }, 200
 
 
@@ -5,6 +5,8 @@ from flask import jsonify, request, Response
 from . import service_bp
 from auths import token_auth as auth
 from datetime import datetime
+from api.responses import static_json
+from api.deadlines import request_timeout
 
 def validate_ip(ip):
     """Validate IP address format"""
@@ -35,7 +37,7 @@ def execute_snmpget(ip, community, oid, version='1', timeout=5):
             cmd,
             capture_output=True,
             text=True,
-            timeout=timeout + 2  # Add buffer to subprocess timeout
+            timeout=request_timeout(timeout + 2)  # Add buffer to subprocess timeout
         )
         
         if result.returncode == 0:
@@ -404,6 +406,7 @@ def test_snmp_connection():
         }), 500
 
 @service_bp.route('/snmp/info', methods=['GET'])
+@static_json
 def snmp_info():
     """
     Get information about available SNMP OIDs for monitoring
@@ -516,7 +519,7 @@ def snmp_info():
         }
     ]
     
-    return jsonify({
+    return {
         'success': True,
         'data': {
             'total_oids': len(snmp_oids),
@@ -525,4 +528,4 @@ def snmp_info():
             'default_community': 'public',
             'default_timeout': 5
         }
-    })
+    }
@@ -4,6 +4,8 @@ from flask import jsonify, request, Response
 from . import service_bp
 from auths import token_auth as auth
 from datetime import datetime
+from api.responses import static_json
+from api.deadlines import request_timeout
 
 def validate_ip(ip):
     """Validate IP address format"""
@@ -34,7 +36,7 @@ def execute_snmpget_rectifier(ip, community, oid, version='1', timeout=10, port=
             cmd,
             capture_output=True,
             text=True,
-            timeout=timeout + 3  # Add buffer to subprocess timeout
+            timeout=request_timeout(timeout + 3)  # Add buffer to subprocess timeout
         )
         
         if result.returncode == 0:
@@ -435,6 +437,7 @@ def test_snmp_rectifier_connection():
         }), 500
 
 @service_bp.route('/snmp-rectifier/info', methods=['GET'])
+@static_json
 def snmp_rectifier_info():
     """
     Get information about available SNMP OIDs for rectifier monitoring
@@ -533,7 +536,7 @@ def snmp_rectifier_info():
         }
     ]
     
-    return jsonify({
+    return {
         'success': True,
         'data': {
             'total_oids': len(rectifier_oids),
@@ -545,4 +548,4 @@ def snmp_rectifier_info():
             'device_type': 'Huawei Rectifier',
             'base_oid': '.1.3.6.1.4.1.2011.6.164'
         }
-    })
+    }
@@ -5,6 +5,8 @@ from flask import jsonify, request
 from . import service_bp
 from auths import token_auth as auth
 from utils import bash_command
+from api.responses import static_json
+from api.deadlines import request_timeout
 
 # Log file paths configuration
 LOG_PATHS = {
@@ -44,6 +46,8 @@ ALLOWED_SERVICES = [
     'store_data_5min.timer',
     'accumulate_energy.service',
     'webapp.service',
+    # Threaded alternative to webapp.service (Conflicts=, only one of them is active)
+    'webapp-async.service',
     'nginx.service',
     'i2c-heartbeat.service',
     'handle_canbus.service'
@@ -69,7 +73,7 @@ def run_systemctl_command(action, service):
         # Special handling for status command
         if action == 'status':
             # Get detailed status information
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=request_timeout(30))
             
             # Parse systemctl status output
             status_info = {
@@ -84,11 +88,11 @@ def run_systemctl_command(action, service):
             # Also get quick status check for cross-validation
             try:
                 is_active_cmd = ['sudo', 'systemctl', 'is-active', service]
-                is_active_result = subprocess.run(is_active_cmd, capture_output=True, text=True, timeout=10)
+                is_active_result = subprocess.run(is_active_cmd, capture_output=True, text=True, timeout=request_timeout(10))
                 is_active_status = is_active_result.stdout.strip()
                 
                 is_enabled_cmd = ['sudo', 'systemctl', 'is-enabled', service]
-                is_enabled_result = subprocess.run(is_enabled_cmd, capture_output=True, text=True, timeout=10)
+                is_enabled_result = subprocess.run(is_enabled_cmd, capture_output=True, text=True, timeout=request_timeout(10))
                 is_enabled_status = is_enabled_result.stdout.strip()
                 
                 # Debug info
@@ -169,7 +173,7 @@ def run_systemctl_command(action, service):
             }
         else:
             # For other actions (start, stop, restart, enable, disable)
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=request_timeout(30))
             
             return {
                 'success': result.returncode == 0,
@@ -573,11 +577,12 @@ def handle_systemd_action():
         }), 500
 
 @service_bp.route('/info', methods=['GET'])
+@static_json
 def get_service_info():
     """
     Get service API information and available endpoints
     """
-    return jsonify({
+    return {
         'status': 'success',
         'data': {
             'service': 'Service Management API',
@@ -669,4 +674,4 @@ def get_service_info():
                 }
             }
         }
-    }), 200
\ No newline at end of file
+    }, 200
\ No newline at end of file
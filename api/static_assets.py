@@ -0,0 +1,47 @@
+"""
+Fingerprinted Static URLs for JSPro PowerDesk
+url_for('static', filename=...) gets ?v=<content hash>, so a static file can
+be cached for a year and a changed file gets a new URL. nginx serves
+/static/ with far-future headers when ?v is present (dist/nginx/jspro-powerdesk);
+when Flask serves them (development) the same Cache-Control is set here.
+"""
+
+import os
+import hashlib
+from flask import request
+
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+_fingerprints = {}
+
+
+def static_fingerprint(static_folder, filename):
+    """Short content hash of a static file (cached per process, None if missing)"""
+    path = os.path.join(static_folder, filename)
+    if path not in _fingerprints:
+        try:
+            with open(path, 'rb') as f:
+                _fingerprints[path] = hashlib.md5(f.read()).hexdigest()[:10]
+        except OSError:
+            _fingerprints[path] = None
+    return _fingerprints[path]
+
+
+def init_static_fingerprints(app):
+    """Add ?v= to static URLs and far-future caching to fingerprinted static responses"""
+
+    @app.url_defaults
+    def _add_static_fingerprint(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            fingerprint = static_fingerprint(app.static_folder, values['filename'])
+            if fingerprint:
+                values['v'] = fingerprint
+
+    @app.after_request
+    def _cache_fingerprinted_static(response):
+        if request.endpoint == 'static' and request.args.get('v') and response.status_code == 200:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return response
@@ -1,13 +1,31 @@
 import os
 import json
-import markdown
+import time
+import subprocess
+
+# Measured from here to the end of this module, reported once the app is ready
+_startup_started = time.perf_counter()
+
 from flask import Flask, request, render_template, jsonify, Blueprint, session, flash, redirect, url_for, make_response
 from flask_cors import CORS
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from config import *
-from helpers import *
+import config
+from config import PATH
+from helpers.config_device_helper import (
+    update_site_information, update_device_model, update_device_version, update_enabled_services,
+    update_scc_type, update_config_cutoff_reconnect, update_config_scc, update_setting_mqtt,
+    update_rectifier_configuration, write_config_file, restart_device_config_loader
+)
+from helpers.device_config_cache import get_device_config_field
+from helpers.ip_address_helper import get_ip_address, get_subnet_mask, get_gateway
 from utils import change_ip, bash_command
 from api.core import register_blueprints, register_error_handlers
+from api.profiling import init_profiling
+from api.responses import FastJSONProvider
+from api.compression import init_compression
+from api.bandwidth import init_bandwidth_profile
+from api.static_assets import init_static_fingerprints
+from api.deadlines import init_deadlines, request_deadline, SERVICE_RESTART_DEADLINE_SECONDS
 from api.redisconnection import connection as red
 from auths import USERS, verify_password, record_successful_login, record_failed_attempt, is_user_locked, get_user_role, audit_access, get_menu_access, can_access_page
 from validations import validate_setting_ip, validate_modbus_id
@@ -15,18 +33,43 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY')
+login_manager = LoginManager()
+login_manager.login_view = 'login'
+
 
-# Register all API blueprints and error handlers
-register_blueprints(app)
-register_error_handlers(app)
+def create_app():
+    """
+    Create the Flask app and register API blueprints, error handlers, CORS and login manager
+    
+    Heavy/optional modules (markdown, gpiozero, smbus2) are imported on first use
+    and device settings are read from Redis on first access (see config.py), so
+    creating the app doesn't wait on them. Blueprint import times are reported by
+    register_blueprints and kept in app.config['STARTUP_IMPORT_TIMES'].
+    JSON responses are encoded by FastJSONProvider (orjson when installed),
+    large JSON/HTML responses are compressed (after the low-bandwidth profile
+    rewrote them, see api/bandwidth.py) and static URLs are fingerprinted.
+    Each request gets a deadline for its subprocess and SQLite calls (see
+    api/deadlines.py).
+    """
+    app = Flask(__name__)
+    app.secret_key = os.getenv('SECRET_KEY')
+    app.json = FastJSONProvider(app)
+    
+    # Register all API blueprints and error handlers
+    register_blueprints(app)
+    register_error_handlers(app)
+    init_profiling(app)
+    init_deadlines(app)
+    init_compression(app)
+    init_bandwidth_profile(app)
+    init_static_fingerprints(app)
+    
+    CORS(app)
+    login_manager.init_app(app)
+    return app
 
-cors = CORS(app)
 
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+app = create_app()
 
 class User(UserMixin):
     def __init__(self, username):
@@ -57,7 +100,7 @@ def index():
         username = current_user.id
         
         # get site name
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         
         # Get user role and menu access
         user_role = get_user_role(username)
@@ -86,12 +129,12 @@ def index():
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
-            'battery_type': battery_type,
+            'scc_type': config.scc_type,
+            'battery_type': config.battery_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1',
-            'number_of_scc': number_of_scc,
-            'number_of_battery': number_of_batt,
+            'number_of_scc': config.number_of_scc,
+            'number_of_battery': config.number_of_batt,
             'enabled_services': enabled_services,
         }
         
@@ -114,12 +157,12 @@ def index():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
-            'battery_type': battery_type,
+            'scc_type': config.scc_type,
+            'battery_type': config.battery_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1',
-            'number_of_scc': number_of_scc,
-            'number_of_battery': number_of_batt,
+            'number_of_scc': config.number_of_scc,
+            'number_of_battery': config.number_of_batt,
             'enabled_services': enabled_services,
         }
     return render_template('index.html', **context)
@@ -141,17 +184,17 @@ def scc():
         user_role = get_user_role(username)
         menu_access = get_menu_access(username)
         
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1',
-            'scc_type': scc_type,
-            'number_of_scc': number_of_scc
+            'scc_type': config.scc_type,
+            'number_of_scc': config.number_of_scc
         }
         
         # Audit page access
@@ -164,11 +207,11 @@ def scc():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1',
-            'scc_type': scc_type,
-            'number_of_scc': number_of_scc
+            'scc_type': config.scc_type,
+            'number_of_scc': config.number_of_scc
         }
     return render_template('scc.html', **context)
 
@@ -189,18 +232,18 @@ def battery():
         user_role = get_user_role(username)
         menu_access = get_menu_access(username)
         
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1',
-            'battery_type': battery_type,
-            'number_of_battery': number_of_batt,
-            'number_of_cell': number_of_cell
+            'battery_type': config.battery_type,
+            'number_of_battery': config.number_of_batt,
+            'number_of_cell': config.number_of_cell
         }
         
         # Audit page access
@@ -213,12 +256,12 @@ def battery():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1',
-            'battery_type': battery_type,
-            'number_of_battery': number_of_batt,
-            'number_of_cell': number_of_cell
+            'battery_type': config.battery_type,
+            'number_of_battery': config.number_of_batt,
+            'number_of_cell': config.number_of_cell
         }
     return render_template('battery.html', **context)
 
@@ -241,28 +284,28 @@ def rectifier():
         
         # Load configuration data
         config_path = f'{PATH}/config_device.json'
-        config = {}
+        config_data = {}
         try:
             with open(config_path, 'r') as f:
-                config = json.load(f)
+                config_data = json.load(f)
         except (FileNotFoundError, json.JSONDecodeError) as e:
             print(f"Warning: Could not load config_device.json: {e}")
-            config = {
+            config_data = {
                 'rectifier_config': {
                     'host': '127.0.0.1',
                     'port': 161
                 }
             }
         
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
-            'config': config
+            'config': config_data
             # 'ip_address': '192.168.4.44'
         }
         # Audit page access
@@ -275,7 +318,7 @@ def rectifier():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             'config': {
                 'rectifier_config': {
@@ -304,13 +347,13 @@ def datalog():
         user_role = get_user_role(username)
         menu_access = get_menu_access(username)
         
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.4.44'
         }
@@ -325,7 +368,7 @@ def datalog():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.4.3'
         }
@@ -348,14 +391,14 @@ def scc_alarm_log():
         user_role = get_user_role(username)
         menu_access = get_menu_access(username)
         
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
-            'number_of_scc': number_of_scc,
+            'scc_type': config.scc_type,
+            'number_of_scc': config.number_of_scc,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.3.4'
         }
@@ -370,8 +413,8 @@ def scc_alarm_log():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
-            'number_of_scc': number_of_scc,
+            'scc_type': config.scc_type,
+            'number_of_scc': config.number_of_scc,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.3.4'
         }
@@ -397,13 +440,13 @@ def mqtt_bakti():
         user_role = get_user_role(username)
         menu_access = get_menu_access(username)
         
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             'mqtt_config': data.get('mqtt_config', {}),
             'user_passwords': {
@@ -423,7 +466,7 @@ def mqtt_bakti():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             'mqtt_config': data.get('mqtt_config', {}),
             'user_passwords': {
@@ -454,13 +497,13 @@ def mqtt_sundaya():
         user_role = get_user_role(username)
         menu_access = get_menu_access(username)
         
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             'mqtt_config': data.get('mqtt_config', {}),
             'user_passwords': {
@@ -480,7 +523,7 @@ def mqtt_sundaya():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             'mqtt_config': data.get('mqtt_config', {}),
             'user_passwords': {
@@ -507,13 +550,13 @@ def systemd_service():
         user_role = get_user_role(username)
         menu_access = get_menu_access(username)
         
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1',
             # User passwords for service authentication
@@ -534,7 +577,7 @@ def systemd_service():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1',
             # User passwords for service authentication
@@ -562,13 +605,13 @@ def snmp_service():
         user_role = get_user_role(username)
         menu_access = get_menu_access(username)
         
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1',
             'user_passwords': {
@@ -588,7 +631,7 @@ def snmp_service():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1',
             'user_passwords': {
@@ -615,13 +658,13 @@ def power_operation():
         user_role = get_user_role(username)
         menu_access = get_menu_access(username)
         
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1'
         }
@@ -636,7 +679,7 @@ def power_operation():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.1.1'
         }
@@ -664,14 +707,14 @@ def site_information():
             data = json.load(file)
         
         # get site name
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         
         context = {
             'username': username,
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'site_information': data.get('site_information'),
             'device_model': data.get('device_model'),
             'device_version': data.get('device_version'),
@@ -704,7 +747,7 @@ def site_information():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'site_information': data.get('site_information'),
             'device_model': data.get('device_model'),
             'device_version': data.get('device_version'),
@@ -722,6 +765,7 @@ def site_information():
 
 @app.route('/setting-device', methods=['GET', 'POST'])
 @login_required
+@request_deadline(SERVICE_RESTART_DEADLINE_SECONDS)
 def setting_device():
     # Check page access permission
     username = current_user.id
@@ -746,9 +790,12 @@ def setting_device():
         if form_site_information:
             response = update_site_information(path, data)            
             if response:
-                flash('Site Information has been updated successfully', 'success')
                 audit_access(username, 'device_settings', 'update_site_information')
-                bash_command('sudo systemctl restart device_config_loader.service webapp.service')
+                try:
+                    restart_device_config_loader()
+                    flash('Site Information has been updated successfully', 'success')
+                except subprocess.TimeoutExpired:
+                    flash('Site Information was saved, but restarting the services timed out', 'danger')
             else:
                 flash('Failed to update Site Information', 'danger')
             return redirect(url_for('setting_device'))
@@ -756,9 +803,12 @@ def setting_device():
         if form_device_model:
             response = update_device_model(path, data)
             if response:
-                flash('Device Info has been updated successfully', 'success')
                 audit_access(username, 'device_settings', 'update_device_model')
-                bash_command('sudo systemctl restart device_config_loader.service webapp.service')
+                try:
+                    restart_device_config_loader()
+                    flash('Device Info has been updated successfully', 'success')
+                except subprocess.TimeoutExpired:
+                    flash('Device Info was saved, but restarting the services timed out', 'danger')
             else:
                 flash('Failed to update Device Info', 'danger')
             return redirect(url_for('setting_device'))
@@ -766,9 +816,13 @@ def setting_device():
         if form_device_version:
             response = update_device_version(path, data)
             if response:
-                flash('Device Version & Port Configuration has been updated successfully', 'success')
                 audit_access(username, 'device_settings', 'update_device_version')
-                bash_command('sudo systemctl restart device_config_loader.service talis5.service webapp.service')
+                try:
+                    # Bumps device_config:version, the device profile follows without a webapp restart
+                    restart_device_config_loader('talis5.service')
+                    flash('Device Version & Port Configuration has been updated successfully', 'success')
+                except subprocess.TimeoutExpired:
+                    flash('Device Version was saved, but restarting the services timed out', 'danger')
             else:
                 flash('Failed to update Device Version', 'danger')
             return redirect(url_for('setting_device'))
@@ -791,7 +845,7 @@ def setting_device():
             data = json.load(file)
 
         # get site name
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         
         # get usb port
         get_port_usb = []
@@ -812,7 +866,7 @@ def setting_device():
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'site_information': data.get('site_information'),
             'device_model': data.get('device_model'),
             'device_version': data.get('device_version'),
@@ -839,7 +893,7 @@ def setting_device():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'site_information': data.get('site_information'),
             'device_model': data.get('device_model'),
             'device_version': data.get('device_version'),
@@ -903,8 +957,7 @@ def setting_ip():
                 config_data['ip_configuration']['gateway'] = data.get('gateway', '')
                 
                 # Save updated configuration
-                with open(path, 'w') as f:
-                    json.dump(config_data, f, indent=4)
+                write_config_file(path, config_data)
                 
                 audit_access(username, 'ip_configuration', 'update_ip_settings')
                 
@@ -938,7 +991,7 @@ def setting_ip():
         menu_access = get_menu_access(username)
         
         # get site name
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         
         # Read IP configuration directly from eth0 interface
         ip_address = get_ip_address('eth0')
@@ -958,7 +1011,7 @@ def setting_ip():
             'menu_access': menu_access,
             'site_name': site_name,
             'data_ip': data_ip,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': ip_address or "",
             'subnet_mask': subnet_mask or "",
             'gateway': gateway or ""
@@ -993,7 +1046,7 @@ def setting_ip():
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
             'data_ip': data_ip,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'ip_address': ip_address,
             'subnet_mask': subnet_mask,
             'gateway': gateway
@@ -1003,6 +1056,7 @@ def setting_ip():
 
 @app.route('/setting-scc', methods=['GET', 'POST'])
 @login_required
+@request_deadline(SERVICE_RESTART_DEADLINE_SECONDS)
 def setting_scc():
     # Check page access permission
     username = current_user.id
@@ -1030,9 +1084,13 @@ def setting_scc():
         if scc_type_form == 'scc-type-form':
             response = update_scc_type(path, form_data)
             if response:
-                flash('SCC Type has been updated successfully', 'success')
                 audit_access(username, 'scc_settings', 'update_scc_type')
-                bash_command('sudo systemctl restart scc.service device_config_loader.service webapp.service')
+                try:
+                    # Bumps device_config:version, the device profile follows without a webapp restart
+                    restart_device_config_loader('scc.service')
+                    flash('SCC Type has been updated successfully', 'success')
+                except subprocess.TimeoutExpired:
+                    flash('SCC Type was saved, but restarting the services timed out', 'danger')
             else:
                 flash('Failed to update SCC Type', 'danger')
             return redirect(url_for('setting_scc'))
@@ -1040,16 +1098,19 @@ def setting_scc():
         if scc_setting_id_form == 'scc-setting-id-form':
             is_valid, msg = validate_modbus_id(request.form)
             if is_valid:
-                if number_of_scc == 3:
+                if config.number_of_scc == 3:
                     for i in range(1, 4):
                         red.set(f'scc:{i}:id', request.form.get(f'scc-id-{i}'))
-                if number_of_scc == 2:
+                if config.number_of_scc == 2:
                     for i in range(1, 3):
                         red.set(f'scc:{i}:id', request.form.get(f'scc-id-{i}'))
-                bash_command('sudo systemctl restart scc.service')
-                bash_command('sudo systemctl daemon-reload')
-                flash('SCC ID has been updated successfully', 'success')
                 audit_access(username, 'scc_settings', 'update_scc_id')
+                try:
+                    bash_command('sudo systemctl restart scc.service')
+                    bash_command('sudo systemctl daemon-reload')
+                    flash('SCC ID has been updated successfully', 'success')
+                except subprocess.TimeoutExpired:
+                    flash('SCC ID was saved, but restarting the services timed out', 'danger')
             else:
                 flash('Failed to update SCC ID', 'danger')
             return redirect(url_for('setting_scc'))
@@ -1057,10 +1118,13 @@ def setting_scc():
         if config_relay_form == 'config-relay-form':
             response = update_config_cutoff_reconnect(path, form_data)
             if response:
-                flash('Config Value Cut off / Reconnect has been updated successfully', 'success')
                 audit_access(username, 'scc_settings', 'update_relay_config')
-                os.system(f'sudo python3 {PATH}/config_scc.py')
-                bash_command('sudo systemctl restart scc.service webapp.service')
+                try:
+                    bash_command(['sudo', 'python3', f'{PATH}/config_scc.py'])
+                    bash_command('sudo systemctl restart scc.service')
+                    flash('Config Value Cut off / Reconnect has been updated successfully', 'success')
+                except subprocess.TimeoutExpired:
+                    flash('Config Value Cut off / Reconnect was saved, but applying it to the SCC timed out', 'danger')
             else:
                 flash('Failed to update Config Value Cut off / Reconnect', 'danger')
             return redirect(url_for('setting_scc'))
@@ -1068,10 +1132,13 @@ def setting_scc():
         if config_scc_form == 'config-scc-form':
             response = update_config_scc(path, form_data)
             if response:
-                flash('Config Value SCC has been updated successfully', 'success')
                 audit_access(username, 'scc_settings', 'update_scc_config')
-                os.system(f'sudo python3 {PATH}/config_scc.py')
-                bash_command('sudo systemctl restart scc.service webapp.service')
+                try:
+                    bash_command(['sudo', 'python3', f'{PATH}/config_scc.py'])
+                    bash_command('sudo systemctl restart scc.service')
+                    flash('Config Value SCC has been updated successfully', 'success')
+                except subprocess.TimeoutExpired:
+                    flash('Config Value SCC was saved, but applying it to the SCC timed out', 'danger')
             else:
                 flash('Failed to update Config Value SCC', 'danger')
             return redirect(url_for('setting_scc'))
@@ -1081,7 +1148,7 @@ def setting_scc():
         menu_access = get_menu_access(username)
         
         # get site name
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         
         # Audit page access
         audit_access(username, 'scc_settings', 'view')
@@ -1096,7 +1163,7 @@ def setting_scc():
     scc_type_underscore = scc_type_data.replace('-', '_')
     
     # get scc id from redis
-    if number_of_scc == 2:
+    if config.number_of_scc == 2:
         try:
             scc_id_1 = int(red.get('scc:1:id'))
             scc_id_2 = int(red.get('scc:2:id'))
@@ -1111,7 +1178,7 @@ def setting_scc():
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.3.4',
             'scc_ids': {1: scc_id_1, 2: scc_id_2},
-            'number_of_scc': number_of_scc,
+            'number_of_scc': config.number_of_scc,
             'scc_type': data.get('device_version').get('scc_type'),
             'scc_source': data.get('device_version').get('scc_source'),
             'host': data.get(f'{scc_type_underscore}').get('host'),
@@ -1120,7 +1187,7 @@ def setting_scc():
             'config_scc': data.get(f'{scc_type_underscore}').get('parameter'),
             'config_relay': data.get('handle_relay'),
         }
-    if number_of_scc == 3:
+    if config.number_of_scc == 3:
         try:
             scc_id_1 = int(red.get('scc:1:id'))
             scc_id_2 = int(red.get('scc:2:id'))
@@ -1137,7 +1204,7 @@ def setting_scc():
             'ip_address': get_ip_address('eth0'),
             # 'ip_address': '192.168.3.4',
             'scc_ids': {1: scc_id_1, 2: scc_id_2, 3: scc_id_3},
-            'number_of_scc': number_of_scc,
+            'number_of_scc': config.number_of_scc,
             'scc_type': data.get('device_version').get('scc_type'),
             'scc_source': data.get('device_version').get('scc_source'),
             'host': data.get(f'{scc_type_underscore}').get('host'),
@@ -1168,7 +1235,8 @@ def get_scc_rules(scc_type):
         with open(rules_file, 'r', encoding='utf-8') as file:
             markdown_content = file.read()
         
-        # Convert markdown to HTML with extensions
+        # Convert markdown to HTML with extensions (imported here, only this page needs it)
+        import markdown
         md = markdown.Markdown(extensions=[
             'markdown.extensions.tables',
             'markdown.extensions.fenced_code',
@@ -1195,6 +1263,7 @@ def get_scc_rules(scc_type):
 
 @app.route('/setting-mqtt', methods=['GET', 'POST'])
 @login_required
+@request_deadline(SERVICE_RESTART_DEADLINE_SECONDS)
 def setting_mqtt():
     # Check page access permission
     username = current_user.id
@@ -1217,9 +1286,12 @@ def setting_mqtt():
         if form_setting_mqtt_bakti:
             response = update_setting_mqtt(path, data, broker_type='ehub_broker')            
             if response:
-                flash('MQTT Bakti Settings have been updated successfully', 'success')
                 audit_access(username, 'mqtt_settings', 'update_mqtt_bakti')
-                bash_command('sudo systemctl restart mqtt_publish.service device_config_loader.service')
+                try:
+                    restart_device_config_loader('mqtt_publish.service')
+                    flash('MQTT Bakti Settings have been updated successfully', 'success')
+                except subprocess.TimeoutExpired:
+                    flash('MQTT Bakti Settings was saved, but restarting the services timed out', 'danger')
             else:
                 flash('Failed to update MQTT Bakti Settings', 'danger')
             return redirect(url_for('setting_mqtt'))
@@ -1227,9 +1299,12 @@ def setting_mqtt():
         if form_setting_mqtt_sundaya:
             response = update_setting_mqtt(path, data, broker_type='sundaya_broker')            
             if response:
-                flash('MQTT Sundaya Settings have been updated successfully', 'success')
                 audit_access(username, 'mqtt_settings', 'update_mqtt_sundaya')
-                bash_command('sudo systemctl restart mqtt_publish.service device_config_loader.service')
+                try:
+                    restart_device_config_loader('mqtt_publish.service')
+                    flash('MQTT Sundaya Settings have been updated successfully', 'success')
+                except subprocess.TimeoutExpired:
+                    flash('MQTT Sundaya Settings was saved, but restarting the services timed out', 'danger')
             else:
                 flash('Failed to update MQTT Sundaya Settings', 'danger')
             return redirect(url_for('setting_mqtt'))
@@ -1243,7 +1318,7 @@ def setting_mqtt():
             data = json.load(file)
 
         # get site name
-        site_name = red.hget('device_config', 'site_name')
+        site_name = get_device_config_field('site_name')
         
         # Get mqtt_config with default structure
         mqtt_config = data.get('mqtt_config', {})
@@ -1257,7 +1332,7 @@ def setting_mqtt():
             'user_role': user_role,
             'menu_access': menu_access,
             'site_name': site_name,
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'mqtt_config': mqtt_config,
             'ip_address': get_ip_address('eth0'),
         }
@@ -1286,7 +1361,7 @@ def setting_mqtt():
             'user_role': get_user_role(username),
             'menu_access': get_menu_access(username),
             'site_name': 'Site Name',
-            'scc_type': scc_type,
+            'scc_type': config.scc_type,
             'mqtt_config': mqtt_config,
             'ip_address': get_ip_address('eth0'),
         }
@@ -1346,6 +1421,7 @@ def login():
 
 @app.route('/update-rectifier-config', methods=['POST'])
 @login_required
+@request_deadline(SERVICE_RESTART_DEADLINE_SECONDS)
 def update_rectifier_config():
     """Update rectifier configuration"""
     try:
@@ -1364,8 +1440,6 @@ def update_rectifier_config():
         else:
             # Handle form data
             if 'rectifier-config-form' in request.form:
-                from helpers.config_device_helper import update_rectifier_configuration
-                
                 config_path = f'{PATH}/config_device.json'
                 success = update_rectifier_configuration(config_path, request.form)
                 
@@ -1374,8 +1448,11 @@ def update_rectifier_config():
                     host = request.form.get('rectifier-host')
                     port = request.form.get('rectifier-port')
                     audit_access(username, 'rectifier_monitoring', 'update_rectifier_config')
-                    bash_command('sudo systemctl restart snmp_rectifier.service device_config_loader.service')
-                    flash('Rectifier configuration updated successfully!', 'success')
+                    try:
+                        restart_device_config_loader('snmp_rectifier.service')
+                        flash('Rectifier configuration updated successfully!', 'success')
+                    except subprocess.TimeoutExpired:
+                        flash('Rectifier configuration was saved, but restarting the services timed out', 'error')
                 else:
                     flash('Failed to update rectifier configuration.', 'error')
                     
@@ -1421,8 +1498,7 @@ def update_rectifier_config():
         
         # Save updated configuration
         try:
-            with open(config_path, 'w') as f:
-                json.dump(config_data, f, indent=4)
+            write_config_file(config_path, config_data)
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -1472,6 +1548,8 @@ def clear_session():
     return redirect(url_for('login'))
 
 
+print(f"⏱️ Application ready in {(time.perf_counter() - _startup_started) * 1000:.0f} ms (pid {os.getpid()})")
+
 if __name__ == '__main__':
     # Clear any existing sessions on startup
     print("🔐 Starting JSPro PowerDesk Application...")
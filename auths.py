@@ -2,10 +2,15 @@ import os
 import hashlib
 import secrets
 import json
+import copy
+import threading
+from types import MappingProxyType
 from datetime import datetime, timedelta
 from flask_httpauth import HTTPTokenAuth, HTTPBasicAuth
 from werkzeug.security import generate_password_hash, check_password_hash
+from redis.exceptions import RedisError
 from config import PATH
+from api.redisconnection import connection as red
 
 # Load environment variables from .env file
 try:
@@ -26,25 +31,35 @@ TOKENS = {
     os.getenv('API_TOKEN_3'): 'apt'
 }
 
+# Password hashing cost, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+# Empty means werkzeug's default method.
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD')
+
 # Secure user storage with hashed passwords
+# Precomputed hashes are read from <ROLE>_PASSWORD_HASH (see generate_tokens.py).
+# When only the plain <ROLE>_PASSWORD is set, it is hashed lazily on the first
+# login attempt instead of at import time in every worker.
 # In production, this should be moved to a database
 USERS = {
     'teknisi': {
-        'password_hash': generate_password_hash(os.getenv('TEKNISI_PASSWORD')),
+        'password_hash': os.getenv('TEKNISI_PASSWORD_HASH'),
+        'password_env': 'TEKNISI_PASSWORD',
         'role': 'teknisi',
         'last_login': None,
         'failed_attempts': 0,
         'locked_until': None
     },
     'apt': {
-        'password_hash': generate_password_hash(os.getenv('APT_PASSWORD')),
+        'password_hash': os.getenv('APT_PASSWORD_HASH'),
+        'password_env': 'APT_PASSWORD',
         'role': 'apt', 
         'last_login': None,
         'failed_attempts': 0,
         'locked_until': None
     },
     'admin': {
-        'password_hash': generate_password_hash(os.getenv('ADMIN_PASSWORD')),
+        'password_hash': os.getenv('ADMIN_PASSWORD_HASH'),
+        'password_env': 'ADMIN_PASSWORD',
         'role': 'admin',
         'last_login': None,
         'failed_attempts': 0,
@@ -52,6 +67,27 @@ USERS = {
     }
 }
 
+def hash_password(password):
+    """Hash a password using the configured method"""
+    if PASSWORD_HASH_METHOD:
+        return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+    return generate_password_hash(password)
+
+def get_password_hash(username):
+    """Get password hash for a user, hashing the plain password on first use"""
+    user = USERS.get(username)
+    if not user:
+        return None
+    
+    if not user.get('password_hash'):
+        password = os.getenv(user['password_env'])
+        if not password:
+            return None
+        # Cached for the lifetime of the worker
+        user['password_hash'] = hash_password(password)
+    
+    return user['password_hash']
+
 # Security configuration
 MAX_FAILED_ATTEMPTS = 5
 LOCKOUT_DURATION = timedelta(minutes=30)
@@ -250,14 +286,31 @@ MENU_ACCESS = {
     }
 }
 
+# enabled_services cache, reloaded only when config_device.json changes
+_enabled_services_cache = {'mtime': None, 'services': {}}
+
+def _get_config_mtime():
+    try:
+        return os.stat(f'{PATH}/config_device.json').st_mtime_ns
+    except OSError:
+        return None
+
 def get_enabled_services():
+    mtime = _get_config_mtime()
+    if mtime is not None and mtime == _enabled_services_cache['mtime']:
+        return _enabled_services_cache['services']
+    
     try:
         with open(f'{PATH}/config_device.json', 'r') as f:
             config = json.load(f)
-            return config.get('enabled_services', {})
+            services = config.get('enabled_services', {})
     except Exception as e:
         print(f"[ERROR] Unable to load enabled services: {e}")
         return {}
+    
+    _enabled_services_cache['mtime'] = mtime
+    _enabled_services_cache['services'] = services
+    return services
 
 def has_any_monitoring_service_enabled():
     """Check if any monitoring-related service is enabled"""
@@ -279,7 +332,15 @@ def has_any_service_menu_enabled():
         # systemd is always available for service management
     )
 
-# Active sessions storage (in production, use Redis or database)
+# Shared session/lockout store
+# Session tokens and lockout counters live in Redis hashes so that every
+# gunicorn worker sees the same state. Expiry is handled by Redis key TTLs,
+# the in-process dicts below are only used when Redis is unreachable.
+SESSION_KEY_PREFIX = 'auth:session:'
+LOCKOUT_KEY_PREFIX = 'auth:lockout:'
+LOGIN_KEY_PREFIX = 'auth:login:'
+
+# Fallback session storage (used only when Redis is unavailable)
 ACTIVE_SESSIONS = {}
 
 def generate_secure_token():
@@ -290,11 +351,44 @@ def hash_token(token):
     """Create a secure hash of the token for storage"""
     return hashlib.sha256(token.encode()).hexdigest()
 
+def _parse_datetime(value):
+    """Parse an ISO timestamp stored in Redis, returns None if empty/invalid"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def _get_lockout_state(username):
+    """Get failed attempts and lockout expiry for a user from the shared store"""
+    try:
+        state = red.hgetall(f'{LOCKOUT_KEY_PREFIX}{username}')
+        return {
+            'failed_attempts': int(state.get('failed_attempts', 0)),
+            'locked_until': _parse_datetime(state.get('locked_until'))
+        }
+    except RedisError as e:
+        print(f"[AUTH] Redis unavailable, using local lockout state: {e}")
+        user = USERS[username]
+        return {
+            'failed_attempts': user.get('failed_attempts', 0),
+            'locked_until': user.get('locked_until')
+        }
+
 def is_user_locked(username):
     """Check if user account is locked due to failed attempts"""
     if username not in USERS:
         return True
     
+    try:
+        # The lockout key carries a TTL of LOCKOUT_DURATION, so an expired
+        # lockout simply disappears from Redis
+        locked_until = _parse_datetime(red.hget(f'{LOCKOUT_KEY_PREFIX}{username}', 'locked_until'))
+        return locked_until is not None and datetime.now() < locked_until
+    except RedisError as e:
+        print(f"[AUTH] Redis unavailable, using local lockout state: {e}")
+    
     user = USERS[username]
     if user.get('locked_until'):
         if datetime.now() < user['locked_until']:
@@ -308,20 +402,50 @@ def is_user_locked(username):
 
 def record_failed_attempt(username):
     """Record a failed login attempt"""
-    if username in USERS:
-        user = USERS[username]
-        user['failed_attempts'] = user.get('failed_attempts', 0) + 1
+    if username not in USERS:
+        return
+    
+    lockout_seconds = int(LOCKOUT_DURATION.total_seconds())
+    key = f'{LOCKOUT_KEY_PREFIX}{username}'
+    try:
+        pipe = red.pipeline()
+        pipe.hincrby(key, 'failed_attempts', 1)
+        pipe.expire(key, lockout_seconds)
+        failed_attempts = pipe.execute()[0]
         
-        if user['failed_attempts'] >= MAX_FAILED_ATTEMPTS:
-            user['locked_until'] = datetime.now() + LOCKOUT_DURATION
+        if failed_attempts >= MAX_FAILED_ATTEMPTS:
+            pipe = red.pipeline()
+            pipe.hset(key, 'locked_until', (datetime.now() + LOCKOUT_DURATION).isoformat())
+            pipe.expire(key, lockout_seconds)
+            pipe.execute()
+        return
+    except RedisError as e:
+        print(f"[AUTH] Redis unavailable, recording failed attempt locally: {e}")
+    
+    user = USERS[username]
+    user['failed_attempts'] = user.get('failed_attempts', 0) + 1
+    
+    if user['failed_attempts'] >= MAX_FAILED_ATTEMPTS:
+        user['locked_until'] = datetime.now() + LOCKOUT_DURATION
 
 def record_successful_login(username):
     """Record a successful login"""
-    if username in USERS:
-        user = USERS[username]
-        user['last_login'] = datetime.now()
-        user['failed_attempts'] = 0
-        user['locked_until'] = None
+    if username not in USERS:
+        return
+    
+    now = datetime.now()
+    try:
+        pipe = red.pipeline()
+        pipe.delete(f'{LOCKOUT_KEY_PREFIX}{username}')
+        pipe.hset(f'{LOGIN_KEY_PREFIX}{username}', 'last_login', now.isoformat())
+        pipe.execute()
+    except RedisError as e:
+        print(f"[AUTH] Redis unavailable, recording login locally: {e}")
+    
+    user = USERS[username]
+    user['last_login'] = now
+    user['failed_attempts'] = 0
+    user['locked_until'] = None
 
 def validate_token_format(token):
     """Validate token format and structure"""
@@ -329,10 +453,17 @@ def validate_token_format(token):
         return False
     
     # Check if token is properly base64 encoded
+    # (static API tokens use the standard alphabet, session tokens are URL-safe)
+    import base64
     try:
-        import base64
         base64.b64decode(token)
         return len(token) >= 16  # Minimum token length
+    except:
+        pass
+
+    try:
+        base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return len(token) >= 16
     except:
         return False
 
@@ -350,6 +481,14 @@ def verify_token(token):
     
     # Check active sessions (for generated tokens)
     token_hash = hash_token(token)
+    try:
+        # Expired sessions are removed by the key TTL
+        user = red.hget(f'{SESSION_KEY_PREFIX}{token_hash}', 'user')
+        if user:
+            return user
+    except RedisError as e:
+        print(f"[AUTH] Redis unavailable, checking local sessions: {e}")
+    
     if token_hash in ACTIVE_SESSIONS:
         session = ACTIVE_SESSIONS[token_hash]
         if datetime.now() < session['expires_at']:
@@ -374,19 +513,19 @@ def verify_password(username, password):
     
     # Check if user is locked
     if is_user_locked(username):
-        remaining_time = USERS[username].get('locked_until', datetime.now()) - datetime.now()
+        remaining_time = (_get_lockout_state(username)['locked_until'] or datetime.now()) - datetime.now()
         print(f"[AUTH] Login attempt for locked user: {username}. Remaining lockout: {remaining_time}")
         return None
     
     # Verify password
-    user = USERS[username]
-    if check_password_hash(user['password_hash'], password):
+    password_hash = get_password_hash(username)
+    if password_hash and check_password_hash(password_hash, password):
         record_successful_login(username)
         print(f"[AUTH] Successful login for user: {username} at {datetime.now()}")
         return username
     else:
         record_failed_attempt(username)
-        print(f"[AUTH] Failed login attempt for user: {username}. Attempts: {user['failed_attempts']}")
+        print(f"[AUTH] Failed login attempt for user: {username}. Attempts: {_get_lockout_state(username)['failed_attempts']}")
         return None
 
 def create_session_token(username):
@@ -396,12 +535,29 @@ def create_session_token(username):
     
     token = generate_secure_token()
     token_hash = hash_token(token)
+    created_at = datetime.now()
+    expires_at = created_at + TOKEN_EXPIRY
+    
+    try:
+        key = f'{SESSION_KEY_PREFIX}{token_hash}'
+        pipe = red.pipeline()
+        pipe.hset(key, mapping={
+            'user': username,
+            'role': USERS[username]['role'],
+            'created_at': created_at.isoformat(),
+            'expires_at': expires_at.isoformat()
+        })
+        pipe.expire(key, int(TOKEN_EXPIRY.total_seconds()))
+        pipe.execute()
+        return token
+    except RedisError as e:
+        print(f"[AUTH] Redis unavailable, storing session locally: {e}")
     
     ACTIVE_SESSIONS[token_hash] = {
         'user': username,
         'role': USERS[username]['role'],
-        'created_at': datetime.now(),
-        'expires_at': datetime.now() + TOKEN_EXPIRY
+        'created_at': created_at,
+        'expires_at': expires_at
     }
     
     return token
@@ -409,13 +565,26 @@ def create_session_token(username):
 def revoke_session_token(token):
     """Revoke a session token"""
     token_hash = hash_token(token)
+    revoked = False
+    try:
+        revoked = red.delete(f'{SESSION_KEY_PREFIX}{token_hash}') > 0
+    except RedisError as e:
+        print(f"[AUTH] Redis unavailable, revoking local session only: {e}")
+    
     if token_hash in ACTIVE_SESSIONS:
         del ACTIVE_SESSIONS[token_hash]
         return True
-    return False
+    return revoked
 
 def cleanup_expired_sessions():
-    """Clean up expired session tokens"""
+    """Clean up expired session tokens
+    
+    Sessions stored in Redis expire through their key TTL, so only the
+    local fallback storage needs to be swept here.
+    """
+    if not ACTIVE_SESSIONS:
+        return 0
+    
     current_time = datetime.now()
     expired_tokens = [
         token_hash for token_hash, session in ACTIVE_SESSIONS.items()
@@ -433,26 +602,52 @@ def get_user_info(username):
         user = USERS[username].copy()
         # Remove sensitive information
         user.pop('password_hash', None)
+        user.pop('password_env', None)
+        
+        # Merge shared login/lockout state
+        user.update(_get_lockout_state(username))
+        try:
+            last_login = _parse_datetime(red.hget(f'{LOGIN_KEY_PREFIX}{username}', 'last_login'))
+            if last_login:
+                user['last_login'] = last_login
+        except RedisError:
+            pass
         return user
     return None
 
 # Security utility functions
 def log_security_event(event_type, username=None, details=None):
-    """Log security events for auditing"""
-    timestamp = datetime.now().isoformat()
-    log_entry = f"[SECURITY] {timestamp} - {event_type}"
-    
-    if username:
-        log_entry += f" - User: {username}"
+    """Log security events for auditing
     
-    if details:
-        log_entry += f" - Details: {details}"
+    Events are queued and written in batches by the audit pipeline
+    (api/audit.py), so this never blocks the request on disk or Redis I/O.
+    """
+    from api.audit import enqueue_event
     
-    print(log_entry)
+    event = {
+        'timestamp': datetime.now().isoformat(),
+        'event_type': event_type,
+        'username': username,
+        'details': details
+    }
     
-    # In production, write to security log file or database
-    # with open('security.log', 'a') as f:
-    #     f.write(log_entry + '\n')
+    # Attach request origin when called from a request handler
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            event['remote_addr'] = request.remote_addr
+            event['path'] = request.path
+    except ImportError:
+        pass
+    
+    if not enqueue_event(event):
+        # Auditing disabled or queue full: keep the event in the service journal
+        log_entry = f"[SECURITY] {event['timestamp']} - {event_type}"
+        if username:
+            log_entry += f" - User: {username}"
+        if details:
+            log_entry += f" - Details: {details}"
+        print(log_entry)
 
 def validate_session():
     """Validate current session and clean up expired ones"""
@@ -480,28 +675,39 @@ def get_user_api_token(username):
     user_role = get_user_role(username)
     return get_role_api_token(user_role)
 
+def _build_permission_sets():
+    """Precompute per-role permission sets for O(1) lookups"""
+    permission_sets = {}
+    for role, permissions in ROLE_PERMISSIONS.items():
+        endpoints = permissions.get('api_endpoints', [])
+        permission_sets[role] = {
+            'pages': frozenset(permissions.get('pages', [])),
+            'actions': frozenset(permissions.get('actions', [])),
+            # Wildcard patterns like '/api/v1/device/*' are matched by prefix
+            'api_prefixes': tuple(pattern[:-2] for pattern in endpoints if pattern.endswith('/*')),
+            'api_endpoints': frozenset(pattern for pattern in endpoints if not pattern.endswith('/*'))
+        }
+    return permission_sets
+
+ROLE_PERMISSION_SETS = _build_permission_sets()
+
 def has_permission(username, permission_type, permission_name):
     """Check if user has specific permission"""
     user_role = get_user_role(username)
     
-    if user_role not in ROLE_PERMISSIONS:
+    if user_role not in ROLE_PERMISSION_SETS:
         return False
     
-    permissions = ROLE_PERMISSIONS[user_role].get(permission_type, [])
+    permissions = ROLE_PERMISSION_SETS[user_role]
     
     # For API endpoints, check pattern matching
     if permission_type == 'api_endpoints':
-        for endpoint_pattern in permissions:
-            if endpoint_pattern.endswith('/*'):
-                # Wildcard matching
-                base_pattern = endpoint_pattern[:-2]
-                if permission_name.startswith(base_pattern):
-                    return True
-            elif endpoint_pattern == permission_name:
-                return True
-        return False
+        return (
+            permission_name in permissions['api_endpoints'] or
+            permission_name.startswith(permissions['api_prefixes'])
+        )
     
-    return permission_name in permissions
+    return permission_name in permissions.get(permission_type, ())
 
 def can_access_page(username, page_name):
     """Check if user can access a specific page"""
@@ -515,14 +721,11 @@ def can_access_api(username, endpoint):
     """Check if user can access a specific API endpoint"""
     return has_permission(username, 'api_endpoints', endpoint)
 
-def get_menu_access(username):
-    """Get menu access configuration for user based on role AND enabled services"""
-    user_role = get_user_role(username)
-    base_menu_access = MENU_ACCESS.get(user_role, {})
-    enabled_services = get_enabled_services()
+def _build_menu_access(role, enabled_services):
+    """Build menu access configuration for a role AND enabled services"""
+    base_menu_access = MENU_ACCESS.get(role, {})
     
     # Clone the base menu access to avoid modifying the original
-    import copy
     dynamic_menu_access = copy.deepcopy(base_menu_access)
     
     # Apply service-based filtering
@@ -606,21 +809,71 @@ def get_menu_access(username):
     
     return dynamic_menu_access
 
+def _freeze(value):
+    """Convert nested dicts into read-only mappings"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+def _thaw(value):
+    """Convert read-only mappings back into plain (JSON serializable) dicts"""
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+def _visible_paths(menu, prefix=''):
+    """Collect dotted paths (e.g. 'monitoring.scc') of visible menu items"""
+    paths = set()
+    for key, value in menu.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, bool):
+            if value:
+                paths.add(path)
+        elif isinstance(value, dict):
+            paths |= _visible_paths(value, f'{path}.')
+    return paths
+
+# Role x enabled_services menu matrix, rebuilt only when config_device.json changes
+_menu_matrix = {'mtime': None, 'menus': {}, 'visible': {}}
+_menu_matrix_lock = threading.Lock()
+_EMPTY_MENU = MappingProxyType({})
+
+def _get_menu_matrix():
+    """Get precomputed menu access for all roles, rebuilding it if enabled services changed"""
+    global _menu_matrix
+    
+    mtime = _get_config_mtime()
+    matrix = _menu_matrix
+    if matrix['menus'] and mtime == matrix['mtime']:
+        return matrix
+    
+    with _menu_matrix_lock:
+        enabled_services = get_enabled_services()
+        menus = {}
+        visible = {}
+        for role in MENU_ACCESS:
+            menu = _build_menu_access(role, enabled_services)
+            menus[role] = _freeze(menu)
+            visible[role] = frozenset(_visible_paths(menu))
+        
+        # Swap the whole matrix at once so readers never see a half-built one
+        matrix = {'mtime': mtime, 'menus': menus, 'visible': visible}
+        _menu_matrix = matrix
+    return matrix
+
+def get_menu_access(username):
+    """Get menu access configuration for user based on role AND enabled services
+    
+    The returned mapping is read-only and shared between requests.
+    """
+    user_role = get_user_role(username)
+    return _get_menu_matrix()['menus'].get(user_role, _EMPTY_MENU)
+
 def is_menu_visible(username, menu_path):
     """Check if specific menu item should be visible for user"""
-    menu_config = get_menu_access(username)
-    
     # Handle nested menu paths like 'monitoring.scc' or 'settings.device_settings'
-    path_parts = menu_path.split('.')
-    current_config = menu_config
-    
-    for part in path_parts:
-        if isinstance(current_config, dict) and part in current_config:
-            current_config = current_config[part]
-        else:
-            return False
-    
-    return bool(current_config) if isinstance(current_config, bool) else False
+    user_role = get_user_role(username)
+    return menu_path in _get_menu_matrix()['visible'].get(user_role, ())
 
 def get_accessible_pages(username):
     """Get list of pages user can access"""
@@ -639,7 +892,7 @@ def get_user_capabilities(username):
         'username': username,
         'role': user_role,
         'permissions': ROLE_PERMISSIONS.get(user_role, {}),
-        'menu_access': get_menu_access(username),
+        'menu_access': _thaw(get_menu_access(username)),
         'last_login': user_info.get('last_login'),
         'account_status': 'locked' if is_user_locked(username) else 'active'
     }
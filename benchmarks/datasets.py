@@ -0,0 +1,310 @@
+"""
+Synthetic datasets for the benchmark suite
+Seeds Redis with the keys the collectors write on a site (SCC, BMS, docks,
+rectifier, streams) and builds SQLite databases with months of logger and
+MQTT summary rows. Everything is derived from a seeded random.Random so two
+runs with the same options produce the same data (timestamps are relative
+to the start time).
+"""
+
+import os
+import json
+import sqlite3
+from datetime import timedelta
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+STREAM_TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S'
+
+TALIS5_SLAVES = {'usb0': list(range(1, 6)), 'usb1': list(range(6, 11))}
+JSPRO_DOCKS = list(range(1, 17))
+
+LOGGER_SCHEMAS = {
+    'loggers_battery': '''
+        CREATE TABLE IF NOT EXISTS loggers_battery (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            port TEXT,
+            slave_id INTEGER,
+            pcb_code TEXT,
+            pack_voltage INTEGER,
+            pack_current INTEGER,
+            soc INTEGER,
+            max_cell_voltage INTEGER,
+            min_cell_voltage INTEGER,
+            max_cell_temperature INTEGER,
+            min_cell_temperature INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    'loggers_scc': '''
+        CREATE TABLE IF NOT EXISTS loggers_scc (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            scc_id INTEGER,
+            pv_voltage REAL,
+            pv_current REAL,
+            battery_voltage REAL,
+            load_voltage REAL,
+            load_current REAL,
+            load_power REAL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    'mqtt_energy_summary': '''
+        CREATE TABLE IF NOT EXISTS mqtt_energy_summary (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            data_summary TEXT,
+            mqtt_status TEXT,
+            retry_count INTEGER DEFAULT 0,
+            last_retry_time DATETIME
+        )
+    ''',
+    'mqtt_battery_summary': '''
+        CREATE TABLE IF NOT EXISTS mqtt_battery_summary (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            data_summary TEXT,
+            mqtt_status TEXT,
+            retry_count INTEGER DEFAULT 0,
+            last_retry_time DATETIME
+        )
+    '''
+}
+
+MQTT_LOG_SCHEMAS = {
+    'mqtt_bakti_summary': '''
+        CREATE TABLE IF NOT EXISTS mqtt_bakti_summary (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            processed_time DATETIME,
+            data_summary TEXT,
+            mqtt_status TEXT,
+            broker_response TEXT,
+            retry_count INTEGER DEFAULT 0
+        )
+    ''',
+    'loggers_bakti_mqtt': '''
+        CREATE TABLE IF NOT EXISTS loggers_bakti_mqtt (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            topic TEXT,
+            payload TEXT,
+            status TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    '''
+}
+
+
+def talis5_pack(rng, slave_id):
+    """One Talis5 BMS reading as the BMS service stores it (raw device units)"""
+    cells = [rng.randint(3300, 3400) for _ in range(16)]
+    temperatures = [rng.randint(250, 340) for _ in range(3)]
+    return {
+        'slave_id': slave_id,
+        'pcb_code': f'TBI2403270{slave_id:04d}',
+        'sn1_code': f'AO6795{slave_id:04d}',
+        'pack_voltage': sum(cells) // 10,
+        'pack_current': rng.randint(-3000, 3000),
+        'soc': rng.randint(2000, 10000),
+        'soh': rng.randint(9000, 10000),
+        'cell_voltage': cells,
+        'max_cell_voltage': max(cells),
+        'min_cell_voltage': min(cells),
+        'cell_difference': max(cells) - min(cells),
+        'cell_temperature': temperatures,
+        'max_cell_temperature': max(temperatures),
+        'min_cell_temperature': min(temperatures),
+        'fet_temperature': rng.randint(250, 350),
+        'cycle_count': rng.randint(1, 500),
+        'counter': rng.randint(0, 1000),
+        'warning_flag': ['no alarm detected'],
+        'protection_flag': ['no alarm detected'],
+        'fault_status_flag': ['charge Mosfet ON', 'discharge Mosfet ON']
+    }
+
+
+def seed_redis(red, rng, now, battery_type='talis5', scc_type='scc-srne', number_of_scc=3, stream_entries=2000):
+    """
+    Write realistic live data and stream history to Redis
+
+    Returns:
+        dict: Number of keys/entries written per kind
+    """
+    pipe = red.pipeline(transaction=False)
+
+    pipe.hset('device_config', mapping={
+        'device_version': json.dumps({'battery_type': battery_type, 'scc_type': scc_type}),
+        'site_name': 'Benchmark Site',
+        'site_information': json.dumps({'site_id': 'BENCH001', 'site_name': 'Benchmark Site'})
+    })
+
+    for no in range(1, number_of_scc + 1):
+        pipe.hset(f'scc{no}', mapping={
+            'counter_heartbeat': rng.randint(0, 100),
+            'pv_voltage': round(rng.uniform(60, 80), 2),
+            'pv_current': round(rng.uniform(0, 10), 2),
+            'load_voltage': round(rng.uniform(52, 56), 2),
+            'load_current': round(rng.uniform(1, 3), 2),
+            'load_power': rng.randint(100, 300),
+            'battery_temperature': rng.randint(20, 35),
+            'device_temperature': rng.randint(20, 40),
+            'load_status': 1
+        })
+    pipe.hset('scc_system_info', 'last_update', now.strftime(TIMESTAMP_FORMAT))
+
+    active_ports = {}
+    for port, slaves in TALIS5_SLAVES.items():
+        pipe.hset(f'bms_{port}', mapping={f'slave_id_{slave}': json.dumps(talis5_pack(rng, slave)) for slave in slaves})
+        pipe.hset(f'bms_active_{port}', mapping={f'slave_id_{slave}': 1 for slave in slaves})
+        active_ports[port] = slaves
+    pipe.hset('bms_active_slaves', 'status', json.dumps({'ports': active_ports}))
+
+    dock_active = {f'pms{dock}': 1 for dock in JSPRO_DOCKS}
+    dock_active['last_update'] = now.strftime(TIMESTAMP_FORMAT)
+    pipe.hset('dock_active', mapping=dock_active)
+    for dock in JSPRO_DOCKS:
+        pms = {f'cell{cell}_v': rng.randint(3300, 3400) for cell in range(1, 15)}
+        pms.update({
+            'voltage': rng.randint(4600, 4800),
+            'current': rng.randint(-3000, 3000),
+            'cmos_state': 'ON',
+            'dmos_state': 'ON',
+            'temp_top': rng.randint(25, 35),
+            'temp_mid': rng.randint(25, 35),
+            'temp_bot': rng.randint(25, 35),
+            'temp_cmos': rng.randint(25, 40),
+            'temp_dmos': rng.randint(25, 40)
+        })
+        pipe.hset(f'pms{dock}', mapping=pms)
+    pipe.hset('avg_volt', 'voltage', 5300)
+
+    pipe.hset('rectifier', mapping={
+        'hwRectACVoltage': round(rng.uniform(215, 230), 1),
+        'hwBatteryVoltage': round(rng.uniform(52, 55), 1),
+        'hwRectifierTemperature': rng.randint(30, 45),
+        'hwAcInputStatus': 0,
+        'hwRectifierStatus': 0,
+        'hwBatteryDischarge': 0,
+        'last_update': now.strftime(TIMESTAMP_FORMAT)
+    })
+    pipe.execute()
+
+    # Stream history at the 5 minute collector cadence, oldest first
+    start = now - timedelta(minutes=5 * stream_entries)
+    for offset in range(0, stream_entries, 500):
+        pipe = red.pipeline(transaction=False)
+        for index in range(offset, min(offset + 500, stream_entries)):
+            moment = start + timedelta(minutes=5 * index)
+            entry_id = f'{int(moment.timestamp() * 1000)}-0'
+            timestamp = moment.strftime(STREAM_TIMESTAMP_FORMAT)
+            pipe.xadd('stream:battery', {'timestamp': timestamp, 'data': json.dumps(talis5_pack(rng, 1))}, id=entry_id)
+            pipe.xadd('stream:scc', {
+                'timestamp': timestamp,
+                'pv_voltage': round(rng.uniform(60, 80), 2),
+                'battery_voltage': round(rng.uniform(52, 56), 2),
+                'load_power': rng.randint(100, 300)
+            }, id=entry_id)
+            pipe.xadd('stream:scc-logs', {'timestamp': timestamp, 'data': json.dumps({'scc1': {'alarm': 'normal'}})}, id=entry_id)
+        pipe.execute()
+
+    return {
+        'scc': number_of_scc,
+        'talis5_packs': sum(len(slaves) for slaves in TALIS5_SLAVES.values()),
+        'jspro_docks': len(JSPRO_DOCKS),
+        'stream_entries': stream_entries
+    }
+
+
+def _create_tables(conn, schemas):
+    for statement in schemas.values():
+        conn.execute(statement)
+    for table in schemas:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp)')
+
+
+def create_sqlite_databases(database_dir, rng, now, days=90, interval_minutes=5):
+    """
+    Create data_storage.db and mqtt_logs.db with `days` of rows every `interval_minutes`
+
+    Returns:
+        dict: Row count per table
+    """
+    os.makedirs(database_dir, exist_ok=True)
+    samples = days * 24 * 60 // interval_minutes
+    start = now - timedelta(days=days)
+    moments = [(start + timedelta(minutes=interval_minutes * index)).strftime(TIMESTAMP_FORMAT) for index in range(samples)]
+    counts = {}
+
+    conn = sqlite3.connect(os.path.join(database_dir, 'data_storage.db'))
+    try:
+        _create_tables(conn, LOGGER_SCHEMAS)
+        with conn:
+            slaves = [(port, slave) for port, port_slaves in TALIS5_SLAVES.items() for slave in port_slaves]
+            conn.executemany(
+                'INSERT INTO loggers_battery (timestamp, port, slave_id, pcb_code, pack_voltage, pack_current, soc, '
+                'max_cell_voltage, min_cell_voltage, max_cell_temperature, min_cell_temperature) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                ((moment, port, slave, f'TBI2403270{slave:04d}', rng.randint(5300, 5450), rng.randint(-3000, 3000), rng.randint(2000, 10000),
+                  rng.randint(3380, 3400), rng.randint(3300, 3320), rng.randint(300, 340), rng.randint(250, 300))
+                 for moment in moments for port, slave in slaves)
+            )
+            conn.executemany(
+                'INSERT INTO loggers_scc (timestamp, scc_id, pv_voltage, pv_current, battery_voltage, load_voltage, load_current, load_power) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                ((moment, scc, round(rng.uniform(60, 80), 2), round(rng.uniform(0, 10), 2), round(rng.uniform(52, 56), 2),
+                  round(rng.uniform(52, 56), 2), round(rng.uniform(1, 3), 2), rng.randint(100, 300))
+                 for moment in moments for scc in (1, 2, 3))
+            )
+            for table in ('mqtt_energy_summary', 'mqtt_battery_summary'):
+                conn.executemany(
+                    f'INSERT INTO {table} (timestamp, data_summary, mqtt_status, retry_count) VALUES (?, ?, ?, ?)',
+                    ((moment, json.dumps({'records': rng.randint(1, 20), 'avg_voltage': round(rng.uniform(52, 56), 2)}),
+                      'sent' if rng.random() > 0.02 else 'pending', 0)
+                     for moment in moments)
+                )
+        for table in LOGGER_SCHEMAS:
+            counts[table] = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+    conn = sqlite3.connect(os.path.join(database_dir, 'mqtt_logs.db'))
+    try:
+        _create_tables(conn, MQTT_LOG_SCHEMAS)
+        with conn:
+            conn.executemany(
+                'INSERT INTO mqtt_bakti_summary (timestamp, processed_time, data_summary, mqtt_status, broker_response, retry_count) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                ((moment, moment, json.dumps({'site_id': 'BENCH001', 'records': rng.randint(1, 20)}),
+                  'sent' if rng.random() > 0.02 else 'pending', 'OK', 0)
+                 for moment in moments)
+            )
+            conn.executemany(
+                'INSERT INTO loggers_bakti_mqtt (timestamp, topic, payload, status) VALUES (?, ?, ?, ?)',
+                ((moment, 'bakti/BENCH001', json.dumps({'soc': rng.randint(20, 100)}), 'sent') for moment in moments)
+            )
+        for table in MQTT_LOG_SCHEMAS:
+            counts[table] = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+    return counts
+
+
+def seed_power_database(store, rng, now, days=90):
+    """Fill the power management tables with one disk check per hour and occasional alerts/operations"""
+    hours = days * 24
+    checks = [((now - timedelta(hours=hours - index)).strftime(TIMESTAMP_FORMAT), rng.randint(30, 70)) for index in range(hours)]
+    store.executemany(
+        'INSERT INTO auto_reboot_logs (timestamp, disk_usage, action, status, message) VALUES (?, ?, ?, ?, ?)',
+        ((timestamp, usage, 'auto_reboot' if usage > 68 else 'disk_check', 'success', 'benchmark') for timestamp, usage in checks)
+    )
+    store.executemany(
+        'INSERT INTO disk_alerts (timestamp, alert_type, disk_usage, message) VALUES (?, ?, ?, ?)',
+        ((timestamp, 'warning', usage, 'Disk usage high') for timestamp, usage in checks if usage > 65)
+    )
+    store.executemany(
+        'INSERT INTO power_operations (timestamp, operation, user_name, status, message) VALUES (?, ?, ?, ?, ?)',
+        ((timestamp, 'reboot', 'admin', 'completed', 'benchmark') for timestamp, _ in checks[::24])
+    )
+    return {table: store.fetchone(f'SELECT COUNT(*) FROM {table}')[0] for table in ('auto_reboot_logs', 'disk_alerts', 'power_operations')}
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+API Benchmark Suite
+Seeds a fake (or local) Redis and synthetic SQLite databases, then measures
+latency and throughput of the API endpoints through the Flask test client at
+a configurable concurrency. Results are written as JSON so releases can be
+compared; --compare exits non-zero when an endpoint regressed.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare results.json --threshold 20
+
+Requires fakeredis (pip install fakeredis) unless --local-redis is given.
+--local-redis writes the synthetic data into the Redis on localhost: never
+use it on a site.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import secrets
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.datasets import seed_redis, create_sqlite_databases, seed_power_database
+
+# (name, path) of the GET endpoints to measure; endpoints that shell out to
+# sudo/systemctl/snmp or sample CPU for seconds are left out
+ENDPOINTS = [
+    ('device_information', '/api/v1/device/information'),
+    ('monitoring_scc', '/api/v1/monitoring/scc'),
+    ('monitoring_scc_chart', '/api/v1/monitoring/scc/chart'),
+    ('monitoring_battery', '/api/v1/monitoring/battery'),
+    ('monitoring_battery_talis5', '/api/v1/monitoring/battery?section=talis5'),
+    ('monitoring_battery_jspro', '/api/v1/monitoring/battery?section=jspro'),
+    ('monitoring_battery_active', '/api/v1/monitoring/battery/active'),
+    ('monitoring_rectifier', '/api/v1/monitoring/rectifier'),
+    ('logger_overview', '/api/v1/loggers/data/overview'),
+    ('logger_battery_redis', '/api/v1/loggers/data/logs/battery?source=redis&limit=1000'),
+    ('logger_scc_redis', '/api/v1/loggers/data/logs/scc?source=redis&limit=1000'),
+    ('logger_battery_sqlite', '/api/v1/loggers/data/logs/battery?source=sqlite&limit=1000'),
+    ('logger_scc_sqlite', '/api/v1/loggers/data/logs/scc?source=sqlite&limit=1000&offset=5000'),
+    ('logger_bakti_mqtt_sqlite', '/api/v1/loggers/data/logs/bakti_mqtt?limit=500'),
+    ('logger_scc_alarm_overview', '/api/v1/loggers/scc-alarm/overview'),
+    ('power_overview', '/api/v1/power/overview'),
+    ('power_auto_reboot_history', '/api/v1/power/auto-reboot-history'),
+    ('power_auto_reboot_stats', '/api/v1/power/auto-reboot-stats'),
+    ('power_settings', '/api/v1/power/settings'),
+    ('power_export_history', '/api/v1/power/export/auto-reboot-history'),
+    ('power_i2c_metrics', '/api/v1/power/i2c/metrics'),
+    ('mqtt_bakti_summary', '/api/v1/service/mqtt-bakti/summary'),
+    ('mqtt_bakti_summary_latest', '/api/v1/service/mqtt-bakti/summary/latest'),
+    ('mqtt_bakti_stats', '/api/v1/service/mqtt-bakti/stats'),
+    ('mqtt_sundaya_energy_summary', '/api/v1/service/mqtt-sundaya/energy/summary'),
+    ('mqtt_sundaya_battery_summary', '/api/v1/service/mqtt-sundaya/battery/summary'),
+    ('mqtt_sundaya_energy_latest', '/api/v1/service/mqtt-sundaya/energy/latest'),
+    ('mqtt_sundaya_stats', '/api/v1/service/mqtt-sundaya/stats'),
+    ('metrics', '/metrics'),
+]
+
+SERVER_TIMING_PATTERN = re.compile(r'(\w+);(?:dur=[\d.]+;)?desc="(\d+) ')
+
+
+def prepare_environment(args):
+    """Point the app at the benchmark data dir and Redis before it is imported"""
+    os.makedirs(args.data_dir, exist_ok=True)
+    os.environ['EHUB_PATH'] = args.data_dir
+    os.environ['POWER_DB_PATH'] = os.path.join(args.data_dir, 'auto_reboot.db')
+    os.environ.setdefault('SECRET_KEY', secrets.token_hex(16))
+    for role in ('ADMIN', 'TEKNISI', 'APT'):
+        os.environ.setdefault(f'{role}_PASSWORD', secrets.token_urlsafe(12))
+    token = secrets.token_urlsafe(32)
+    os.environ['API_TOKEN_1'] = token
+    # The call counts per request come from the Server-Timing header
+    os.environ['SERVER_TIMING_ENABLED'] = 'true'
+
+    if not args.local_redis:
+        try:
+            import fakeredis
+        except ImportError:
+            sys.exit("fakeredis is not installed (pip install fakeredis), or run with --local-redis")
+        import redis
+
+        server = fakeredis.FakeServer()
+
+        class BenchmarkRedis(fakeredis.FakeRedis):
+            def __init__(self, *args, **kwargs):
+                kwargs.pop('host', None)
+                kwargs.pop('password', None)
+                super().__init__(server=server, **kwargs)
+
+        # api.redisconnection subclasses redis.Redis at import time
+        redis.Redis = BenchmarkRedis
+
+    return token
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_endpoint(app, token, name, path, requests, concurrency, warmup):
+    """Issue `requests` GETs to one endpoint from `concurrency` threads"""
+    headers = {'Authorization': f'Bearer {token}'}
+
+    client = app.test_client()
+    for _ in range(warmup):
+        client.get(path, headers=headers).close()
+
+    def worker(count):
+        client = app.test_client()
+        samples = []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = client.get(path, headers=headers)
+            response.get_data()
+            elapsed = (time.perf_counter() - started) * 1000
+            calls = dict((kind, int(value)) for kind, value in SERVER_TIMING_PATTERN.findall(response.headers.get('Server-Timing', '')))
+            samples.append((elapsed, response.status_code, calls))
+            response.close()
+        return samples
+
+    shares = [requests // concurrency + (1 if index < requests % concurrency else 0) for index in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = [sample for result in executor.map(worker, [share for share in shares if share]) for sample in result]
+    wall_seconds = time.perf_counter() - started
+
+    latencies = sorted(sample[0] for sample in samples)
+    status_codes = {}
+    for _, status, _ in samples:
+        status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+
+    def per_request(kind):
+        values = [sample[2].get(kind) for sample in samples if kind in sample[2]]
+        return round(sum(values) / len(values), 2) if values else None
+
+    return {
+        'name': name,
+        'path': path,
+        'requests': len(samples),
+        'errors': sum(1 for _, status, _ in samples if status >= 500),
+        'status_codes': status_codes,
+        'throughput_rps': round(len(samples) / wall_seconds, 1) if wall_seconds else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'max': round(latencies[-1], 3)
+        },
+        'redis_calls_per_request': per_request('redis'),
+        'sqlite_queries_per_request': per_request('sqlite'),
+        'subprocesses_per_request': per_request('subprocess')
+    }
+
+
+def compare_results(current, baseline, threshold, min_delta_ms):
+    """
+    Compare p95 latency per endpoint against a baseline run
+
+    Returns:
+        list: Regressions as dicts (name, baseline/current p95, change %)
+    """
+    baseline_by_name = {result['name']: result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        previous = baseline_by_name.get(result['name'])
+        if previous is None:
+            continue
+        before = previous['latency_ms']['p95']
+        after = result['latency_ms']['p95']
+        change = ((after - before) / before * 100) if before else 0.0
+        if change > threshold and after - before > min_delta_ms:
+            regressions.append({
+                'name': result['name'],
+                'baseline_p95_ms': before,
+                'current_p95_ms': after,
+                'change_percent': round(change, 1)
+            })
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSPro PowerDesk API benchmark suite')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint (default: 100)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent client threads (default: 4)')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint (default: 5)')
+    parser.add_argument('--days', type=int, default=90, help='Days of SQLite history to generate (default: 90)')
+    parser.add_argument('--stream-entries', type=int, default=2000, help='Entries per Redis stream (default: 2000)')
+    parser.add_argument('--battery-type', choices=['talis5', 'jspro', 'mix'], default='talis5')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data (default: 42)')
+    parser.add_argument('--filter', help='Only run endpoints whose name matches this regex')
+    parser.add_argument('--data-dir', help='Directory for the generated databases (default: new temp dir)')
+    parser.add_argument('--local-redis', action='store_true', help='Use the Redis on localhost instead of fakeredis')
+    parser.add_argument('--output', help='Write the JSON results to this file (default: stdout)')
+    parser.add_argument('--compare', help='Baseline results JSON to compare p95 latency against')
+    parser.add_argument('--threshold', type=float, default=20.0, help='p95 increase (%%) reported as a regression (default: 20)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Ignore p95 increases smaller than this (default: 1 ms)')
+    args = parser.parse_args()
+
+    args.data_dir = args.data_dir or tempfile.mkdtemp(prefix='powerdesk-bench-')
+    token = prepare_environment(args)
+
+    # Import after the environment is prepared; keep the app's prints off the JSON output
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        from app import app
+        from api.redisconnection import connection as red
+        from api.power.store import PowerStore, POWER_DB_PATH
+
+        rng = random.Random(args.seed)
+        now = datetime.now().replace(microsecond=0)
+        setup_started = time.perf_counter()
+        dataset = {
+            'redis': seed_redis(red, rng, now, battery_type=args.battery_type, stream_entries=args.stream_entries),
+            'sqlite': create_sqlite_databases(os.path.join(args.data_dir, 'database'), rng, now, days=args.days),
+            'power': seed_power_database(PowerStore(POWER_DB_PATH), rng, now, days=args.days),
+            'days': args.days,
+            'seed': args.seed,
+            'setup_seconds': round(time.perf_counter() - setup_started, 1)
+        }
+
+        endpoints = [(name, path) for name, path in ENDPOINTS if not args.filter or re.search(args.filter, name)]
+        results = []
+        for name, path in endpoints:
+            print(f"Benchmarking {name} ({path})", file=sys.stderr)
+            results.append(run_endpoint(app, token, name, path, args.requests, args.concurrency, args.warmup))
+    finally:
+        sys.stdout = stdout
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'redis': 'local' if args.local_redis else 'fakeredis',
+            'requests_per_endpoint': args.requests,
+            'concurrency': args.concurrency,
+            'battery_type': args.battery_type,
+            'dataset': dataset
+        },
+        'results': results
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.threshold, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression['name']}: p95 {regression['baseline_p95_ms']} ms -> "
+                  f"{regression['current_p95_ms']} ms (+{regression['change_percent']}%)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No p95 regressions above {args.threshold}% against {args.compare}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,43 @@
 from api.redisconnection import connection as red
+from collections import namedtuple
 import json
+import os
+from helpers.device_config_cache import get_device_config
 
+# Load environment variables from .env file
 try:
-    device = red.hget('device_config', 'device_version')
-    if device is not None:
-        device = json.loads(device)
-    else:
-        print("No device version found in Redis.")
-        device = None
-except Exception as e:
-    print(f"Error fetching device version: {e}")
-    device = None
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# Device dependent settings come from the live device profile (see __getattr__),
+# built from the cached device_config hash on first access, so importing this
+# module never blocks on Redis and SCC/battery type changes are picked up
+# without restarting the webapp
+DEVICE_SETTINGS = ('device', 'battery_type', 'scc_type', 'number_of_scc', 'number_of_batt', 'number_of_cell', 'slave_ids')
+
+__all__ = ['red', 'json', 'PATH'] + list(DEVICE_SETTINGS)
+
+# Immutable snapshot; raw is the decoded device_version value it was built from
+DeviceProfile = namedtuple('DeviceProfile', ('raw',) + DEVICE_SETTINGS)
+
+_profile = None
+
+
+def build_device_settings(device):
+    """Derive battery/SCC counts from a device_version dict (None = defaults)"""
+    if device is None:
+        return {
+            'device': None,
+            'battery_type': "talis5",
+            'scc_type': "scc-epever",
+            'number_of_scc': 2,
+            'number_of_batt': 10,
+            'number_of_cell': 16,
+            'slave_ids': 10
+        }
 
-if device is None:
-    battery_type = "talis5"
-    scc_type = "scc-epever"
-    number_of_scc = 2
-    number_of_batt = 10
-    number_of_cell = 16
-    slave_ids = 10
-else:
     battery_type = device.get('battery_type')
     if battery_type == "talis5":
         number_of_batt = 10
@@ -50,6 +68,67 @@ else:
     else:
         number_of_scc = 2
 
-# Application PATH configuration
+    return {
+        'device': device,
+        'battery_type': battery_type,
+        'scc_type': scc_type,
+        'number_of_scc': number_of_scc,
+        'number_of_batt': number_of_batt,
+        'number_of_cell': number_of_cell,
+        'slave_ids': slave_ids
+    }
+
+
+def build_device_profile(raw):
+    """Build a DeviceProfile from the decoded device_version field (None = defaults)"""
+    device = None
+    if isinstance(raw, dict):
+        device = raw
+    elif raw is not None:
+        print(f"Error parsing device version: {raw!r}")
+    else:
+        print("No device version found in Redis.")
+    return DeviceProfile(raw=raw, **build_device_settings(device))
+
+
+def get_device_profile():
+    """
+    Get the current device profile
+    
+    device_version comes from get_device_config() (helpers.device_config_cache),
+    so the profile follows the device_config:version counter like every other
+    device_config reader; a new profile is built and swapped in only when the
+    value changed. If Redis is unavailable the last known profile (or defaults) is kept.
+    """
+    global _profile
+    
+    try:
+        raw = get_device_config().get('device_version')
+    except Exception as e:
+        print(f"Error fetching device version: {e}")
+        if _profile is None:
+            _profile = build_device_profile(None)
+        return _profile
+    
+    profile = _profile
+    if profile is not None and (raw is profile.raw or raw == profile.raw):
+        return profile
+    
+    new_profile = build_device_profile(raw)
+    if profile is not None:
+        print(f"Device profile changed: battery_type={new_profile.battery_type}, scc_type={new_profile.scc_type}")
+    # Single assignment, readers see either the old or the new profile
+    _profile = new_profile
+    return new_profile
+
+
+def __getattr__(name):
+    """Resolve config.<device setting> from the live device profile (PEP 562)"""
+    if name in DEVICE_SETTINGS:
+        return getattr(get_device_profile(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Application PATH configuration (EHUB_PATH overrides it)
 # PATH = "/var/lib/sundaya/ehub-universal"  # Production path
-PATH = "D:/sundaya/developments/ehub-developments/bakti-projects/ehub-universal"  # Development path
+PATH = os.getenv('EHUB_PATH', "D:/sundaya/developments/ehub-developments/bakti-projects/ehub-universal")  # Development path
@@ -16,6 +16,10 @@ sudo pip3 install -r /var/lib/sundaya/jspro-powerdesk/requirements.txt
 
 echo 'copy service'
 sudo cp /var/lib/sundaya/jspro-powerdesk/dist/service/webapp.service /etc/systemd/system/
+# Threaded workers alternative, see gunicorn.conf.py
+sudo cp /var/lib/sundaya/jspro-powerdesk/dist/service/webapp-async.service /etc/systemd/system/
+sudo cp /var/lib/sundaya/jspro-powerdesk/dist/service/stream-retention.service /etc/systemd/system/
+sudo cp /var/lib/sundaya/jspro-powerdesk/dist/service/stream-retention.timer /etc/systemd/system/
 
 echo 'copy nginx config'
 sudo cp /var/lib/sundaya/jspro-powerdesk/dist/nginx/jspro-powerdesk /etc/nginx/sites-available/
@@ -23,9 +27,18 @@ sudo cp /var/lib/sundaya/jspro-powerdesk/dist/nginx/jspro-powerdesk /etc/nginx/s
 echo 'create symlink'
 sudo ln -s /etc/nginx/sites-available/jspro-powerdesk /etc/nginx/sites-enabled
 
+echo 'precompress static assets'
+if sudo apt-get install -y libnginx-mod-http-brotli-static; then
+    sudo pip3 install brotli
+    sudo cp /var/lib/sundaya/jspro-powerdesk/dist/nginx/jspro-powerdesk-brotli.conf /etc/nginx/snippets/
+fi
+sudo python3 /var/lib/sundaya/jspro-powerdesk/scripts/precompress_static.py
+
 echo 'enable and start service'
 sudo systemctl start webapp.service
 sudo systemctl enable webapp.service
+sudo systemctl daemon-reload
+sudo systemctl enable --now stream-retention.timer
 sudo systemctl restart nginx
 # sudo ufw allow 'Nginx Full'
 
@@ -1,9 +1,27 @@
 #!/bin/bash
 
+echo 'precompress static assets'
+sudo python3 /var/lib/sundaya/jspro-powerdesk/scripts/precompress_static.py
+
+echo 'update webapp services'
+sudo cp /var/lib/sundaya/jspro-powerdesk/dist/service/webapp.service /etc/systemd/system/
+sudo cp /var/lib/sundaya/jspro-powerdesk/dist/service/webapp-async.service /etc/systemd/system/
+sudo cp /var/lib/sundaya/jspro-powerdesk/dist/service/stream-retention.service /etc/systemd/system/
+sudo cp /var/lib/sundaya/jspro-powerdesk/dist/service/stream-retention.timer /etc/systemd/system/
+sudo systemctl daemon-reload
+sudo systemctl enable --now stream-retention.timer
+
 echo 'restart webapp service'
-sudo systemctl restart webapp.service
+if systemctl is-enabled --quiet webapp-async.service; then
+    sudo systemctl restart webapp-async.service
+else
+    sudo systemctl restart webapp.service
+fi
+
+echo 'update nginx config'
+sudo cp /var/lib/sundaya/jspro-powerdesk/dist/nginx/jspro-powerdesk /etc/nginx/sites-available/
 
 echo 'restart nginx'
-sudo systemctl restart nginx
+sudo nginx -t && sudo systemctl restart nginx
 
 echo 'update finished'
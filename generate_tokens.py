@@ -4,9 +4,11 @@ Security utility script for PowerDesk authentication
 Run this script to generate secure tokens and passwords
 """
 
+import os
 import base64
 import secrets
 import hashlib
+import argparse
 from werkzeug.security import generate_password_hash
 
 def generate_api_token():
@@ -20,15 +22,47 @@ def generate_password():
     """Generate a secure random password"""
     return secrets.token_urlsafe(16)
 
-def hash_password(password):
+def hash_password(password, method=None):
     """Generate password hash"""
+    if method:
+        return generate_password_hash(password, method=method)
     return generate_password_hash(password)
 
 def generate_secret_key():
     """Generate Flask secret key"""
     return secrets.token_urlsafe(32)
 
+def print_password_hashes(method=None):
+    """Print precomputed hashes for the passwords currently set in the environment"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    
+    print("=== PowerDesk Password Hashes ===\n")
+    print("Add these lines to .env so workers don't hash passwords at startup:")
+    for role in ['TEKNISI', 'APT', 'ADMIN']:
+        password = os.getenv(f'{role}_PASSWORD')
+        if not password:
+            print(f"   # {role}_PASSWORD is not set, skipped")
+            continue
+        print(f"   {role}_PASSWORD_HASH={hash_password(password, method)}")
+    if method:
+        print(f"   PASSWORD_HASH_METHOD={method}")
+
 def main():
+    parser = argparse.ArgumentParser(description='PowerDesk security token generator')
+    parser.add_argument('--hash-passwords', action='store_true',
+                        help='Print *_PASSWORD_HASH values for the passwords in .env')
+    parser.add_argument('--hash-method', default=None,
+                        help='Hash method/cost, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"')
+    args = parser.parse_args()
+    
+    if args.hash_passwords:
+        print_password_hashes(args.hash_method)
+        return
+    
     print("=== PowerDesk Security Token Generator ===\n")
     
     print("1. API Tokens (for Bearer authentication):")
@@ -47,7 +81,8 @@ def main():
     print("\n4. Password Hashes (for verification):")
     test_password = "TestPassword123!"
     print(f"   Test password: {test_password}")
-    print(f"   Hash: {hash_password(test_password)}")
+    print(f"   Hash: {hash_password(test_password, args.hash_method)}")
+    print("   Run with --hash-passwords to precompute *_PASSWORD_HASH values")
     
     print("\n=== Security Recommendations ===")
     print("1. Store these values in environment variables")
@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for JSPro PowerDesk (gunicorn -c gunicorn.conf.py wsgi:app)
+
+GUNICORN_PROFILE selects the worker model:
+- sync: 3 single-request workers, the previous setup. A slow snmpget or
+  systemctl call occupies a whole worker until it returns.
+- gthread: a few workers with a thread pool each (GUNICORN_THREADS). Redis
+  (one connection pool per process), per-request SQLite connections and
+  subprocess calls are thread-safe as they are, so no patching is needed.
+  Recommended for the Pi, used by dist/service/webapp-async.service.
+- gevent: monkey-patched greenlets (pip3 install gevent), for many mostly idle
+  connections. SQLite queries and CPU-bound work still block the whole worker.
+
+Requests are also bounded by REQUEST_DEADLINE_SECONDS (api/deadlines.py), so
+the gunicorn timeout only catches a worker that stopped responding.
+"""
+
+import os
+
+# Load environment variables from .env file (the systemd unit's Environment= wins)
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+profile = os.getenv('GUNICORN_PROFILE', 'sync')
+
+bind = os.getenv('GUNICORN_BIND', 'unix:jspro-powerdesk.sock')
+umask = 0o007
+graceful_timeout = 30
+
+if profile == 'gthread':
+    worker_class = 'gthread'
+    workers = int(os.getenv('GUNICORN_WORKERS', 2))
+    threads = int(os.getenv('GUNICORN_THREADS', 16))
+    # The main thread keeps notifying the arbiter while requests run in the pool
+    timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+    keepalive = 5
+elif profile == 'gevent':
+    worker_class = 'gevent'
+    workers = int(os.getenv('GUNICORN_WORKERS', 2))
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 200))
+    timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+    keepalive = 5
+elif profile == 'sync':
+    worker_class = 'sync'
+    workers = int(os.getenv('GUNICORN_WORKERS', 3))
+    timeout = int(os.getenv('GUNICORN_TIMEOUT', 480))
+else:
+    raise SystemExit(f"Unknown GUNICORN_PROFILE '{profile}' (sync, gthread or gevent)")
+
+
+def on_starting(server):
+    server.log.info(f"JSPro PowerDesk: {profile} profile, {workers} workers"
+                    + (f" x {threads} threads" if profile == 'gthread' else ''))
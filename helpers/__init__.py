@@ -1,4 +1,21 @@
-from .config_device_helper import *
-from .ip_address_helper import *
-from .i2c_helper import *
-from .system_resources_helper import *
\ No newline at end of file
+# Helper modules are imported on first use (PEP 562): importing one helper
+# (e.g. helpers.system_resources_helper) doesn't pull in smbus2/gpiozero/logging
+# setup from the others. Prefer importing from the submodule directly.
+import importlib
+
+_SUBMODULES = (
+    'config_device_helper',
+    'device_config_cache',
+    'ip_address_helper',
+    'i2c_helper',
+    'system_resources_helper',
+)
+
+
+def __getattr__(name):
+    """Resolve helpers.<function> from the submodule that defines it"""
+    for submodule in _SUBMODULES:
+        module = importlib.import_module(f'.{submodule}', __name__)
+        if hasattr(module, name):
+            return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,11 @@
 import json
 import logging
 import os
+import subprocess
 import traceback
-from config import *
+from config import PATH
 from utils import bash_command
+from .device_config_cache import bump_device_config_version
 
 # Configure logging for production use with file output
 log_file = f"{PATH}/logs/handle_relay_config_update.log"
@@ -19,6 +21,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def write_config_file(path, data):
+    """Write config_device.json (restart_device_config_loader() publishes it to Redis)"""
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def restart_device_config_loader(*units):
+    """
+    Restart device_config_loader (plus units) and invalidate the cached device_config
+
+    The version is bumped only after the loader rewrote the device_config hash,
+    otherwise a request in between would cache the old hash under the new version.
+    Raises subprocess.TimeoutExpired (without bumping) when systemctl didn't finish.
+    """
+    bash_command(['sudo', 'systemctl', 'restart', *units, 'device_config_loader.service'])
+    bump_device_config_version()
+
+
 # ehub-talis/config_device.json
 def update_site_information(path, form):
     data = {}
@@ -38,8 +58,7 @@ def update_site_information(path, form):
     json_data['site_information']['address'] = address
 
     #  write to json file
-    with open(path, 'w') as f:
-        json.dump(json_data, f, indent=4)
+    write_config_file(path, json_data)
     return True
 
 
@@ -65,8 +84,7 @@ def update_device_model(path, form):
     json_data['device_model']['hardware_version'] = hardware_version
 
     # write to json file
-    with open(path, 'w') as f:
-        json.dump(json_data, f, indent=4)
+    write_config_file(path, json_data)
     return True
 
 
@@ -116,8 +134,7 @@ def update_device_version(path, form):
             json_data['talis_config']['talis_port_1'] = talis_port_1
 
     # write to json file
-    with open(path, 'w') as f:
-        json.dump(json_data, f, indent=4)
+    write_config_file(path, json_data)
     return True
 
 
@@ -152,8 +169,7 @@ def update_enabled_services(path, form):
         json_data['enabled_services'].update(enabled_services)
         
         # Write updated config back to file
-        with open(path, 'w') as f:
-            json.dump(json_data, f, indent=4)
+        write_config_file(path, json_data)
         
         # Service mapping dictionary
         service_mapping = {
@@ -185,6 +201,10 @@ def update_enabled_services(path, form):
     except json.JSONDecodeError as e:
         logger.error(f"Invalid JSON in config file: {e}")
         return False
+    except subprocess.TimeoutExpired as e:
+        # The remaining services were not enabled/restarted
+        logger.error(f"Timed out applying enabled services: {e.cmd}")
+        return False
     except Exception as e:
         logger.error(f"Error updating enabled services: {e}")
         logger.error(f"Traceback: {traceback.format_exc()}")
@@ -247,8 +267,7 @@ def update_scc_type(path, form):
         data['scc_tristar']['scan'] = scan
 
     # write json file
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=4)
+    write_config_file(path, data)
     return True
 
 
@@ -393,8 +412,7 @@ def update_config_cutoff_reconnect(path, form):
 
         # Write main config file
         try:
-            with open(path, 'w') as f:
-                json.dump(config_data, f, indent=4)
+            write_config_file(path, config_data)
             
             logger.info("Successfully updated configuration file")
             logger.info("=== Cutoff/reconnect update completed successfully ===")
@@ -443,8 +461,7 @@ def update_config_scc(path, form):
                 data[scc_type_underscore]['parameter'][key] = value
         
         # Write json file
-        with open(path, 'w') as f:
-            json.dump(data, f, indent=4)
+        write_config_file(path, data)
         return True
     
     return False
@@ -489,8 +506,7 @@ def update_ip_configuration(path, form):
         data['ip_configuration']['site'] = site
     
     # Write json file
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=4)
+    write_config_file(path, data)
     return True
 
 
@@ -547,8 +563,7 @@ def update_setting_mqtt(path, data, broker_type='ehub_broker'):
                 config_data['mqtt_config'][broker_type][config_key] = value
         
         # Write json file
-        with open(path, 'w') as f:
-            json.dump(config_data, f, indent=4)
+        write_config_file(path, config_data)
         
         logger.info(f"MQTT {broker_type} settings updated successfully")
         return True
@@ -611,8 +626,7 @@ def update_rectifier_configuration(path, form):
         
         # Write updated config back to file
         try:
-            with open(path, 'w') as f:
-                json.dump(config_data, f, indent=4)
+            write_config_file(path, config_data)
             logger.info("Rectifier configuration updated successfully")
             return True
             
@@ -0,0 +1,79 @@
+"""
+Decoded device_config cache
+The device_config Redis hash (loaded from config_device.json by
+device_config_loader) stores site_information, device_version, device_model,
+ip_configuration, handle_relay, ... as JSON strings. They are decoded once per
+version and shared by the device API, logger and page views instead of being
+re-parsed on every request.
+
+The version is the device_config:version counter, bumped by
+config_device_helper.restart_device_config_loader() once the loader rewrote
+the hash. An entry is also re-read after DEVICE_CONFIG_MAX_AGE seconds, for
+loaders that are still writing when systemctl restart returns.
+"""
+
+import json
+import threading
+import time
+from api.redisconnection import connection as red
+
+DEVICE_CONFIG_KEY = 'device_config'
+DEVICE_CONFIG_VERSION_KEY = 'device_config:version'
+DEVICE_CONFIG_MAX_AGE = 30
+
+_cache = None  # (version, loaded_at, decoded)
+_cache_lock = threading.Lock()
+
+
+def _decode(value):
+    """Decode JSON object/array fields, keep plain strings as they are"""
+    if isinstance(value, str) and value[:1] in ('{', '['):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def bump_device_config_version():
+    """Mark the cached device_config as stale in every worker"""
+    global _cache
+    _cache = None
+    try:
+        return red.incr(DEVICE_CONFIG_VERSION_KEY)
+    except Exception as e:
+        print(f"Error bumping device config version: {e}")
+        return None
+
+
+def get_device_config():
+    """
+    Get the decoded device_config hash
+
+    One GET of the version counter per call; the hash is re-read and decoded
+    only when the version changed or the entry is older than DEVICE_CONFIG_MAX_AGE.
+    The returned dict is shared between requests, treat it as read-only.
+
+    Returns:
+        dict: Field -> decoded value (empty if device_config doesn't exist)
+    """
+    global _cache
+
+    version = red.get(DEVICE_CONFIG_VERSION_KEY)
+    cache = _cache
+    if cache and cache[0] == version and time.monotonic() - cache[1] < DEVICE_CONFIG_MAX_AGE:
+        return cache[2]
+
+    with _cache_lock:
+        # Another thread may have reloaded it while we waited
+        if _cache and _cache[0] == version and time.monotonic() - _cache[1] < DEVICE_CONFIG_MAX_AGE:
+            return _cache[2]
+
+        decoded = {field: _decode(value) for field, value in red.hgetall(DEVICE_CONFIG_KEY).items()}
+        _cache = (version, time.monotonic(), decoded)
+        return decoded
+
+
+def get_device_config_field(field, default=None):
+    """Get one decoded device_config field"""
+    return get_device_config().get(field, default)
@@ -1,41 +1,96 @@
-from smbus2 import SMBus
+import errno
 import json
 import os
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
+from utils import read_last_lines
+from api.redisconnection import connection as red
+
+I2C_BUS_NUMBER = 1
+I2C_LOG_FILE = Path('/var/lib/sundaya/jspro-powerdesk/logs/i2c_communication.log')
+I2C_LOG_MAX_BYTES = 512 * 1024  # rotate to i2c_communication.log.1 above this size
+I2C_SETTINGS_DIR = Path('/var/lib/sundaya/jspro-powerdesk/dist')
+I2C_SETTINGS_FILE = I2C_SETTINGS_DIR / 'i2c_settings.json'
+
+# Redis hash where the heartbeat service publishes its counters
+I2C_METRICS_KEY = 'i2c_heartbeat:metrics'
+# The service republishes at least every settings check (5 s); older metrics
+# mean it was killed or crashed without clearing 'running'
+I2C_METRICS_STALE_SECONDS = 30
+
+# Bus handle kept open between heartbeats (one per process)
+_bus = None
+_bus_pid = None
+_bus_lock = threading.Lock()
+_legacy_log_checked = False
+
+
+def _get_bus():
+    """Get the shared SMBus handle, opening it on first use or after fork"""
+    global _bus, _bus_pid
+    
+    if _bus is None or _bus_pid != os.getpid():
+        from smbus2 import SMBus  # imported on first use, the web app rarely needs it
+        _bus = SMBus(I2C_BUS_NUMBER)
+        _bus_pid = os.getpid()
+    return _bus
+
+
+def _close_bus():
+    """Close the shared SMBus handle so the next write reopens it"""
+    global _bus, _bus_pid
+    
+    if _bus is not None:
+        try:
+            _bus.close()
+        except Exception:
+            pass  # Ignore close errors
+    _bus = None
+    _bus_pid = None
+
+
+def _write_byte(address, message):
+    """Write a byte on the shared bus, reopening the handle once if it went bad"""
+    with _bus_lock:
+        try:
+            _get_bus().write_byte(address, message)
+        except OSError as e:
+            # Remote I/O error means the device did not ACK; the handle is fine
+            # and retrying would send the byte twice
+            if e.errno == errno.EREMOTEIO:
+                raise
+            _close_bus()
+            _get_bus().write_byte(address, message)
+
 
 def send_i2c_message(address, message):
-    bus = None
     try:
-        bus = SMBus(1)
-        bus.write_byte(address, message)
+        _write_byte(address, message)
         return True
     except OSError:
         return False
-    finally:
-        if bus is not None:
-            try:
-                bus.close()
-            except Exception:
-                pass
 
 
 def send_i2c_heartbeat(address=0x28, message=ord('H')):
     """Send I2C heartbeat with logging"""
     
     timestamp = datetime.now().isoformat()
-    bus = None
+    start = time.perf_counter()
     
     try:
-        bus = SMBus(1)
-        bus.write_byte(address, message)
+        _write_byte(address, message)
+        latency_ms = (time.perf_counter() - start) * 1000
         
         result = {
             'success': True,
             'timestamp': timestamp,
             'address': hex(address),
             'message': chr(message),
-            'error': None
+            'error': None,
+            'error_code': None,
+            'latency_ms': round(latency_ms, 3)
         }
         # Log successful communication
         log_i2c_communication(result)
@@ -55,7 +110,9 @@ def send_i2c_heartbeat(address=0x28, message=ord('H')):
             'timestamp': timestamp,
             'address': hex(address),
             'message': chr(message),
-            'error': error_msg
+            'error': error_msg,
+            'error_code': e.errno,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 3)
         }
         # Log failed communication
         log_i2c_communication(result)
@@ -67,24 +124,36 @@ def send_i2c_heartbeat(address=0x28, message=ord('H')):
             'timestamp': timestamp,
             'address': hex(address),
             'message': chr(message),
-            'error': f"Unexpected error: {str(e)}"
+            'error': f"Unexpected error: {str(e)}",
+            'error_code': None,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 3)
         }
         log_i2c_communication(result)
         return result
-        
-    finally:
-        # Always close the bus
-        if bus is not None:
-            try:
-                bus.close()
-            except Exception:
-                pass  # Ignore close errors
+
+
+def _is_legacy_log(log_file):
+    """Check if the log file is the old JSON array format"""
+    try:
+        with open(log_file, 'rb') as f:
+            return f.read(1) == b'['
+    except OSError:
+        return False
+
+
+def _rotate_i2c_log(log_file):
+    """Move the current log file to <name>.1, replacing the previous backup"""
+    try:
+        os.replace(log_file, f'{log_file}.1')
+    except OSError as e:
+        print(f"Warning: Unable to rotate I2C log: {e}")
 
 
 def log_i2c_communication(result):
-    """Log I2C communication results to file"""
+    """Append an I2C communication result to the JSONL log file"""
+    global _legacy_log_checked
     
-    log_file = Path('/var/lib/sundaya/jspro-powerdesk/logs/i2c_communication.log')
+    log_file = I2C_LOG_FILE
     
     try:
         # Ensure directory exists
@@ -95,63 +164,109 @@ def log_i2c_communication(result):
             'success': result['success'],
             'address': result['address'],
             'message': result['message'],
-            'error': result['error']
+            'error': result['error'],
+            'error_code': result.get('error_code')
         }
         
-        # Read existing logs
-        logs = []
-        if log_file.exists():
-            try:
-                with open(log_file, 'r') as f:
-                    logs = json.load(f)
-            except (json.JSONDecodeError, PermissionError):
-                # If file is corrupted or permission denied, start fresh
-                logs = []
-        
-        # Add new log entry
-        logs.append(log_entry)
+        # Old JSON array logs can't be appended to, move them out of the way
+        if not _legacy_log_checked:
+            if _is_legacy_log(log_file):
+                _rotate_i2c_log(log_file)
+            _legacy_log_checked = True
         
-        # Keep only last 1000 entries
-        if len(logs) > 1000:
-            logs = logs[-1000:]
-        
-        # Write back to file with error handling
+        # Append one line instead of rewriting the whole file
         try:
-            with open(log_file, 'w') as f:
-                json.dump(logs, f, indent=2)
+            with open(log_file, 'a') as f:
+                f.write(json.dumps(log_entry) + '\n')
+                size = f.tell()
         except PermissionError:
             # If can't write, just silently continue (don't crash the service)
-            pass
+            return
+        
+        if size > I2C_LOG_MAX_BYTES:
+            _rotate_i2c_log(log_file)
             
     except Exception as e:
         # Don't let logging errors crash the service
         print(f"Warning: Error logging I2C communication: {e}")
-        pass
 
 
 def get_i2c_logs(limit=50):
-    """Get I2C communication logs"""
+    """Get I2C communication logs (newest last)"""
     
-    log_file = Path('/var/lib/sundaya/jspro-powerdesk/logs/i2c_communication.log')
+    log_file = I2C_LOG_FILE
     
     try:
         if not log_file.exists():
             return []
-            
-        with open(log_file, 'r') as f:
-            logs = json.load(f)
         
-        # Return latest logs
-        return logs[-limit:] if len(logs) > limit else logs
+        # Logs written before the JSONL format are a single JSON array
+        if _is_legacy_log(log_file):
+            with open(log_file, 'r') as f:
+                logs = json.load(f)
+            return logs[-limit:] if len(logs) > limit else logs
+        
+        logs = []
+        for line in read_last_lines(log_file, limit):
+            try:
+                logs.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # Skip partially written lines
+        return logs
         
     except (json.JSONDecodeError, PermissionError):
         return []
 
 
+def get_i2c_metrics():
+    """Get heartbeat metrics published by the I2C heartbeat service
+    
+    Returns:
+        dict: Metrics with numeric fields converted, or None if the service
+        has not published anything yet. Metrics older than
+        I2C_METRICS_STALE_SECONDS are flagged 'stale' and reported as not running
+    """
+    return decode_i2c_metrics(red.hgetall(I2C_METRICS_KEY))
+
+
+def decode_i2c_metrics(raw):
+    """Convert the I2C_METRICS_KEY hash (already read, e.g. in a pipeline) like get_i2c_metrics()"""
+    if not raw:
+        return None
+    
+    metrics = {}
+    for key, value in raw.items():
+        if value == '':
+            metrics[key] = None
+        elif key in ('running', 'enabled', 'last_success'):
+            metrics[key] = value == '1'
+        elif key in ('latency_sum_ms', 'last_latency_ms', 'rolling_success_rate'):
+            metrics[key] = float(value)
+        elif key.startswith('latency_ms_le_') or key in (
+            'pid', 'interval_seconds', 'heartbeat_count', 'successful_heartbeats',
+            'failed_heartbeats', 'consecutive_failures', 'last_error_code', 'rolling_window'
+        ):
+            metrics[key] = int(value)
+        else:
+            metrics[key] = value
+    
+    try:
+        age = (datetime.now() - datetime.fromisoformat(metrics.get('updated_at') or '')).total_seconds()
+    except ValueError:
+        age = None
+    metrics['stale'] = age is None or age > I2C_METRICS_STALE_SECONDS
+    if metrics['stale']:
+        metrics['running'] = False
+    
+    heartbeat_count = metrics.get('heartbeat_count') or 0
+    metrics['average_latency_ms'] = round(metrics.get('latency_sum_ms', 0) / heartbeat_count, 3) if heartbeat_count else None
+    return metrics
+
+
 def get_i2c_settings():
     """Get I2C monitoring settings"""
     
-    settings_file = Path('/var/lib/sundaya/jspro-powerdesk/dist/i2c_settings.json')
+    settings_file = I2C_SETTINGS_FILE
     
     default_settings = {
         'enabled': True,
@@ -186,7 +301,7 @@ def get_i2c_settings():
 def save_i2c_settings(settings):
     """Save I2C monitoring settings"""
     
-    settings_file = Path('/var/lib/sundaya/jspro-powerdesk/dist/i2c_settings.json')
+    settings_file = I2C_SETTINGS_FILE
     settings['last_modified'] = datetime.now().isoformat()
     
     try:
@@ -253,13 +368,13 @@ def validate_i2c_settings(settings):
 
 def get_i2c_settings_info():
     """Get information about I2C settings location and status"""
-    settings_file = '/var/lib/sundaya/jspro-powerdesk/dist/i2c_settings.json'
+    settings_file = I2C_SETTINGS_FILE
     
     info = {
-        'settings_directory': '/var/lib/sundaya/jspro-powerdesk/dist',
+        'settings_directory': str(I2C_SETTINGS_DIR),
         'settings_file': str(settings_file),
         'file_exists': settings_file.exists(),
-        'directory_writable': os.access('/var/lib/sundaya/jspro-powerdesk/dist', os.W_OK),
+        'directory_writable': os.access(I2C_SETTINGS_DIR, os.W_OK),
         'file_readable': settings_file.exists() and os.access(settings_file, os.R_OK),
         'file_writable': settings_file.exists() and os.access(settings_file, os.W_OK)
     }
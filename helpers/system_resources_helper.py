@@ -1,6 +1,5 @@
 import psutil
 import shutil
-from gpiozero import CPUTemperature
 
 # System monitoring
 def get_cpu_usage():
@@ -17,6 +16,8 @@ def get_memory_usage():
 def get_temperature():
     """Get CPU temperature"""
     try:
+        # gpiozero is slow to import and only needed here
+        from gpiozero import CPUTemperature
         cpu_temp = CPUTemperature()
         temperature = round(cpu_temp.temperature, 1)
     except:
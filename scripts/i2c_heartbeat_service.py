@@ -9,17 +9,34 @@ import signal
 import sys
 import os
 import logging
+import threading
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 
 # Add parent directory to path to import functions
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from helpers.i2c_helper import send_i2c_heartbeat, get_i2c_settings
+from redis.exceptions import RedisError
+from api.redisconnection import connection as red
+from helpers.i2c_helper import send_i2c_heartbeat, get_i2c_settings, I2C_SETTINGS_FILE, I2C_METRICS_KEY
+
+# How often (seconds) the settings file is checked for changes while waiting
+SETTINGS_CHECK_INTERVAL = 5
+# How often (seconds) a summary line is logged at INFO level
+SUMMARY_INTERVAL = 300
+# Upper bounds (ms) of the cumulative write latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+# Number of most recent beats used for the rolling success rate
+ROLLING_WINDOW = 100
 
 class I2CHeartbeatService:
     def __init__(self):
         self.running = False
         self.start_time = None
+        self.settings = None
+        self.settings_mtime = None
+        self.stop_event = threading.Event()
+        self.reset_stats()
         self.setup_logging()
         self.setup_signal_handlers()
         
@@ -28,9 +45,12 @@ class I2CHeartbeatService:
         log_dir = Path('/var/lib/sundaya/jspro-powerdesk/logs')
         log_dir.mkdir(parents=True, exist_ok=True)
         
+        # Per-beat messages are DEBUG; set I2C_HEARTBEAT_LOG_LEVEL=DEBUG to see them
+        log_level = os.getenv('I2C_HEARTBEAT_LOG_LEVEL', 'INFO').upper()
+        
         # Configure logging with explicit flush
         logging.basicConfig(
-            level=logging.DEBUG,  # Changed to DEBUG for more detailed logging
+            level=getattr(logging, log_level, logging.INFO),
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
             handlers=[
                 logging.FileHandler(log_dir / 'i2c_heartbeat_service.log'),
@@ -53,6 +73,7 @@ class I2CHeartbeatService:
         """Handle shutdown signals"""
         self.logger.info(f"Received signal {signum}, shutting down gracefully...")
         self.running = False
+        self.stop_event.set()  # Wake the scheduler immediately
         
     def get_current_settings(self):
         """Get current I2C settings"""
@@ -73,14 +94,110 @@ class I2CHeartbeatService:
                 'message': 'H'
             }
     
+    def reload_settings_if_changed(self):
+        """Reload settings only when the settings file changed, returns True if reloaded"""
+        try:
+            mtime = os.stat(I2C_SETTINGS_FILE).st_mtime_ns
+        except OSError:
+            mtime = None
+        
+        if self.settings is not None and mtime == self.settings_mtime:
+            return False
+        
+        self.settings = self.get_current_settings()
+        self.settings_mtime = mtime
+        self.logger.info(f"Settings loaded: {self.settings}")
+        return True
+    
+    def reset_stats(self):
+        """Reset heartbeat counters and latency histogram"""
+        self.stats = {
+            'heartbeat_count': 0,
+            'successful_heartbeats': 0,
+            'failed_heartbeats': 0,
+            'latency_sum_ms': 0.0,
+            'latency_buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),  # last bucket is +Inf
+            'recent_results': deque(maxlen=ROLLING_WINDOW),
+            'consecutive_failures': 0,
+            'last_error_code': None,
+            'last_error': None
+        }
+    
+    def record_heartbeat(self, result):
+        """Update counters and latency histogram with a heartbeat result"""
+        stats = self.stats
+        stats['heartbeat_count'] += 1
+        stats['recent_results'].append(bool(result['success']))
+        if result['success']:
+            stats['successful_heartbeats'] += 1
+            stats['consecutive_failures'] = 0
+        else:
+            stats['failed_heartbeats'] += 1
+            stats['consecutive_failures'] += 1
+            stats['last_error_code'] = result.get('error_code')
+            stats['last_error'] = result.get('error')
+        
+        latency_ms = result.get('latency_ms') or 0.0
+        stats['latency_sum_ms'] += latency_ms
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                stats['latency_buckets'][index] += 1
+                break
+        else:
+            stats['latency_buckets'][-1] += 1
+    
+    def publish_metrics(self, result=None):
+        """Publish heartbeat counters and latency histogram to Redis for the web UI"""
+        stats = self.stats
+        metrics = {
+            'pid': os.getpid(),
+            'running': int(self.running),
+            'started_at': self.start_time.isoformat() if self.start_time else '',
+            'enabled': int(bool(self.settings and self.settings['enabled'])),
+            'interval_seconds': self.settings['interval_seconds'] if self.settings else '',
+            'heartbeat_count': stats['heartbeat_count'],
+            'successful_heartbeats': stats['successful_heartbeats'],
+            'failed_heartbeats': stats['failed_heartbeats'],
+            'latency_sum_ms': round(stats['latency_sum_ms'], 3),
+            'consecutive_failures': stats['consecutive_failures'],
+            'last_error_code': '' if stats['last_error_code'] is None else stats['last_error_code'],
+            'last_error': stats['last_error'] or '',
+            'updated_at': datetime.now().isoformat()
+        }
+        
+        recent_results = stats['recent_results']
+        if recent_results:
+            metrics['rolling_success_rate'] = round(sum(recent_results) / len(recent_results) * 100, 1)
+            metrics['rolling_window'] = len(recent_results)
+        
+        # Cumulative buckets (Prometheus style): count of beats with latency <= bound
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, stats['latency_buckets']):
+            cumulative += count
+            metrics[f'latency_ms_le_{bound}'] = cumulative
+        metrics['latency_ms_le_inf'] = cumulative + stats['latency_buckets'][-1]
+        
+        if result is not None:
+            metrics['last_heartbeat'] = result['timestamp']
+            metrics['last_success'] = int(result['success'])
+            metrics['last_latency_ms'] = '' if result.get('latency_ms') is None else result['latency_ms']
+        
+        try:
+            red.hset(I2C_METRICS_KEY, mapping=metrics)
+        except RedisError as e:
+            # Metrics are best effort, the heartbeat itself must keep running
+            self.logger.debug(f"Unable to publish metrics to Redis: {e}")
+    
     def send_heartbeat(self):
-        """Send I2C heartbeat using current settings"""
+        """Send I2C heartbeat using current settings, returns the result or None if disabled"""
+        if self.settings is None:
+            self.reload_settings_if_changed()
+        settings = self.settings
+        
         try:
-            settings = self.get_current_settings()
-            
             if not settings['enabled']:
                 self.logger.debug("I2C monitoring is disabled, skipping heartbeat")
-                return True
+                return None
             
             # Convert address from hex string to int
             address = int(settings['i2c_address'], 16)
@@ -90,36 +207,59 @@ class I2CHeartbeatService:
             result = send_i2c_heartbeat(address, message)
             
             if result['success']:
-                self.logger.debug(f"Heartbeat sent successfully to {result['address']}: {result['message']}")
-                return True
+                self.logger.debug(f"Heartbeat sent successfully to {result['address']}: {result['message']} ({result['latency_ms']} ms)")
             else:
                 self.logger.warning(f"Heartbeat failed to {result['address']}: {result['error']}")
-                return False
+            return result
                 
         except Exception as e:
             self.logger.error(f"Error sending heartbeat: {e}", exc_info=True)
-            return False
+            return {
+                'success': False,
+                'timestamp': datetime.now().isoformat(),
+                'error': str(e),
+                'error_code': None,
+                'latency_ms': None
+            }
+    
+    def log_summary(self):
+        """Log a summary of heartbeats sent so far"""
+        stats = self.stats
+        heartbeat_count = stats['heartbeat_count']
+        uptime = datetime.now() - self.start_time
+        success_rate = (stats['successful_heartbeats'] / heartbeat_count * 100) if heartbeat_count > 0 else 0
+        average_latency = (stats['latency_sum_ms'] / heartbeat_count) if heartbeat_count > 0 else 0
+        self.logger.info(f"Service summary: {heartbeat_count} heartbeats sent ({stats['successful_heartbeats']} success, {stats['failed_heartbeats']} failed), success rate: {success_rate:.1f}%, average latency: {average_latency:.2f} ms, uptime: {uptime}")
     
     def run(self):
-        """Main service loop"""
+        """Main service loop
+        
+        Beats are scheduled on the monotonic clock: each deadline is the previous
+        deadline plus the interval, so slow writes or logging don't accumulate
+        drift, and the loop sleeps exactly until the next deadline (or the next
+        settings check, whichever comes first).
+        """
         self.start_time = datetime.now()
         self.logger.info(f"I2C Heartbeat Service starting at {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
         self.logger.info(f"Python version: {sys.version}")
         self.logger.info(f"Process PID: {os.getpid()}")
         
         self.running = True
+        self.reset_stats()
+        self.reload_settings_if_changed()
+        current_interval = self.settings['interval_seconds']
         
-        last_heartbeat = 0
-        last_settings_check = 0
-        current_interval = 2  # Default 2 seconds
         error_count = 0
         max_consecutive_errors = 10
-        heartbeat_count = 0
-        successful_heartbeats = 0
-        failed_heartbeats = 0
-        loop_count = 0
+        
+        now = time.monotonic()
+        next_heartbeat = now
+        last_heartbeat = None
+        next_settings_check = now + SETTINGS_CHECK_INTERVAL
+        next_summary = now + SUMMARY_INTERVAL
         
         self.logger.info(f"Service loop started with interval: {current_interval} seconds")
+        self.publish_metrics()
         
         try:
             self.logger.info("Entering main service loop...")
@@ -127,55 +267,45 @@ class I2CHeartbeatService:
             
             while self.running:
                 try:
-                    loop_count += 1
-                    current_time = time.time()
+                    now = time.monotonic()
                     
-                    # Log every 60 seconds to show service is alive
-                    if loop_count % 60 == 0:
-                        self.logger.debug(f"Service alive - loop #{loop_count}, uptime: {datetime.now() - self.start_time}")
+                    # Check the settings file (a stat, not a parse) every few seconds,
+                    # republishing the metrics so the UI can tell a live service from a dead one
+                    if now >= next_settings_check:
+                        if self.reload_settings_if_changed():
+                            new_interval = self.settings['interval_seconds']
+                            if new_interval != current_interval:
+                                self.logger.info(f"Interval changed from {current_interval} to {new_interval} seconds")
+                                current_interval = new_interval
+                                # Re-anchor the schedule on the last beat with the new interval
+                                if last_heartbeat is not None:
+                                    next_heartbeat = max(now, last_heartbeat + current_interval)
+                        self.publish_metrics()
+                        next_settings_check = now + SETTINGS_CHECK_INTERVAL
                     
-                    # Check settings every 2 seconds
-                    if current_time - last_settings_check >= 2:
-                        self.logger.debug("Checking settings...")
-                        settings = self.get_current_settings()
-                        new_interval = settings['interval_seconds'] 
-                        
-                        if new_interval != current_interval:
-                            self.logger.info(f"Interval changed from {current_interval} to {new_interval} seconds")
-                            current_interval = new_interval
-                        
-                        last_settings_check = current_time
+                    if now < next_heartbeat:
+                        # Sleep until the next deadline; a shutdown signal wakes us early
+                        self.stop_event.wait(min(next_heartbeat, next_settings_check) - now)
+                        continue
                     
-                    # Send heartbeat based on interval
-                    interval_seconds = current_interval  # Already in seconds
-                    time_since_last = current_time - last_heartbeat
+                    result = self.send_heartbeat()
+                    last_heartbeat = next_heartbeat
                     
-                    if time_since_last >= interval_seconds:
-                        self.logger.info(f"Time for heartbeat (last heartbeat was {time_since_last:.1f} seconds ago, interval: {interval_seconds}s)")
-                        success = self.send_heartbeat()
-                        last_heartbeat = current_time
-                        heartbeat_count += 1
-                        
-                        if success:
-                            successful_heartbeats += 1
-                            self.logger.info(f"Heartbeat #{heartbeat_count} successful - next heartbeat in {interval_seconds} seconds")
-                        else:
-                            failed_heartbeats += 1
-                            self.logger.warning(f"Heartbeat #{heartbeat_count} failed - next heartbeat in {interval_seconds} seconds")
-                        
-                        error_count = 0  # Reset error count on successful iteration
-                        
-                        # Flush logs immediately after heartbeat
-                        sys.stdout.flush()
-                        
-                        # Log summary every 5 heartbeats for debugging
-                        if heartbeat_count % 5 == 0:
-                            uptime = datetime.now() - self.start_time
-                            success_rate = (successful_heartbeats / heartbeat_count * 100) if heartbeat_count > 0 else 0
-                            self.logger.info(f"Service summary: {heartbeat_count} heartbeats sent ({successful_heartbeats} success, {failed_heartbeats} failed), success rate: {success_rate:.1f}%, uptime: {uptime}")
+                    if result is not None:
+                        self.record_heartbeat(result)
+                        self.publish_metrics(result)
                     
-                    # Sleep for 1 second before next iteration
-                    time.sleep(1)
+                    # Advance the deadline; if we fell behind (e.g. slow bus), skip missed beats
+                    next_heartbeat += current_interval
+                    now = time.monotonic()
+                    if next_heartbeat <= now:
+                        next_heartbeat = now + current_interval
+                    
+                    if now >= next_summary:
+                        self.log_summary()
+                        next_summary = now + SUMMARY_INTERVAL
+                    
+                    error_count = 0  # Reset error count on successful iteration
                     
                 except KeyboardInterrupt:
                     self.logger.info("Service interrupted by user")
@@ -192,7 +322,8 @@ class I2CHeartbeatService:
                     # Exponential backoff for retries
                     sleep_time = min(60, 5 * (2 ** min(error_count, 5)))
                     self.logger.warning(f"Waiting {sleep_time} seconds before retry...")
-                    time.sleep(sleep_time)
+                    self.stop_event.wait(sleep_time)
+                    next_heartbeat = time.monotonic()
             
             self.logger.info("Main service loop ended normally")
             
@@ -200,10 +331,14 @@ class I2CHeartbeatService:
             self.logger.critical(f"Fatal error in service main loop: {e}", exc_info=True)
             sys.stdout.flush()
             raise
+        finally:
+            self.running = False
+            self.publish_metrics()
         
         end_time = datetime.now()
         uptime = end_time - self.start_time if self.start_time else "unknown"
-        success_rate = (successful_heartbeats / heartbeat_count * 100) if heartbeat_count > 0 else 0
+        heartbeat_count = self.stats['heartbeat_count']
+        success_rate = (self.stats['successful_heartbeats'] / heartbeat_count * 100) if heartbeat_count > 0 else 0
         self.logger.info(f"I2C Heartbeat Service stopped at {end_time.strftime('%Y-%m-%d %H:%M:%S')}, total uptime: {uptime}, heartbeats sent: {heartbeat_count} (success rate: {success_rate:.1f}%)")
     
     def status(self):
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Precompress Static Assets
+Writes .gz (and .br when the brotli module is installed) next to every
+compressible file in static/, for nginx gzip_static/brotli_static. Files are
+only rewritten when the source changed; a sibling is skipped (and removed) when
+it doesn't save at least MIN_SAVING of the original size.
+
+Run by dist/install.sh and dist/update.sh:
+    python3 scripts/precompress_static.py [--static-dir DIR] [--clean]
+"""
+
+import os
+import sys
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.html', '.txt', '.map', '.ttf', '.eot', '.otf', '.ico')
+# Below this size the compressed response isn't worth the extra file
+MIN_SIZE = 256
+MIN_SAVING = 0.1
+
+
+def _write_sibling(path, suffix, data, source_size, source_mtime):
+    """Write path+suffix if it saves enough, returns the bytes saved (0 if skipped)"""
+    target = path + suffix
+    if len(data) > source_size * (1 - MIN_SAVING):
+        if os.path.exists(target):
+            os.remove(target)
+        return 0
+
+    tmp = target + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, target)
+    # Same mtime as the source, so nginx sends the same Last-Modified for every encoding
+    os.utime(target, (source_mtime, source_mtime))
+    return source_size - len(data)
+
+
+def precompress(static_dir=STATIC_DIR):
+    """Compress every stale compressible file, returns (files written, bytes saved)"""
+    written = 0
+    saved = 0
+    encodings = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encodings.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+    for root, _, files in os.walk(static_dir):
+        for name in files:
+            if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            if st.st_size < MIN_SIZE:
+                continue
+
+            data = None
+            for suffix, compress in encodings:
+                target = path + suffix
+                if os.path.exists(target) and os.stat(target).st_mtime == st.st_mtime:
+                    continue
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                saved_bytes = _write_sibling(path, suffix, compress(data), st.st_size, st.st_mtime)
+                if saved_bytes:
+                    written += 1
+                    saved += saved_bytes
+    return written, saved
+
+
+def clean(static_dir=STATIC_DIR):
+    """Remove all .gz/.br siblings, returns the number of files removed"""
+    removed = 0
+    for root, _, files in os.walk(static_dir):
+        for name in files:
+            if name.endswith(('.gz', '.br')) and os.path.exists(os.path.join(root, name[:-3])):
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Precompress static assets for nginx')
+    parser.add_argument('--static-dir', default=STATIC_DIR, help='Static directory (default: %(default)s)')
+    parser.add_argument('--clean', action='store_true', help='Remove all precompressed files instead')
+    args = parser.parse_args()
+
+    if args.clean:
+        print(f"Removed {clean(args.static_dir)} precompressed files")
+        return 0
+
+    written, saved = precompress(args.static_dir)
+    formats = 'gzip, brotli' if brotli is not None else 'gzip (pip install brotli for .br)'
+    print(f"Precompressed {written} files ({formats}), {saved / (1024 * 1024):.1f} MB saved")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
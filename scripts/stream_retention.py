@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Stream Retention
+Archives expired Redis stream entries to SQLite and trims the streams, as
+configured per log type in LOG_TYPE_CONFIG (api/logger/api_logger.py).
+
+Run hourly by dist/service/stream-retention.timer:
+    python3 scripts/stream_retention.py [--log-type TYPE ...] [--dry-run]
+"""
+
+import os
+import sys
+
+# Add parent directory to path to import functions
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.logger.api_logger import LOG_TYPE_CONFIG
+from api.logger.retention import run_retention
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Archive and trim the logger Redis streams')
+    parser.add_argument('--log-type', action='append', choices=sorted(LOG_TYPE_CONFIG),
+                        help='Only this log type (repeatable, default: all with a retention)')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+    args = parser.parse_args()
+
+    results = run_retention(LOG_TYPE_CONFIG, args.log_type, args.dry_run)
+    failed = False
+    for log_type, result in results.items():
+        if 'error' in result:
+            failed = True
+            print(f"{log_type}: {result['stream']} failed: {result['error']}")
+            continue
+        action = 'would archive' if args.dry_run else 'archived'
+        print(f"{log_type}: {result['stream']} {result['length_before']} -> {result['length_after']} entries, "
+              f"{action} {result['archived']}, trimmed {result['trimmed']}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
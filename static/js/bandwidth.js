@@ -0,0 +1,193 @@
+/**
+ * Low-Bandwidth Profile Client
+ * Wraps window.fetch for GET requests to the monitoring and logger APIs so pages
+ * keep receiving the normal JSON while the server may send compact payloads
+ * (see api/bandwidth.py):
+ * - sends X-Bandwidth-Profile: auto and the measured RTT, so the server picks
+ *   the low profile on slow links (or as chosen via /api/bandwidth-profile)
+ * - revalidates with If-None-Match and answers 304s from its own cache
+ * - applies delta (JSON merge patch) payloads and expands $columns/$rows tables
+ * - restores page_info and site_info stripped by the server
+ * - in the low profile, answers polls faster than X-Poll-Interval from cache
+ */
+(function () {
+    'use strict';
+
+    const API_PREFIXES = ['/api/v1/monitoring/', '/api/v1/loggers/'];
+    const originalFetch = window.fetch.bind(window);
+    const entries = new Map();      // path+query -> {etag, compact, body, profile, nextPoll}
+    const siteInfo = new Map();     // path -> site_info of the first page
+    let rtt = null;                 // smoothed round trip time (ms) of small responses
+
+    function isProfiled(url, method) {
+        return url.origin === window.location.origin
+            && method === 'GET'
+            && API_PREFIXES.some((prefix) => url.pathname.startsWith(prefix));
+    }
+
+    function expandColumns(value) {
+        if (Array.isArray(value)) {
+            return value.map(expandColumns);
+        }
+        if (value && typeof value === 'object') {
+            if (Array.isArray(value.$columns) && Array.isArray(value.$rows)) {
+                return value.$rows.map((row) => {
+                    const item = {};
+                    value.$columns.forEach((column, index) => {
+                        item[column] = expandColumns(row[index]);
+                    });
+                    return item;
+                });
+            }
+            const result = {};
+            Object.keys(value).forEach((key) => {
+                result[key] = expandColumns(value[key]);
+            });
+            return result;
+        }
+        return value;
+    }
+
+    // RFC 7386
+    function applyMergePatch(target, patch) {
+        if (!patch || typeof patch !== 'object' || Array.isArray(patch)) {
+            return patch;
+        }
+        const result = (target && typeof target === 'object' && !Array.isArray(target)) ? Object.assign({}, target) : {};
+        Object.keys(patch).forEach((key) => {
+            if (patch[key] === null) {
+                delete result[key];
+            } else {
+                result[key] = applyMergePatch(result[key], patch[key]);
+            }
+        });
+        return result;
+    }
+
+    // Same fields as paginate_data() in api/logger/helper.py
+    function expandPageInfo(pageInfo) {
+        const limit = pageInfo.limit || 1;
+        const offset = pageInfo.offset || 0;
+        const total = pageInfo.total_records || 0;
+        const count = pageInfo.showing_count || 0;
+        const currentPage = Math.floor(offset / limit) + 1;
+        const totalPages = Math.max(1, Math.ceil(total / limit));
+        return Object.assign({}, pageInfo, {
+            current_page: currentPage,
+            total_pages: totalPages,
+            has_next: offset + limit < total,
+            has_prev: offset > 0,
+            showing_from: count ? offset + 1 : 0,
+            showing_to: offset + count,
+            is_first_page: currentPage === 1,
+            is_last_page: currentPage === totalPages,
+            records_remaining: Math.max(0, total - (offset + limit))
+        });
+    }
+
+    function restore(path, compact, status) {
+        const body = expandColumns(compact);
+        if (body && typeof body === 'object' && !Array.isArray(body)) {
+            if (!('status_code' in body)) {
+                body.status_code = status;
+            }
+            if (body.page_info) {
+                body.page_info = expandPageInfo(body.page_info);
+                if (body.site_info) {
+                    siteInfo.set(path, body.site_info);
+                } else if (siteInfo.has(path)) {
+                    body.site_info = siteInfo.get(path);
+                }
+            }
+        }
+        return body;
+    }
+
+    function cachedResponse(entry) {
+        return new Response(JSON.stringify(entry.body), {
+            status: 200,
+            headers: {'Content-Type': 'application/json', 'ETag': entry.etag || ''}
+        });
+    }
+
+    function recordRtt(started, response) {
+        const length = parseInt(response.headers.get('Content-Length') || '0', 10);
+        if (response.status !== 304 && length > 2048) {
+            return;  // transfer time, not latency
+        }
+        const elapsed = performance.now() - started;
+        rtt = rtt === null ? elapsed : 0.8 * rtt + 0.2 * elapsed;
+    }
+
+    window.fetch = async function (input, init) {
+        const request = input instanceof Request ? input : null;
+        const url = new URL(request ? request.url : String(input), window.location.href);
+        const method = ((init && init.method) || (request && request.method) || 'GET').toUpperCase();
+        if (!isProfiled(url, method)) {
+            return originalFetch(input, init);
+        }
+
+        const key = url.pathname + url.search;
+        const cached = entries.get(key);
+        if (cached && cached.profile === 'low' && Date.now() < cached.nextPoll) {
+            return cachedResponse(cached);
+        }
+
+        const headers = new Headers((init && init.headers) || (request ? request.headers : undefined));
+        headers.set('X-Bandwidth-Profile', 'auto');
+        if (rtt !== null) {
+            headers.set('RTT', String(Math.round(rtt / 25) * 25));
+        }
+        if (cached && cached.etag) {
+            headers.set('If-None-Match', cached.etag);
+        }
+
+        const started = performance.now();
+        const response = await originalFetch(request ? request.url : url.href, Object.assign({}, init, {
+            method: 'GET',
+            headers: headers,
+            cache: 'no-store'
+        }));
+        recordRtt(started, response);
+
+        const profile = response.headers.get('X-Bandwidth-Profile') || 'normal';
+        const pollInterval = parseFloat(response.headers.get('X-Poll-Interval') || '0');
+        const nextPoll = Date.now() + pollInterval * 1000;
+
+        if (response.status === 304 && cached) {
+            cached.profile = profile;
+            cached.nextPoll = nextPoll;
+            return cachedResponse(cached);
+        }
+
+        const contentType = response.headers.get('Content-Type') || '';
+        if (response.status !== 200 || !contentType.includes('application/json')) {
+            return response;
+        }
+
+        const payloadFormat = response.headers.get('X-Payload-Format') || '';
+        let compact = await response.json();
+        if (payloadFormat.includes('delta')) {
+            if (!cached || response.headers.get('X-Delta-Base') !== cached.etag.replace(/^W\//, '')) {
+                // Base no longer held, fetch the full payload
+                entries.delete(key);
+                return window.fetch(input, init);
+            }
+            compact = applyMergePatch(cached.compact, compact);
+        }
+
+        const entry = {
+            etag: response.headers.get('ETag'),
+            compact: compact,
+            body: payloadFormat ? restore(url.pathname, compact, response.status) : compact,
+            profile: profile,
+            nextPoll: nextPoll
+        };
+        if (entry.etag) {
+            entries.set(key, entry);
+        } else {
+            entries.delete(key);
+        }
+        return cachedResponse(entry);
+    };
+})();
@@ -0,0 +1,183 @@
+"""
+Tests for the timestamp deletes of Redis stream entries (api/logger/helper.py)
+
+    pip install pytest fakeredis
+    python -m pytest tests
+"""
+
+from datetime import datetime
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from api.logger.helper import (
+    STREAM_ID_SLACK_MS,
+    delete_entries_by_timestamp_section,
+    timestamp_id_range,
+    _delete_matching_entries,
+)
+
+STREAM = 'stream:scc'
+
+
+def ms(timestamp):
+    return int(datetime.strptime(timestamp, '%Y%m%dT%H%M%S').timestamp() * 1000)
+
+
+@pytest.fixture
+def redis_conn():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def add(redis_conn, timestamp, added_ms=None):
+    """Add an entry with this timestamp field, added at added_ms (default: the timestamp)"""
+    return redis_conn.xadd(STREAM, {'timestamp': timestamp}, id=f'{added_ms or ms(timestamp)}-*')
+
+
+def timestamps(redis_conn):
+    return [fields['timestamp'] for _, fields in redis_conn.xrange(STREAM)]
+
+
+class TestTimestampIdRange:
+    def test_exact(self):
+        start = ms('20250301T101500')
+        assert timestamp_id_range('20250301T101500', 'exact') == (
+            f'{start - STREAM_ID_SLACK_MS}-0', f'({start + 1000 + STREAM_ID_SLACK_MS}-0'
+        )
+
+    @pytest.mark.parametrize('prefix, start, span_ms', [
+        ('20250301', '20250301T000000', 86400000),
+        ('20250301T', '20250301T000000', 86400000),
+        ('20250301T1', '20250301T100000', 36000000),
+        ('20250301T10', '20250301T100000', 3600000),
+        ('20250301T1015', '20250301T101500', 60000),
+        ('20250301T101500', '20250301T101500', 1000),
+    ])
+    def test_prefix(self, prefix, start, span_ms):
+        start_ms = ms(start)
+        assert timestamp_id_range(prefix, 'prefix') == (
+            f'{start_ms - STREAM_ID_SLACK_MS}-0', f'({start_ms + span_ms + STREAM_ID_SLACK_MS}-0'
+        )
+
+    @pytest.mark.parametrize('timestamp, match_type', [
+        ('2025030', 'prefix'),  # Shorter than a date
+        ('20250301', 'exact'),  # Exact needs the full timestamp
+        ('20250301T1015001', 'prefix'),
+        ('20251301', 'prefix'),  # No month 13
+        ('2025-03-01', 'prefix'),
+        ('', 'prefix'),
+    ])
+    def test_invalid(self, timestamp, match_type):
+        assert timestamp_id_range(timestamp, match_type) is None
+
+
+class TestDeleteMatchingEntries:
+    def test_head_run_is_trimmed_and_the_rest_deleted(self, redis_conn):
+        for index, timestamp in enumerate(('20250301T000000', '20250301T000001', '20250302T000000',
+                                           '20250301T000002', '20250302T000001', '20250301T000003')):
+            add(redis_conn, timestamp, ms('20250302T000001') + index)
+
+        deleted, scanned = _delete_matching_entries(
+            redis_conn, STREAM, lambda timestamp: timestamp.startswith('20250301')
+        )
+
+        assert (deleted, scanned) == (4, 6)
+        assert timestamps(redis_conn) == ['20250302T000000', '20250302T000001']
+
+    def test_whole_stream_is_trimmed(self, redis_conn):
+        for second in range(5):
+            add(redis_conn, f'20250301T00000{second}')
+
+        assert _delete_matching_entries(redis_conn, STREAM, lambda timestamp: True) == (5, 5)
+        assert redis_conn.xlen(STREAM) == 0
+
+    def test_range_after_the_head_is_not_trimmed(self, redis_conn):
+        for timestamp in ('20250301T000000', '20250302T000000', '20250302T000001', '20250303T000000'):
+            add(redis_conn, timestamp)
+
+        # The head matches too but isn't in the range, so nothing may be trimmed
+        deleted, scanned = _delete_matching_entries(
+            redis_conn, STREAM, lambda timestamp: timestamp != '20250303T000000',
+            f"{ms('20250302T000000')}-0", '+'
+        )
+
+        assert (deleted, scanned) == (2, 3)
+        assert timestamps(redis_conn) == ['20250301T000000', '20250303T000000']
+
+    def test_batches(self, redis_conn, monkeypatch):
+        monkeypatch.setattr('api.logger.helper.STREAM_DELETE_BATCH_SIZE', 3)
+        for second in range(10):
+            add(redis_conn, f'20250301T00000{second}')
+
+        deleted, scanned = _delete_matching_entries(
+            redis_conn, STREAM, lambda timestamp: int(timestamp[-1]) % 2 == 1
+        )
+
+        assert (deleted, scanned) == (5, 10)
+        assert timestamps(redis_conn) == [f'20250301T00000{second}' for second in range(0, 10, 2)]
+
+
+class TestDeleteByTimestamp:
+    def delete(self, redis_conn, timestamp, match_type='prefix'):
+        result = delete_entries_by_timestamp_section(redis_conn, timestamp, match_type, [STREAM], debug_mode=True)
+        return result['streams_deleted'].get(STREAM, 0), result['scan_methods'].get(STREAM), result
+
+    def test_id_range(self, redis_conn):
+        for timestamp in ('20250301T235900', '20250302T000000', '20250302T120000', '20250303T000000'):
+            add(redis_conn, timestamp)
+
+        deleted, method, _ = self.delete(redis_conn, '20250302')
+
+        assert (deleted, method) == (2, 'id_range')
+        assert timestamps(redis_conn) == ['20250301T235900', '20250303T000000']
+
+    def test_exact(self, redis_conn):
+        for timestamp in ('20250302T000000', '20250302T000001', '20250302T000000'):
+            add(redis_conn, timestamp, ms('20250302T000001'))
+
+        deleted, method, _ = self.delete(redis_conn, '20250302T000000', 'exact')
+
+        assert (deleted, method) == (2, 'id_range')
+        assert timestamps(redis_conn) == ['20250302T000001']
+
+    def test_skewed_entries_widen_the_range(self, redis_conn):
+        # The last entries of the day added hours late (batched collector)
+        added = ms('20250302T220000')
+        for offset in range(4):
+            add(redis_conn, f'20250302T23595{offset}', added + offset * 3 * 3600000)
+        add(redis_conn, '20250303T000000', ms('20250303T100000'))
+
+        deleted, method, _ = self.delete(redis_conn, '20250302')
+
+        assert (deleted, method) == (4, 'widened')
+        assert timestamps(redis_conn) == ['20250303T000000']
+
+    def test_timestamp_before_the_stream(self, redis_conn):
+        # An archived day: nothing but one range read, no scan of the stream
+        for minute in range(50):
+            add(redis_conn, f'20250305T00{minute:02d}00')
+
+        deleted, method, result = self.delete(redis_conn, '20250301')
+
+        assert (deleted, method) == (0, 'id_range')
+        assert result['debug_info']['entries_scanned'][STREAM] == 0
+        assert redis_conn.xlen(STREAM) == 50
+
+    def test_missing_timestamp_inside_the_stream(self, redis_conn):
+        for day in range(1, 6):
+            add(redis_conn, f'2025030{day}T120000')
+
+        deleted, method, result = self.delete(redis_conn, '20250303T1300', 'prefix')
+
+        assert (deleted, method) == (0, 'id_range')
+        assert result['debug_info']['entries_scanned'][STREAM] == 0
+        assert redis_conn.xlen(STREAM) == 5
+
+    def test_unparsable_timestamp_scans_the_stream(self, redis_conn):
+        add(redis_conn, '20250302T000000')
+        add(redis_conn, '20250303T000000')
+
+        deleted, method, _ = self.delete(redis_conn, '202503', 'prefix')
+
+        assert (deleted, method) == (2, 'full_scan')
@@ -1,7 +1,10 @@
 import subprocess
 import os
 from subprocess import Popen
-from config import *
+from api.deadlines import request_timeout
+
+# Default for bash_command, systemctl restarts can take a while
+BASH_COMMAND_TIMEOUT = 60
 
 def change_ip(path, ip, gw, subnet):
     """
@@ -51,7 +54,7 @@ def change_ip(path, ip, gw, subnet):
         return False
 
 
-def bash_command(command, universal_newlines=False, shell=False):
+def bash_command(command, universal_newlines=False, shell=False, timeout=BASH_COMMAND_TIMEOUT):
     """
     Execute bash commands
     
@@ -59,9 +62,14 @@ def bash_command(command, universal_newlines=False, shell=False):
         command: Command to execute (string or list)
         universal_newlines: Whether to use universal newlines
         shell: Whether to use shell
+        timeout: Seconds before the command is killed, capped at the request deadline (api.deadlines)
         
     Returns:
-        str: Command output
+        str: Command output ("" if it failed)
+
+    Raises:
+        subprocess.TimeoutExpired: the command was killed after timeout (a 504
+        when a view doesn't handle it, see api.deadlines)
     """
     try:
         if isinstance(command, str):
@@ -77,13 +85,52 @@ def bash_command(command, universal_newlines=False, shell=False):
             shell=shell
         )
         
-        output, errors = p.communicate()
+        try:
+            output, errors = p.communicate(timeout=request_timeout(timeout))
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.communicate()
+            print(f"bash_command timed out: {command}")
+            raise
         
         if isinstance(output, bytes):
             return str(output)[2:-1]
         else:
             return output
             
+    except subprocess.TimeoutExpired:
+        raise
     except Exception as e:
         print(f"Exception in bash_command: {e}")
         return ""
+
+
+def read_last_lines(path, limit=50, block_size=8192):
+    """
+    Read the last lines of a text file without loading the whole file
+    
+    Args:
+        path: File path
+        limit: Maximum number of lines to return
+        block_size: Bytes read per backward seek
+        
+    Returns:
+        list: Lines (without newline), newest last
+    """
+    if limit <= 0 or not os.path.exists(path):
+        return []
+    
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        buffer = b''
+        
+        # Read blocks from the end until enough newlines are buffered
+        while position > 0 and buffer.count(b'\n') <= limit:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            buffer = f.read(read_size) + buffer
+    
+    lines = [line.decode('utf-8', errors='replace') for line in buffer.splitlines() if line.strip()]
+    return lines[-limit:]
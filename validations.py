@@ -1,5 +1,5 @@
 import re
-from config import number_of_scc
+import config
 
 def validate_ip_address(ip_address):
     pat = re.compile("^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
@@ -66,7 +66,7 @@ def validate_setting_ip(form):
         return False, 'IP Address salah'
 
 def validate_modbus_id(form):
-    if number_of_scc == 3:
+    if config.number_of_scc == 3:
         scc1_id = int(form.get('scc-id-1'))
         scc2_id = int(form.get('scc-id-2'))
         scc3_id = int(form.get('scc-id-3'))
@@ -86,7 +86,7 @@ def validate_modbus_id(form):
                 return False, 'id tdk boleh sama'
         else:
             return False, 'id tdk boleh sama'
-    if number_of_scc == 2:
+    if config.number_of_scc == 2:
         scc1_id = int(form.get('scc-id-1'))
         scc2_id = int(form.get('scc-id-2'))
         if scc1_id != scc2_id: